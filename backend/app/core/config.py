@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 ENV_FILE_PATH = ".env"
@@ -31,6 +32,10 @@ class Settings(BaseSettings):
     MAIL_SUBJECT: str
     SMTP_SERVER: str
     SMTP_PORT: int
+    SMTP_STARTTLS: bool = True  # Turn off only for a local stand-in such as scripts/fake_smtp_server.py
+    SMTP_TIMEOUT: float = 30.0  # Seconds per SMTP connection attempt and command
+    SMTP_POOL_SIZE: int = 4  # Emails sent in parallel, each over its own pooled connection
+    SMTP_SEND_ATTEMPTS: int = 3  # Sends per email when the connection drops, reconnecting in between
 
     # Google Account credentials
     APP_PASSWORD: str
@@ -38,11 +43,65 @@ class Settings(BaseSettings):
     # Google API User ID (generally 'me' for the authorized user)
     GMAIL_USER_ID: str
 
+    # Notification settings
+    NOTIFY_ONLY_NEW_SLOTS: bool = False  # Only notify slots new since the previous crawl, for every lead at once
+    AVAILABILITY_SNAPSHOT_FILE: str = "availability_snapshot.json"  # Last-seen slots; empty keeps them in memory
+    AVAILABILITY_FAST_DESERIALIZE: bool = True  # Check a response's shape once instead of validating every slot
+    AVAILABILITY_COMPACT_SLOTS: bool = True  # Hold a cycle's slots as CompactSlot rather than AvailabilityItem
+    MATCHING_ENGINE: Literal["index", "numpy", "sql", "scan"] = "index"  # "sql" runs in Postgres; "numpy" needs numpy
+    LEAD_BATCH_SIZE: int = 5000  # Leads loaded per keyset-paginated query when matching
+
+    # Notifier daemon settings (`python -m app.external_services.notifier --serve`)
+    NOTIFIER_CYCLE_SECONDS: int = 30  # Wait between availability cycles; due centers are set by the poll scheduler
+    NOTIFIER_CENTERS_REFRESH_SECONDS: int = 86400  # Wait between runs of the centers crawler
+    NOTIFIER_LEAD_REFRESH_SECONDS: int = 60  # Reload the leads and rebuild their matcher at least this often
+    NOTIFIER_SHARDS: int = 1  # Processes matching and queuing notifications; above 1 needs the outbox
+
+    # Notification outbox settings
+    NOTIFICATION_OUTBOX_ENABLED: bool = False  # Queue notifications in notification_outbox instead of sending inline
+    NOTIFICATION_OUTBOX_DRAIN_INLINE: bool = True  # Also drain the outbox at the end of every notifier run
+    NOTIFICATION_OUTBOX_BATCH_SIZE: int = 100  # Notifications inserted or claimed per statement
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS: int = 5  # Failed sends before a notification is marked failed
+    NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS: int = 60  # Wait before the first retry, doubled per retry
+    NOTIFICATION_OUTBOX_POLL_SECONDS: int = 10  # Wait of `outbox_sender --loop` once the outbox is drained
+
+    # Notification dedup settings
+    NOTIFICATION_DEDUP_ENABLED: bool = True  # Only notify a lead of slots it was not notified about yet
+    NOTIFICATION_DEDUP_WINDOW_HOURS: int = 72  # A slot still open after this long is notified again
+
+    # Availability history settings
+    AVAILABILITY_HISTORY_ENABLED: bool = True  # Record every crawled slot in availability_slots
+    AVAILABILITY_HISTORY_BATCH_SIZE: int = 1000  # Rows per INSERT ... ON CONFLICT statement
+
+    # Center registry settings
+    CENTER_REGISTRY_TTL_SECONDS: int = 3600  # Reload the cached centers table at least this often
+
     # ICBC URLs
     ICBC_LOGIN_URL: str
     ICBC_APPOINTMENT_URL: str
     ICBC_TEST_CENTERS_LOCATION_URL: str
 
+    # ICBC crawler settings
+    ICBC_CRAWL_MAX_WORKERS: int = 8  # Centers fetched in parallel; 1 crawls sequentially
+    ICBC_REQUEST_TIMEOUT: float = 10.0  # Seconds per ICBC request
+    ICBC_STREAM_APPOINTMENTS: bool = False  # Parse and serialize appointments while the response downloads
+    ICBC_STREAM_CHUNK_SIZE: int = 65536  # Bytes read at a time from a streamed appointments response
+    ICBC_POOL_CONNECTIONS: int = 4  # Per-host connection pools kept by the ICBC client
+    ICBC_POOL_MAXSIZE: int = 16  # Keep-alive connections per host; keep >= ICBC_CRAWL_MAX_WORKERS
+    ICBC_TOKEN_TTL_SECONDS: int = 600  # Assumed token lifetime when it carries no JWT exp claim
+    ICBC_TOKEN_REFRESH_MARGIN_SECONDS: int = 30  # Log in again this long before the token expires
+    ICBC_POLL_BUDGET_PER_MINUTE: int = 60  # Center polls the adaptive scheduler may spend per minute
+    ICBC_POLL_MIN_INTERVAL_SECONDS: int = 60  # Fastest a single center is polled
+    ICBC_POLL_MAX_INTERVAL_SECONDS: int = 1800  # Slowest a subscribed center is polled
+    ICBC_POLL_CHANGE_DECAY: float = 0.8  # Weight of past polls in a center's change rate
+    ICBC_RATE_LIMIT_PER_SECOND: float = 5.0  # Sustained ICBC requests per second, shared by all crawlers
+    ICBC_RATE_LIMIT_BURST: int = 10  # Requests allowed back to back before the rate limit applies
+    ICBC_RETRY_ATTEMPTS: int = 3  # Attempts per request on timeouts, connection errors, 429 and 5xx
+    ICBC_RETRY_BASE_DELAY_SECONDS: float = 0.5  # Backoff before the first retry, doubled per retry
+    ICBC_RETRY_MAX_DELAY_SECONDS: float = 8.0  # Backoff cap; the actual wait is jittered below it
+    ICBC_CIRCUIT_FAILURE_THRESHOLD: int = 3  # Consecutive failures before a center is skipped
+    ICBC_CIRCUIT_COOLDOWN_SECONDS: int = 300  # How long a failing center is skipped
+
     class Config:
         env_file = ENV_FILE_PATH
 
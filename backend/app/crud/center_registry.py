@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import settings
+from app.models.center import Center
+
+
+class CenterRegistry:
+    """
+    Process-wide, in-memory copy of the centers table, keyed by pos_id and id.
+
+    Centers change only when ICBCCentersCrawler runs, so they are loaded once and kept
+    until invalidate() is called (the crawler does after every run) or they are older
+    than settings.CENTER_REGISTRY_TTL_SECONDS, which covers updates made by another
+    process. A lookup missing an id reloads the table, at most once per
+    MISS_REFRESH_SECONDS, so a center added since the last load is found.
+
+    The cached centers are detached snapshots that do not belong to any session. They are
+    safe to read anywhere; use the methods taking a session to get instances attached to it.
+    """
+
+    # Minimum time between two reloads caused by lookups of unknown ids
+    MISS_REFRESH_SECONDS = 5
+
+    def __init__(self, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.ttl = settings.CENTER_REGISTRY_TTL_SECONDS if ttl is None else ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._by_id: Optional[Dict[int, Center]] = None
+        self._by_pos_id: Dict[int, Center] = {}
+        self._loaded_at = 0.0
+        self._miss_refreshed_at: Optional[float] = None
+
+    def invalidate(self):
+        """Drop the cached centers; the next lookup reloads them."""
+        with self._lock:
+            self._by_id = None
+            self._miss_refreshed_at = None
+
+    def refresh(self, db: Session) -> Tuple[Dict[int, Center], Dict[int, Center]]:
+        """Reload every center from the database; returns them keyed by id and by pos_id."""
+        columns = [column.key for column in inspect(Center).column_attrs]
+        snapshots = []
+        for center in db.query(Center).all():
+            snapshot = Center(**{column: getattr(center, column) for column in columns})
+            make_transient_to_detached(snapshot)
+            snapshots.append(snapshot)
+
+        by_id = {center.id: center for center in snapshots}
+        by_pos_id = {center.pos_id: center for center in snapshots}
+        with self._lock:
+            self._by_id, self._by_pos_id = by_id, by_pos_id
+            self._loaded_at = self._clock()
+        return by_id, by_pos_id
+
+    def _load(self, db: Session, wanted_ids: Iterable[int] = (),
+              wanted_pos_ids: Iterable[int] = ()) -> Tuple[Dict[int, Center], Dict[int, Center]]:
+        """The cached centers keyed by id and by pos_id, reloaded first when stale or missing a wanted id."""
+        now = self._clock()
+        with self._lock:
+            by_id, by_pos_id = self._by_id, self._by_pos_id
+            stale = by_id is None or now - self._loaded_at >= self.ttl
+            if not stale:
+                missing = (any(center_id not in by_id for center_id in wanted_ids)
+                           or any(pos_id not in by_pos_id for pos_id in wanted_pos_ids))
+                if missing and (self._miss_refreshed_at is None
+                                or now - self._miss_refreshed_at >= self.MISS_REFRESH_SECONDS):
+                    self._miss_refreshed_at = now
+                    stale = True
+        if stale:
+            return self.refresh(db)
+        return by_id, by_pos_id
+
+    def all(self, db: Session) -> List[Center]:
+        """Detached snapshots of every center, ordered by id."""
+        by_id, _ = self._load(db)
+        return sorted(by_id.values(), key=lambda center: center.id)
+
+    def by_pos_ids(self, db: Session, pos_ids: Iterable[int]) -> Dict[int, Center]:
+        """Detached snapshots of the known centers among `pos_ids`, keyed by pos_id."""
+        pos_ids = set(pos_ids)
+        _, by_pos_id = self._load(db, wanted_pos_ids=pos_ids)
+        return {pos_id: by_pos_id[pos_id] for pos_id in pos_ids if pos_id in by_pos_id}
+
+    def get_by_ids(self, db: Session, center_ids: Iterable[int]) -> List[Center]:
+        """
+        The known centers among `center_ids`, attached to `db` without querying it.
+
+        Unknown ids are left out and duplicates are returned once, as with an IN query.
+        """
+        center_ids = list(dict.fromkeys(center_ids))
+        by_id, _ = self._load(db, wanted_ids=center_ids)
+        return [db.merge(by_id[center_id], load=False) for center_id in center_ids if center_id in by_id]
+
+
+center_registry = CenterRegistry()
@@ -0,0 +1,74 @@
+from datetime import date, datetime
+from typing import Dict, Iterable, NamedTuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import AvailabilitySlot
+
+
+class HistorySlot(NamedTuple):
+    """The fields of an availability item the history keeps, far lighter to hold than the item."""
+    date: date
+    day_of_week: int
+    start_tm: str
+    end_tm: str
+    resource_id: int
+    exam_code: str
+
+    @classmethod
+    def from_item(cls, item) -> "HistorySlot":
+        return cls(item.appointmentDt.date, item.appointmentDt.dayOfWeek.value, item.startTm, item.endTm,
+                   item.resourceId, item.dlExam.code)
+
+
+def record_availability(db: Session, observed: Dict[int, Iterable], seen_at: datetime, exam_date: date) -> None:
+    """
+    Write one crawl cycle into the availability history.
+
+    Every observed slot is upserted with one INSERT ... ON CONFLICT statement per
+    settings.AVAILABILITY_HISTORY_BATCH_SIZE rows: new slots get first_seen = seen_at, known
+    ones get their last_seen bumped and gone_at cleared. Slots of the observed centers that
+    were not seen this cycle are then marked gone, unless they are before exam_date: ICBC was
+    not asked about those, so not seeing them says nothing.
+
+    :param db: Database session
+    :param observed: Availability items, or their HistorySlot, per pos_id, for the centers crawled successfully
+    :param seen_at: Time of the crawl
+    :param exam_date: First day the crawl asked ICBC about
+    """
+    rows = []
+    for pos_id, items in observed.items():
+        slots = (item if isinstance(item, HistorySlot) else HistorySlot.from_item(item) for item in items)
+        unique = {(slot.date, slot.start_tm, slot.resource_id): slot for slot in slots}
+        rows += [{"pos_id": pos_id, **slot._asdict(), "first_seen": seen_at, "last_seen": seen_at}
+                 for slot in unique.values()]
+
+    batch_size = max(1, settings.AVAILABILITY_HISTORY_BATCH_SIZE)
+    for start in range(0, len(rows), batch_size):
+        stmt = insert(AvailabilitySlot).values(rows[start:start + batch_size])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_availability_slots_slot",
+            set_={
+                "end_tm": stmt.excluded.end_tm,
+                "exam_code": stmt.excluded.exam_code,
+                "last_seen": stmt.excluded.last_seen,
+                "gone_at": None,
+            },
+        )
+        db.execute(stmt)
+
+    if observed:
+        db.execute(
+            update(AvailabilitySlot)
+            .where(
+                AvailabilitySlot.pos_id.in_(list(observed)),
+                AvailabilitySlot.gone_at.is_(None),
+                AvailabilitySlot.last_seen < seen_at,
+                AvailabilitySlot.date >= exam_date,
+            )
+            .values(gone_at=seen_at)
+        )
+    db.commit()
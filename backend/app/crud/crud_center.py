@@ -1,16 +1,41 @@
-from typing import List
+from datetime import date
+from typing import List, Tuple
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from app.crud.center_registry import center_registry
 from app.models.center import Center
+from app.models.user import UserPreference, user_preferences_centers
 
 
 def get_centers_by_ids(db: Session, center_ids: List[int]) -> List[Center]:
     """
     Retrieve test centers by their IDs.
 
+    Served from the center registry, without a query.
+
     :param center_ids: List of test center IDs
     :param db: Database session
     :return: List of Center objects
     """
-    return db.query(Center).filter(Center.id.in_(center_ids)).all()
+    return center_registry.get_by_ids(db, center_ids)
+
+
+def get_subscribed_centers(db: Session, today: date) -> List[Tuple[Center, int]]:
+    """
+    Retrieve test centers referenced by at least one preference whose window has not ended.
+
+    :param db: Database session
+    :param today: Preferences with an end_date before this day are ignored
+    :return: List of (Center, number of active preferences for it) tuples
+    """
+    return (
+        db.query(Center, func.count(UserPreference.id))
+        .join(user_preferences_centers, user_preferences_centers.c.center_id == Center.id)
+        .join(UserPreference, UserPreference.id == user_preferences_centers.c.user_preference_id)
+        .filter(UserPreference.end_date >= today)
+        .group_by(Center.id)
+        .order_by(Center.id)
+        .all()
+    )
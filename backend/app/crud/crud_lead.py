@@ -1,14 +1,18 @@
-from typing import Type, List
+from datetime import date
+from typing import Iterator, Optional, Set, Tuple, Type, List
 from uuid import UUID
 
 from fastapi import HTTPException, status
 from sqlalchemy.engine import Row
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import Column, func
+from sqlalchemy.orm import Session
+from sqlalchemy import (BigInteger, Column, ColumnElement, Date, Integer, Text, any_, bindparam, cast, column, func,
+                        literal, or_, select, tuple_)
+from sqlalchemy.dialects.postgresql import ARRAY, BIT
 
+from app.core.config import settings
 from app.crud.crud_user import get_centers
 from app.schemas import LeadCreate, UserPreferenceCreate
-from app.models import Center, Lead, UserPreference
+from app.models import Center, Lead, UserPreference, user_preferences_centers
 
 
 def get_lead_by_email(db: Session, email: str) -> Type[Lead] | None:
@@ -62,7 +66,124 @@ def create_lead_with_preference(db: Session, lead_in: LeadCreate, preferences: U
     return new_preference
 
 
-def get_lead_preferences(db: Session) -> List[Row]:
-    return db.query(Lead).options(
-        joinedload(Lead.preference).joinedload(UserPreference.preferred_centers)
-    ).all()
\ No newline at end of file
+def lead_shard_clause(lead_id: ColumnElement, shard: Tuple[int, int]) -> ColumnElement:
+    """
+    SQL condition keeping the lead ids in `shard`, given as (shard, shards).
+
+    Computes the same shard as sharding.lead_shard: the first 32 bits of the md5 of the
+    id's text, modulo shards.
+    """
+    index, shards = shard
+    digest = literal("x", Text) + func.substr(func.md5(cast(lead_id, Text)), 1, 8)
+    return cast(cast(digest, BIT(32)), BigInteger) % shards == index
+
+
+def iter_active_lead_preferences(db: Session, today: date, batch_size: Optional[int] = None,
+                                 shard: Optional[Tuple[int, int]] = None) -> Iterator[List[Row]]:
+    """
+    Stream what matching needs of every lead whose preference can still match a slot.
+
+    Only preferences whose end_date is not before `today` and that have at least one
+    preferred center are loaded, as flat rows of (id, email, start_date, end_date,
+    preferred_days, pos_ids) with the pos_ids of the preferred centers aggregated by
+    the database. Rows are fetched in batches of `batch_size` (defaults to
+    settings.LEAD_BATCH_SIZE) paginated by (lead id, preference id), so a batch costs
+    one index range scan however many leads come before it, and only one batch of
+    rows is held at a time. With `shard` as (shard, shards), only the leads of that shard
+    are loaded.
+    """
+    batch_size = batch_size or settings.LEAD_BATCH_SIZE
+    query = (
+        select(Lead.id, Lead.email, UserPreference.start_date, UserPreference.end_date,
+               UserPreference.preferred_days, func.array_agg(Center.pos_id).label("pos_ids"),
+               UserPreference.id.label("preference_id"))
+        .join(UserPreference, UserPreference.lead_id == Lead.id)
+        .join(user_preferences_centers, user_preferences_centers.c.user_preference_id == UserPreference.id)
+        .join(Center, Center.id == user_preferences_centers.c.center_id)
+        .where(UserPreference.end_date >= today)
+        .group_by(Lead.id, UserPreference.id)
+        .order_by(Lead.id, UserPreference.id)
+        .limit(batch_size)
+    )
+    if shard is not None:
+        query = query.where(lead_shard_clause(Lead.id, shard))
+    after = None
+    while True:
+        page = query if after is None else query.where(tuple_(Lead.id, UserPreference.id) > after)
+        rows = db.execute(page).all()
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        after = tuple_(rows[-1].id, rows[-1].preference_id)
+
+
+def get_lead_preferences(db: Session, today: Optional[date] = None) -> List[Row]:
+    """Every row iter_active_lead_preferences streams, as of `today` (defaults to the current date)."""
+    return [row for batch in iter_active_lead_preferences(db, today or date.today()) for row in batch]
+
+
+def match_slot_keys(db: Session, slot_keys: List[Tuple[int, date, int]],
+                    batch_size: Optional[int] = None) -> Iterator[Row]:
+    """
+    Stream the leads matching any slot key, matching them inside the database.
+
+    The (pos_id, date, weekday) keys are sent as arrays and unnested into a derived table,
+    joined by center with the preferences wanting it, and kept where the weekday is one of
+    the preferred days and the date within the window, so leads never leave the database.
+    Only preferences whose end_date is not before the earliest key date are considered, as
+    for iter_active_lead_preferences.
+
+    Returns:
+        Rows of (id, email, keys) for every lead matching at least one key, `keys` being
+        the indexes in slot_keys of the keys it matches, fetched from a server-side cursor
+        `batch_size` (defaults to settings.LEAD_BATCH_SIZE) leads at a time.
+    """
+    if not slot_keys:
+        return
+    pos_ids, dates, weekdays = (list(column) for column in zip(*slot_keys))
+    slots = func.unnest(
+        bindparam("keys", list(range(len(slot_keys))), type_=ARRAY(Integer)),
+        bindparam("pos_ids", pos_ids, type_=ARRAY(Integer)),
+        bindparam("dates", dates, type_=ARRAY(Date)),
+        bindparam("weekdays", weekdays, type_=ARRAY(Integer)),
+    ).table_valued(
+        column("key", Integer), column("pos_id", Integer), column("date", Date), column("weekday", Integer)
+    ).render_derived(name="slots")
+    query = (
+        select(Lead.id, Lead.email, func.array_agg(slots.c.key).label("keys"))
+        .select_from(slots)
+        .join(Center, Center.pos_id == slots.c.pos_id)
+        .join(user_preferences_centers, user_preferences_centers.c.center_id == Center.id)
+        .join(UserPreference, UserPreference.id == user_preferences_centers.c.user_preference_id)
+        .join(Lead, Lead.id == UserPreference.lead_id)
+        .where(
+            UserPreference.end_date >= min(dates),
+            UserPreference.end_date >= slots.c.date,
+            or_(UserPreference.start_date.is_(None), UserPreference.start_date <= slots.c.date),
+            slots.c.weekday == any_(UserPreference.preferred_days),
+        )
+        .group_by(Lead.id)
+        .execution_options(yield_per=batch_size or settings.LEAD_BATCH_SIZE)
+    )
+    yield from db.execute(query)
+
+
+def get_active_preferences_window(db: Session, today: date) -> Tuple[Optional[date], Optional[date], Set[int]]:
+    """
+    Summarize the preferences that can still match a slot.
+
+    Only preferences whose end_date is not before `today` and that have at least one
+    preferred center are considered.
+
+    Returns:
+        The earliest start_date, the latest end_date and the union of their preferred days.
+        The dates are None and the days empty when there is no active preference.
+    """
+    active = (UserPreference.end_date >= today, UserPreference.preferred_centers.any())
+    start_date, end_date = db.query(
+        func.min(UserPreference.start_date), func.max(UserPreference.end_date)
+    ).filter(*active).one()
+    days = db.query(func.unnest(UserPreference.preferred_days)).filter(*active).distinct().all()
+
+    return start_date, end_date, {day for (day,) in days}
@@ -0,0 +1,131 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_lead import lead_shard_clause
+from app.models import NotificationOutbox, NotifiedSlot
+from app.models.notification import OUTBOX_FAILED, OUTBOX_PENDING, OUTBOX_SENT
+
+
+def enqueue_notifications(db: Session, rows: List[Dict]) -> int:
+    """
+    Add pending notifications to the outbox.
+
+    Rows are inserted with one INSERT ... ON CONFLICT DO NOTHING statement per
+    settings.NOTIFICATION_OUTBOX_BATCH_SIZE rows, so a notification whose idempotency_key is
+    already in the outbox (e.g. when a crashed cycle is run again) is not queued twice.
+
+    :param db: Database session
+    :param rows: NotificationOutbox column values: lead_id, email, idempotency_key, subject and body
+    :return: Number of notifications actually queued
+    """
+    queued = 0
+    batch_size = max(1, settings.NOTIFICATION_OUTBOX_BATCH_SIZE)
+    for start in range(0, len(rows), batch_size):
+        stmt = (
+            insert(NotificationOutbox)
+            .values(rows[start:start + batch_size])
+            .on_conflict_do_nothing(constraint="uq_notification_outbox_idempotency_key")
+            .returning(NotificationOutbox.id)
+        )
+        queued += len(db.execute(stmt).all())
+    db.commit()
+    return queued
+
+
+def claim_pending_notifications(db: Session, limit: int, now: datetime) -> List[NotificationOutbox]:
+    """
+    Lock up to `limit` pending notifications that are due, oldest first.
+
+    Uses SELECT ... FOR UPDATE SKIP LOCKED: rows locked by another sender are skipped rather
+    than waited for, so any number of senders can drain the outbox concurrently. The locks
+    are held until the session commits or rolls back.
+    """
+    stmt = (
+        select(NotificationOutbox)
+        .where(NotificationOutbox.status == OUTBOX_PENDING, NotificationOutbox.next_attempt_at <= now)
+        .order_by(NotificationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return list(db.scalars(stmt))
+
+
+def mark_sent(notification: NotificationOutbox, now: datetime) -> None:
+    notification.status = OUTBOX_SENT
+    notification.attempts += 1
+    notification.sent_at = now
+    notification.last_error = None
+
+
+def mark_failed(notification: NotificationOutbox, error: str, now: datetime) -> None:
+    """
+    Record a failed send and schedule a retry with exponential backoff, or give up once
+    settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS sends have failed.
+    """
+    notification.attempts += 1
+    notification.last_error = error
+    if notification.attempts >= settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS:
+        notification.status = OUTBOX_FAILED
+        return
+    delay = settings.NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS * 2 ** (notification.attempts - 1)
+    notification.next_attempt_at = now + timedelta(seconds=delay)
+
+
+def get_notified_fingerprints(db: Session, since: datetime,
+                              shard: Optional[Tuple[int, int]] = None) -> Dict[UUID, Set[int]]:
+    """
+    Fingerprints of the slots each lead was notified about since `since`.
+
+    :param db: Database session
+    :param since: Start of the dedup window; older notifications are ignored
+    :param shard: (shard, shards) to only load the fingerprints of that shard's leads; all leads' without it
+    :return: Set of slot fingerprints per lead id, for the leads with at least one
+    """
+    fingerprints: Dict[UUID, Set[int]] = defaultdict(set)
+    stmt = select(NotifiedSlot.lead_id, NotifiedSlot.fingerprint).where(NotifiedSlot.notified_at >= since)
+    if shard is not None:
+        stmt = stmt.where(lead_shard_clause(NotifiedSlot.lead_id, shard))
+    rows = db.execute(stmt)
+    for lead_id, fingerprint in rows:
+        fingerprints[lead_id].add(fingerprint)
+    return fingerprints
+
+
+def record_notified_slots(db: Session, rows: List[Dict]) -> None:
+    """
+    Remember the slots leads were just notified about.
+
+    Rows are upserted with one INSERT ... ON CONFLICT statement per
+    settings.NOTIFICATION_OUTBOX_BATCH_SIZE rows; a slot notified again (once its window
+    expired) gets its notified_at bumped.
+
+    :param db: Database session
+    :param rows: NotifiedSlot column values: lead_id, fingerprint, slot_date and notified_at
+    """
+    batch_size = max(1, settings.NOTIFICATION_OUTBOX_BATCH_SIZE)
+    for start in range(0, len(rows), batch_size):
+        stmt = insert(NotifiedSlot).values(rows[start:start + batch_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NotifiedSlot.lead_id, NotifiedSlot.fingerprint],
+            set_={"slot_date": stmt.excluded.slot_date, "notified_at": stmt.excluded.notified_at},
+        )
+        db.execute(stmt)
+
+
+def purge_notified_slots(db: Session, since: datetime, today: date) -> int:
+    """
+    Forget notifications older than `since` and those of slots dated before `today`.
+
+    :return: Number of rows deleted
+    """
+    result = db.execute(
+        delete(NotifiedSlot).where(or_(NotifiedSlot.notified_at < since, NotifiedSlot.slot_date < today))
+    )
+    return result.rowcount
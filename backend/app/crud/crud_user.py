@@ -3,6 +3,7 @@ from typing import Type, List, Optional
 
 from sqlalchemy.orm import Session
 
+from app.crud.center_registry import center_registry
 from app.models import User, Center, Lead
 from app.schemas import UserCreate
 from app.core.security import get_password_hash, verify_password
@@ -13,7 +14,7 @@ def get_user_by_email(db: Session, email: str) -> Optional[Type[User]]:
 
 
 def get_centers(db: Session, center_ids: List[int]) -> List[Type[Center]]:
-    return db.query(Center).filter(Center.id.in_(center_ids)).all()
+    return center_registry.get_by_ids(db, center_ids)
 
 
 def create_user(db: Session, user: UserCreate):
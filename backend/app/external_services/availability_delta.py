@@ -0,0 +1,109 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from .logging_config import setup_logging
+
+
+logger = setup_logging(__name__, log_file="availability_delta.log")
+
+# (posId, date, startTm, resourceId) identifies a slot across crawls; the signature changes every request
+SlotKey = Tuple[int, str, str, int]
+
+
+def slot_key(item) -> SlotKey:
+    """Stable identity of an availability item."""
+    return item.posId, item.appointmentDt.date.isoformat(), item.startTm, item.resourceId
+
+
+@dataclass
+class AvailabilityDelta:
+    """Slots that appeared at or disappeared from a center since its previous crawl."""
+    added: List = field(default_factory=list)
+    removed: List[SlotKey] = field(default_factory=list)
+
+
+class AvailabilitySnapshotStore:
+    """
+    Last-seen slot keys per center, used to turn each crawl into added/removed deltas.
+
+    The snapshot is kept in memory and, when a path is given, loaded from and saved to a JSON
+    file so deltas stay meaningful across one-shot notifier runs. A diff only stages the
+    center's new snapshot: save() applies the staged snapshots once their new slots were
+    notified, and discard() drops them so the same slots are reported as new again.
+
+    The snapshot is shared by every lead, so a lead is never told about the slots that were
+    already open when it signed up or widened its preferences.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON file holding the snapshot; None keeps it in memory only.
+        """
+        self.path = path
+        self._snapshot: Dict[int, Set[SlotKey]] = {}
+        self._staged: Dict[int, Set[SlotKey]] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            self._load()
+
+    def diff(self, pos_id: int, items: List) -> AvailabilityDelta:
+        """
+        Compare a center's freshly crawled slots with its snapshot, staging the new snapshot.
+
+        Only call this for centers that were crawled successfully: an empty `items` list means
+        every previously seen slot at the center is gone.
+
+        Args:
+            pos_id: The crawled center.
+            items: Availability items currently offered at the center.
+
+        Returns:
+            AvailabilityDelta: The items not in the previous snapshot and the keys no longer offered.
+        """
+        previous = self._snapshot.get(pos_id, set())
+        current = {}
+        for item in items:
+            current.setdefault(slot_key(item), item)
+
+        delta = AvailabilityDelta(
+            added=[item for key, item in current.items() if key not in previous],
+            removed=[key for key in previous if key not in current],
+        )
+        if delta.added or delta.removed:
+            self._staged[pos_id] = set(current)
+            logger.info(f"Center {pos_id}: {len(delta.added)} new slots, {len(delta.removed)} gone.")
+        return delta
+
+    def save(self):
+        """Apply the staged snapshots, and persist the snapshot if it changed since it was loaded."""
+        if self._staged:
+            self._snapshot.update(self._staged)
+            self._staged = {}
+            self._dirty = True
+        if not self.path or not self._dirty:
+            return
+        data = {str(pos_id): sorted(list(key[1:]) for key in keys) for pos_id, keys in self._snapshot.items()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)  # Atomic, a crash never leaves a half-written snapshot
+        self._dirty = False
+
+    def discard(self):
+        """Drop the staged snapshots, e.g. when their new slots could not be notified."""
+        self._staged = {}
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._snapshot = {
+                int(pos_id): {(int(pos_id), date, start_tm, resource_id) for date, start_tm, resource_id in keys}
+                for pos_id, keys in data.items()
+            }
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable availability snapshot {self.path}: {e}")
+            self._snapshot = {}
@@ -1,13 +1,28 @@
+from functools import lru_cache
 from sqlite3.dbapi2 import Date
 from pydantic import BaseModel, RootModel, field_validator
-from typing import Dict, List, Optional
+from itertools import islice
+from typing import ClassVar, Dict, Iterable, Iterator, List, Optional
 from datetime import datetime
 from calendar import Day
+from app.core.config import settings
+from app.crud.center_registry import center_registry
 from app.models.center import Center
 from app.schemas.center import CenterResponse
 from sqlalchemy.orm import Session
 
 
+# A response only spans a few dozen distinct dates, so each is parsed once
+@lru_cache(maxsize=4096)
+def _parse_date_str(v: str) -> Date:
+    return datetime.strptime(v, '%Y-%m-%d').date()
+
+
+@lru_cache(maxsize=64)
+def _parse_day_str(v: str) -> Day:
+    return Day[v.strip().upper()]
+
+
 class AppointmentDt(BaseModel):
     date: Date
     dayOfWeek: Day
@@ -16,14 +31,14 @@ class AppointmentDt(BaseModel):
     @classmethod
     def _parse_date(cls, v):
         if isinstance(v, str):
-            return datetime.strptime(v, '%Y-%m-%d').date()
+            return _parse_date_str(v)
         return v
 
     @field_validator('dayOfWeek', mode='before')
     @classmethod
     def _parse_day(cls, v):
         if isinstance(v, str):
-            return Day[v.strip().upper()]
+            return _parse_day_str(v)
         return v
 
 
@@ -62,15 +77,45 @@ class AvailabilityItem(BaseModel):
 
 
 class AvailabilitySerializer(RootModel[List[AvailabilityItem]]):
+
+    # Raw items validated per pydantic call by iter_with_centers
+    STREAM_BATCH_SIZE: ClassVar[int] = 500
+
+    @classmethod
+    def iter_with_centers(cls, data: Iterable[Dict],
+                          centers: Dict[int, CenterResponse]) -> Iterator[AvailabilityItem]:
+        """
+        Validate raw availability items as they come, attaching their center.
+
+        Items are validated in batches of STREAM_BATCH_SIZE, so only one batch of raw
+        items is held at a time however long `data` is.
+
+        Args:
+            data: Raw availability items, e.g. streamed from the API
+            centers: Center schemas keyed by pos_id; items of other centers get no center
+
+        Yields:
+            AvailabilityItem with center attached, in `data` order
+        """
+        data = iter(data)
+        while batch := list(islice(data, cls.STREAM_BATCH_SIZE)):
+            yield from cls.model_validate([
+                {**item_data, 'center': centers.get(item_data.get('posId'))} for item_data in batch
+            ]).root
     
     @classmethod
-    def with_centers(cls, data: List, db: Session) -> 'AvailabilitySerializer':
+    def with_centers(cls, data: List, db: Session, fast: Optional[bool] = None) -> 'AvailabilitySerializer':
         """
         Create an AvailabilitySerializer with Center objects attached to each item.
+
+        The fast path validates the whole payload in a single pydantic call instead of one
+        call per item plus a revalidation of the list, and attaches one CenterResponse per
+        center instead of converting the center again for every slot.
         
         Args:
             data: Raw availability data from API
-            db: Database session to lookup centers
+            db: Database session to load the center registry with
+            fast: Use the fast path, defaults to settings.AVAILABILITY_FAST_DESERIALIZE
             
         Returns:
             AvailabilitySerializer with centers attached
@@ -78,9 +123,15 @@ class AvailabilitySerializer(RootModel[List[AvailabilityItem]]):
         # Get all unique pos_ids
         pos_ids = list(set(item.get('posId') for item in data))
         
-        # Query only the specific centers we need by pos_id
-        centers = db.query(Center).filter(Center.pos_id.in_(pos_ids)).all()
-        center_map = {center.pos_id: center for center in centers}
+        # Look up only the specific centers we need by pos_id
+        center_map = center_registry.by_pos_ids(db, pos_ids)
+
+        if settings.AVAILABILITY_FAST_DESERIALIZE if fast is None else fast:
+            responses = {pos_id: CenterResponse.model_validate(center) for pos_id, center in center_map.items()}
+            # CenterResponse instances are taken as they are, so every item shares its center's
+            return cls.model_validate([
+                {**item_data, 'center': responses.get(item_data.get('posId'))} for item_data in data
+            ])
         
         # Create items with centers attached during creation
         items_with_centers = []
@@ -88,5 +139,6 @@ class AvailabilitySerializer(RootModel[List[AvailabilityItem]]):
             center = center_map.get(item_data.get('posId'))
             item = AvailabilityItem.with_center(item_data, center)
             items_with_centers.append(item)
-            
-        return cls.model_validate(items_with_centers)
+
+        # Every item was validated above, so the list is wrapped without checking it again
+        return cls.model_construct(items_with_centers)
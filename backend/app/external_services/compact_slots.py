@@ -0,0 +1,126 @@
+import datetime
+from calendar import Day
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from app.external_services.availability_serializer import AppointmentDt, AvailabilityItem, DlExam
+from app.schemas.center import CenterResponse
+
+
+@lru_cache(maxsize=4096)
+def _appointment_dt(date_ordinal: int, weekday: int) -> AppointmentDt:
+    return AppointmentDt(date=datetime.date.fromordinal(date_ordinal), dayOfWeek=Day(weekday))
+
+
+@lru_cache(maxsize=1440)
+def _time_str(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+@lru_cache(maxsize=1440)
+def _minute(time_str: str) -> int:
+    hours, minutes = time_str.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+@lru_cache(maxsize=64)
+def _exam(code: str, description: str) -> DlExam:
+    return DlExam(code=code, description=description)
+
+
+class CompactSlot:
+    """
+    Memory-light stand-in for an AvailabilityItem, for holding a cycle's or a snapshot's slots.
+
+    The date is kept as an ordinal, the weekday as a calendar.Day value and the times as
+    minutes of the day; the exam and the center are references to records shared by every
+    slot. The attributes read by the matchers, the renderer and the history
+    (appointmentDt, dlExam, startTm, endTm, posId, resourceId, center) are served
+    from those, with appointmentDt and the time strings shared across slots too.
+    Use to_item() where an actual AvailabilityItem is needed.
+    """
+
+    __slots__ = ("date_ordinal", "weekday", "start_minute", "end_minute", "dlExam", "lemgMsgId", "posId",
+                 "resourceId", "signature", "center")
+
+    def __init__(self, date_ordinal: int, weekday: int, start_minute: int, end_minute: int, dlExam: DlExam,
+                 lemgMsgId: int, posId: int, resourceId: int, signature: str,
+                 center: Optional[CenterResponse] = None):
+        self.date_ordinal = date_ordinal
+        self.weekday = weekday
+        self.start_minute = start_minute
+        self.end_minute = end_minute
+        self.dlExam = dlExam
+        self.lemgMsgId = lemgMsgId
+        self.posId = posId
+        self.resourceId = resourceId
+        self.signature = signature
+        self.center = center
+
+    @classmethod
+    def from_item(cls, item: AvailabilityItem, center: Optional[CenterResponse] = None) -> 'CompactSlot':
+        """Compact `item`, attaching `center` instead of the item's own when given."""
+        return cls(
+            date_ordinal=item.appointmentDt.date.toordinal(),
+            weekday=item.appointmentDt.dayOfWeek.value,
+            start_minute=_minute(item.startTm),
+            end_minute=_minute(item.endTm),
+            dlExam=_exam(item.dlExam.code, item.dlExam.description),
+            lemgMsgId=item.lemgMsgId,
+            posId=item.posId,
+            resourceId=item.resourceId,
+            signature=item.signature,
+            center=center or item.center,
+        )
+
+    @property
+    def appointmentDt(self) -> AppointmentDt:
+        return _appointment_dt(self.date_ordinal, self.weekday)
+
+    @property
+    def startTm(self) -> str:
+        return _time_str(self.start_minute)
+
+    @property
+    def endTm(self) -> str:
+        return _time_str(self.end_minute)
+
+    def to_item(self) -> AvailabilityItem:
+        """The AvailabilityItem this slot was compacted from, with its own AppointmentDt and DlExam."""
+        return AvailabilityItem(
+            appointmentDt=self.appointmentDt.model_copy(),
+            dlExam=self.dlExam.model_copy(),
+            endTm=self.endTm,
+            lemgMsgId=self.lemgMsgId,
+            posId=self.posId,
+            resourceId=self.resourceId,
+            signature=self.signature,
+            startTm=self.startTm,
+            center=self.center,
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactSlot):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"CompactSlot(posId={self.posId}, date={self.appointmentDt.date}, "
+                f"startTm={self.startTm!r}, resourceId={self.resourceId})")
+
+
+def compact_items(items: Iterable[AvailabilityItem]) -> List[CompactSlot]:
+    """
+    Compact availability items, sharing one CenterResponse per pos_id.
+
+    Items validated one by one each carry their own copy of their center; the first copy
+    seen for a center is kept for all of its slots.
+    """
+    centers: Dict[int, Optional[CenterResponse]] = {}
+    slots = []
+    for item in items:
+        center = centers.setdefault(item.posId, item.center)
+        slots.append(CompactSlot.from_item(item, center))
+    return slots
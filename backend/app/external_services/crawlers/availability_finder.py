@@ -1,29 +1,80 @@
 import datetime
 import logging
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import requests
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from app.external_services.availability_serializer import AvailabilitySerializer
+from app.crud.center_registry import center_registry
+from app.crud.crud_availability import HistorySlot, record_availability
+from app.external_services.availability_delta import AvailabilitySnapshotStore
+from app.external_services.availability_serializer import AvailabilityItem, AvailabilitySerializer
+from app.external_services.compact_slots import compact_items
+from app.external_services.json_stream import iter_json_array
+from app.schemas.center import CenterResponse
 
-from . import constants
-from .icbc_login import get_auth_token
+from .crawl_plan import build_crawl_plan
+from .icbc_client import get_icbc_client
+from .icbc_login import token_manager
+from .poll_scheduler import CenterPollScheduler
+from .resilience import CircuitBreaker
 from app.core.config import settings
-from app.models import Center
 
 logger = logging.getLogger(__name__)
 # todo: possible substitute pos_id and id
 # todo: test this
 
-def request_available_dates(center, auth_token):
+# Skips centers that keep failing for a cool-down instead of hammering a degraded ICBC
+center_breaker = CircuitBreaker()
+
+
+def _appointment_key(item: Dict) -> Tuple:
+    return item.get('appointmentDt', {}).get('date'), item.get('startTm'), item.get('resourceId')
+
+
+def _key_hash(item: Dict) -> int:
+    return hash(_appointment_key(item))
+
+
+def _fingerprint(appointments: Optional[Iterable[Dict]]) -> Optional[int]:
+    """
+    Order-independent summary of a center's raw appointments, None if the request failed.
+
+    A sum of per-appointment hashes, so it can be accumulated one appointment at a time.
+    """
+    if appointments is None:
+        return None
+    return sum(map(_key_hash, appointments))
+
+
+def _appointments_payload(center, exam_date: Optional[datetime.date]) -> Dict:
+    return {
+        'aPosID': center.pos_id,
+        'examType': '5-R-1',
+        'examDate': (exam_date or datetime.date.today()).isoformat(),
+        'ignoreReserveTime': False,
+        'prfDaysOfWeek': '[0,1,2,3,4,5,6]',
+        'prfPartsOfDay': '[0,1]',
+        'lastName': settings.USER_LAST_NAME,
+        'licenseNumber': settings.USER_LICENSE_NUMBER,
+    }
+
+
+def request_available_dates(center, exam_date: Optional[datetime.date] = None):
     """
     Request available appointment dates for a given test center from the ICBC API.
 
+    The request is authorized with the shared token_manager, which logs in again and
+    retries once if ICBC rejects the cached token. Centers whose circuit is open in
+    center_breaker are skipped without a request.
+
     Args:
         center: An object representing the test center, expected to have at least a 'pos_id' and 'name' attribute.
-        auth_token (str): The authentication token to be used in the request headers.
+        exam_date (date, optional): First day to look for appointments from; defaults to today.
 
     Returns:
         dict or None: The JSON response from the ICBC API as a dictionary if the request is successful, otherwise None.
@@ -45,48 +96,218 @@ def request_available_dates(center, auth_token):
             }
         ]
     """
-    available_appointments_data = {
-        'aPosID': center.pos_id,
-        'examType': '5-R-1',
-        'examDate': datetime.date.today().isoformat(),
-        'ignoreReserveTime': False,
-        'prfDaysOfWeek': '[0,1,2,3,4,5,6]',
-        'prfPartsOfDay': '[0,1]',
-        'lastName': settings.USER_LAST_NAME,
-        'licenseNumber': settings.USER_LICENSE_NUMBER,
-    }
+    available_appointments_data = _appointments_payload(center, exam_date)
+    if not center_breaker.allow(center.pos_id):
+        logger.info(f"Skipping {center.name}: {center.pos_id}, too many recent failures.")
+        return
 
-    headers = {
-        **constants.LOGIN_HEADERS,
-        'Authorization': auth_token,
-    }
     try:
-        response = requests.post(settings.ICBC_APPOINTMENT_URL, headers=headers, json=available_appointments_data)
-        response.raise_for_status()
+        send = partial(get_icbc_client().get_available_appointments, available_appointments_data)
+        response = token_manager.with_token(send)
     except requests.RequestException as e:
+        center_breaker.record_failure(center.pos_id)
         logger.error(f"Failed to retrieve appointments for {center.name}: {center.pos_id}: {e}")
         return
 
+    center_breaker.record_success(center.pos_id)
     return response.json()
 
 
-def find_available_dates(db: Session) -> Tuple[List, bool]:
-    """Find available dates for appointments."""
+def stream_available_dates(center, exam_date: Optional[datetime.date] = None) -> Optional[Iterator[Dict]]:
+    """
+    Like request_available_dates, but yield the appointments while the response downloads.
+
+    The body is read settings.ICBC_STREAM_CHUNK_SIZE bytes at a time and parsed incrementally,
+    so the raw payload is never held in full. The center's circuit breaker is told about the
+    request's outcome once the body has been read to the end.
+
+    Returns:
+        Iterator over the raw appointments, or None if the center is skipped or the request fails.
+        Iterating it raises requests.RequestException if the connection breaks and ValueError if
+        the body is not a JSON array.
+    """
+    if not center_breaker.allow(center.pos_id):
+        logger.info(f"Skipping {center.name}: {center.pos_id}, too many recent failures.")
+        return
+
+    try:
+        send = partial(get_icbc_client().get_available_appointments, _appointments_payload(center, exam_date),
+                       stream=True)
+        response = token_manager.with_token(send)
+    except requests.RequestException as e:
+        center_breaker.record_failure(center.pos_id)
+        logger.error(f"Failed to retrieve appointments for {center.name}: {center.pos_id}: {e}")
+        return
+
+    def appointments() -> Iterator[Dict]:
+        try:
+            yield from iter_json_array(response.iter_content(settings.ICBC_STREAM_CHUNK_SIZE))
+        except (requests.RequestException, ValueError):
+            center_breaker.record_failure(center.pos_id)
+            raise
+        else:
+            center_breaker.record_success(center.pos_id)
+        finally:
+            response.close()
+
+    return appointments()
+
+
+def fetch_available_items(center, centers: Dict[int, CenterResponse], exam_date: Optional[datetime.date] = None,
+                          keep: Optional[Callable[[AvailabilityItem], bool]] = None,
+                          history: Optional[Set[HistorySlot]] = None
+                          ) -> Tuple[Optional[int], Optional[List[AvailabilityItem]]]:
+    """
+    Stream a center's appointments straight into serialization and filtering.
+
+    Only the kept items outlive the parsing of their batch; the raw appointments are folded
+    into the same sum _fingerprint computes as they go by. Touches no database session, so it can run
+    on the crawl thread pool.
+
+    Args:
+        center: The test center to fetch.
+        centers: Center schemas keyed by pos_id, attached to the items.
+        exam_date (date, optional): First day to look for appointments from; defaults to today.
+        keep (callable, optional): Items it returns False for are dropped; all are kept without it.
+        history (set, optional): Receives the HistorySlot of every item, kept or not.
+
+    Returns:
+        Tuple[Optional[int], Optional[List]]: The fingerprint of every appointment the center
+            returned and the kept items, both None if the request failed.
+    """
+    appointments = stream_available_dates(center, exam_date)
+    if appointments is None:
+        return None, None
+
+    fingerprint = 0
+
+    def track(raw: Iterator[Dict]) -> Iterator[Dict]:
+        nonlocal fingerprint
+        for item in raw:
+            fingerprint += _key_hash(item)
+            yield item
+
+    try:
+        items = AvailabilitySerializer.iter_with_centers(track(appointments), centers)
+        kept = []
+        for item in items:
+            if history is not None:
+                history.add(HistorySlot.from_item(item))
+            if keep is None or keep(item):
+                kept.append(item)
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"Failed to read appointments for {center.name}: {center.pos_id}: {e}")
+        return None, None
+    return fingerprint, kept
+
+
+def find_available_dates(db: Session, scheduler: Optional[CenterPollScheduler] = None,
+                         snapshot_store: Optional[AvailabilitySnapshotStore] = None) -> Tuple[List, bool]:
+    """
+    Find available dates for appointments at the centers some active lead wants.
+
+    Only the centers of the current crawl plan are fetched, and slots falling outside the
+    union of the active preferences' date windows and weekdays are dropped. Centers are
+    fetched concurrently on a thread pool bounded by
+    settings.ICBC_CRAWL_MAX_WORKERS, each request limited by settings.ICBC_REQUEST_TIMEOUT.
+    Responses are serialized on the calling thread, in center order, since the
+    database session is not thread-safe.
+
+    When a scheduler is given, only the planned centers it reports as due are fetched, and
+    each fetch outcome is recorded so the scheduler can adapt that center's polling interval.
+
+    Every slot fetched from a center that responded is written to the availability history
+    when settings.AVAILABILITY_HISTORY_ENABLED is set; only its HistorySlot is held for that.
+
+    When a snapshot store is given, each successfully fetched center is diffed against its
+    last-seen slots and only the newly appeared slots are returned.
+
+    With settings.AVAILABILITY_COMPACT_SLOTS, each center's slots are turned into CompactSlot
+    as soon as they are fetched, so the cycle only holds the compact form.
+
+    Args:
+        db: Database session used to load centers and attach them to the slots.
+        scheduler (CenterPollScheduler, optional): Scheduler deciding which centers to poll.
+        snapshot_store (AvailabilitySnapshotStore, optional): Last-seen slots per center.
+
+    Returns:
+        Tuple[List, bool]: The wanted (or, with a snapshot store, the newly appeared) available
+            slots, as AvailabilityItem or CompactSlot, and whether any of them is after today.
+    """
     all_available_slots = []
     available_tomorrow_onwards = False
-    auth_token = get_auth_token()
-    if not auth_token:
-        logger.error("Authorization failed; no available dates will be fetched.")
-        raise
-
-    for center in db.query(Center).all():
-        appointments = request_available_dates(center=center, auth_token=auth_token)
-        if not appointments:
-            continue
-        serializer = AvailabilitySerializer.with_centers(appointments, db)
-        for item in serializer.root:
-            if item.appointmentDt.date != datetime.datetime.now().date():
-                available_tomorrow_onwards = True
-            all_available_slots.append(item)
+    seen_at = datetime.datetime.now(datetime.UTC)
+    plan = build_crawl_plan(db)
+    centers = plan.centers
+    # due() takes the centers off the schedule; those left unrecorded when the crawl is cut
+    # short, e.g. by a failed login, are rescheduled as failed polls
+    unrecorded = set()
+    if scheduler is not None:
+        scheduler.sync(plan.subscribers)
+        unrecorded = set(scheduler.due())
+        centers = [center for center in centers if center.pos_id in unrecorded]
+
+    try:
+        if not centers:
+            logger.info("No centers to crawl this cycle.")
+            return all_available_slots, available_tomorrow_onwards
+
+        auth_token = token_manager.get_token()
+        if not auth_token:
+            raise RuntimeError("Authorization failed; no available dates will be fetched.")
+
+        history = {}  # HistorySlots per center, gathered as the responses stream in
+        with ThreadPoolExecutor(max_workers=max(1, settings.ICBC_CRAWL_MAX_WORKERS)) as executor:
+            if settings.ICBC_STREAM_APPOINTMENTS:
+                schemas = {
+                    pos_id: CenterResponse.model_validate(center)
+                    for pos_id, center in center_registry.by_pos_ids(
+                        db, [center.pos_id for center in centers]).items()
+                }
+                # Only the wanted items are kept; the history gets every slot's HistorySlot
+                if settings.AVAILABILITY_HISTORY_ENABLED:
+                    history = {center.pos_id: set() for center in centers}
+                fetch = partial(fetch_available_items, centers=schemas, exam_date=plan.exam_date, keep=plan.wants)
+                results = list(executor.map(lambda center: fetch(center, history=history.get(center.pos_id)), centers))
+            else:
+                fetch = partial(request_available_dates, exam_date=plan.exam_date)
+                responses = list(executor.map(fetch, centers))
+                results = (
+                    (_fingerprint(appointments),
+                     None if appointments is None else
+                     AvailabilitySerializer.with_centers(appointments, db).root if appointments else [])
+                    for appointments in responses
+                )
+
+        observed = {}  # HistorySlots per center that responded
+        for center, (fingerprint, fetched) in zip(centers, results):
+            if scheduler is not None:
+                scheduler.record(center.pos_id, fingerprint)
+                unrecorded.discard(center.pos_id)
+            if fetched is None:
+                continue  # Failed request: keep the center's snapshot and history as they were
+            if settings.AVAILABILITY_HISTORY_ENABLED:
+                if center.pos_id not in history:  # Not streamed
+                    history[center.pos_id] = {HistorySlot.from_item(item) for item in fetched}
+                observed[center.pos_id] = history[center.pos_id]
+            items = [item for item in fetched if plan.wants(item)]
+            if settings.AVAILABILITY_COMPACT_SLOTS:
+                items = compact_items(items)
+            if snapshot_store is not None:
+                items = snapshot_store.diff(center.pos_id, items).added
+            for item in items:
+                if item.appointmentDt.date != datetime.datetime.now().date():
+                    available_tomorrow_onwards = True
+                all_available_slots.append(item)
+    finally:
+        for pos_id in unrecorded:
+            scheduler.record(pos_id, None)
+
+    if settings.AVAILABILITY_HISTORY_ENABLED:
+        try:
+            record_availability(db, observed, seen_at, plan.exam_date)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Failed to record availability history: {e}")
 
     return all_available_slots, available_tomorrow_onwards
@@ -0,0 +1,66 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.crud.crud_center import get_subscribed_centers
+from app.crud.crud_lead import get_active_preferences_window
+from app.models import Center
+
+
+@dataclass
+class CrawlPlan:
+    """
+    What a crawl cycle has to fetch, derived from the preferences that can still match a slot.
+
+    Attributes:
+        centers: Centers referenced by at least one active preference.
+        subscribers: Number of active preferences per center pos_id.
+        start_date: Earliest start_date of the active preferences.
+        end_date: Latest end_date of the active preferences.
+        days: Union of the preferred days (calendar.Day values) of the active preferences.
+    """
+    centers: List[Center] = field(default_factory=list)
+    subscribers: Dict[int, int] = field(default_factory=dict)
+    start_date: Optional[datetime.date] = None
+    end_date: Optional[datetime.date] = None
+    days: Set[int] = field(default_factory=set)
+
+    @property
+    def exam_date(self) -> datetime.date:
+        """First day worth asking ICBC about."""
+        today = datetime.date.today()
+        return max(today, self.start_date) if self.start_date else today
+
+    def wants(self, item) -> bool:
+        """Whether an availability item can match at least one active preference."""
+        return (
+            self.start_date is not None and
+            self.start_date <= item.appointmentDt.date <= self.end_date and
+            item.appointmentDt.dayOfWeek.value in self.days
+        )
+
+
+def build_crawl_plan(db: Session, today: Optional[datetime.date] = None) -> CrawlPlan:
+    """
+    Compute the crawl plan for the current cycle.
+
+    Args:
+        db: Database session.
+        today: Preferences ending before this day are ignored; defaults to today.
+
+    Returns:
+        CrawlPlan: Centers to fetch and the union of the active date windows and weekdays.
+    """
+    today = today or datetime.date.today()
+    subscribed = get_subscribed_centers(db, today)
+    start_date, end_date, days = get_active_preferences_window(db, today)
+
+    return CrawlPlan(
+        centers=[center for center, _ in subscribed],
+        subscribers={center.pos_id: count for center, count in subscribed},
+        start_date=start_date,
+        end_date=end_date,
+        days=days,
+    )
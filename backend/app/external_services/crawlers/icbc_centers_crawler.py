@@ -1,16 +1,18 @@
 from typing import List, Dict
 from datetime import datetime
+from functools import partial
 
 import requests
 
-from app.core.config import settings
+from app.crud.center_registry import center_registry
 from app.db.session import db_session_as_context
 from app.models import Center
 from app.external_services.crawlers import constants
+from app.external_services.crawlers.icbc_client import get_icbc_client
 from app.external_services.logging_config import setup_logging
-from .icbc_login import get_auth_token
+from .icbc_login import token_manager
 
-logger = setup_logging(__name__, log_file="icbc_centers_crawler.py")
+logger = setup_logging(__name__, log_file="icbc_centers_crawler.log")
 
 
 class ICBCCentersCrawler:
@@ -26,26 +28,23 @@ class ICBCCentersCrawler:
                         self.update_or_create(db, center)
                     except Exception as e:
                         logger.error(f"Failed to update or create center: {str(e)}")
+            # Serve the updated rows from now on; other processes pick them up after the TTL
+            center_registry.invalidate()
         except Exception as e:
             logger.error(f"Error in run: {str(e)}")
 
     def scrape_icbc_locations(self) -> List[Dict]:
         """Scrape ICBC all locations."""
-        url = settings.ICBC_TEST_CENTERS_LOCATION_URL
         exam_type = "5-R-1"
         today_date = datetime.now().strftime("%Y-%m-%d")
 
         # Get authorization token
-        auth_token = get_auth_token()
+        auth_token = token_manager.get_token()
         if not auth_token:
             logger.error("Failed to retrieve Authorization token.")
             return []
 
-        headers = {
-            **constants.TEST_CENTERS_HEADERS,
-            "Authorization": auth_token,
-        }
-
+        client = get_icbc_client()
         results = []
         for location in constants.TEST_LOCATIONS_TO_SCRAPE:
             city = location['city']
@@ -60,8 +59,8 @@ class ICBCCentersCrawler:
             }
 
             try:
-                response = requests.put(url, headers=headers, json=body, timeout=10)
-                response.raise_for_status()  # Raise HTTP error for bad responses (4xx or 5xx)
+                # Raises on 4xx or 5xx responses, after one retry with a fresh token on a 401
+                response = token_manager.with_token(partial(client.get_test_centers, body))
                 data = response.json()
                 logger.info(f"Appointments for {city}: {data}")
                 if isinstance(data, list):
@@ -76,30 +75,31 @@ class ICBCCentersCrawler:
     def update_or_create(self, db, center):
         """Save scraped data to the database."""
         try:
-            center = db.query(Center).filter(Center.pos_id == center['pos']['posId']).first()
+            pos = center['pos']
+            db_center = db.query(Center).filter(Center.pos_id == pos['posId']).first()
             # TODO: refactor to **dict for cleaner code this if block and else block
-            if not center:
-                center = Center(
-                    pos_id=center['pos']['posId'],
-                    name=center['pos']['agency'],
-                    address=center['pos']['address'],
-                    city=center['pos']['city'],
-                    postal_code=center['pos']['postcode'],
-                    lng=center['pos']['lng'],
-                    lat=center['pos']['lat'],
-                    url=center['pos']['url']
+            if not db_center:
+                db_center = Center(
+                    pos_id=pos['posId'],
+                    name=pos['agency'],
+                    address=pos['address'],
+                    city=pos['city'],
+                    postal_code=pos['postcode'],
+                    lng=pos['lng'],
+                    lat=pos['lat'],
+                    url=pos['url']
                 )
-                db.add(center)
-                logger.info(f"Saved center with pos ID: {center['pos']['posId']}.")
+                db.add(db_center)
+                logger.info(f"Saved center with pos ID: {pos['posId']}.")
             else:
-                center.name = center['pos']['agency']
-                center.address = center['pos']['address']
-                center.city = center['pos']['city']
-                center.postal_code = center['pos']['postcode']
-                center.lng = center['pos']['lng']
-                center.lat = center['pos']['lat']
-                center.url = center['pos']['url']
-                logger.info(f"Updated center with pos ID: {center['pos']['posId']}.")
+                db_center.name = pos['agency']
+                db_center.address = pos['address']
+                db_center.city = pos['city']
+                db_center.postal_code = pos['postcode']
+                db_center.lng = pos['lng']
+                db_center.lat = pos['lat']
+                db_center.url = pos['url']
+                logger.info(f"Updated center with pos ID: {pos['posId']}.")
             db.commit()
         except Exception as e:
             logger.error(f"Failed to save center with pos ID: {center.get('pos', {}).get('posId', 'UNKNOWN')}. Error: {str(e)}")
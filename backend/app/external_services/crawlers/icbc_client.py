@@ -0,0 +1,102 @@
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+from app.external_services.crawlers import constants
+from app.external_services.crawlers.resilience import TokenBucket, call_with_retries
+
+
+class ICBCClient:
+    """
+    HTTP client shared by every ICBC call (login, appointments, locations).
+
+    Wraps a single requests.Session whose connection pool keeps connections to
+    onlinebusiness.icbc.com alive, so consecutive requests skip the TCP+TLS handshake.
+    Every attempt, retries included, first takes a token from a rate limiter shared by all
+    callers, and retryable failures are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, pool_connections: Optional[int] = None,
+                 pool_maxsize: Optional[int] = None, rate_limiter: Optional[TokenBucket] = None,
+                 retry_attempts: Optional[int] = None):
+        """
+        Args:
+            timeout: Seconds per request, defaults to settings.ICBC_REQUEST_TIMEOUT.
+            pool_connections: Number of per-host pools, defaults to settings.ICBC_POOL_CONNECTIONS.
+            pool_maxsize: Connections kept per host, defaults to settings.ICBC_POOL_MAXSIZE.
+            rate_limiter: Limiter for every ICBC request, defaults to a settings-configured TokenBucket.
+            retry_attempts: Attempts per request, defaults to settings.ICBC_RETRY_ATTEMPTS.
+        """
+        self.timeout = timeout if timeout is not None else settings.ICBC_REQUEST_TIMEOUT
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.retry_attempts = retry_attempts
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections or settings.ICBC_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or settings.ICBC_POOL_MAXSIZE,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, headers: Dict, **kwargs) -> requests.Response:
+        """Send a rate-limited, retried request over the pooled session and raise on 4xx/5xx responses."""
+        kwargs.setdefault("timeout", self.timeout)
+
+        def send() -> requests.Response:
+            self.rate_limiter.acquire()
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                # Nobody reads a failed streamed body, so hand its connection back to the pool now
+                response.close()
+                raise
+            return response
+
+        return call_with_retries(send, attempts=self.retry_attempts)
+
+    def login(self, payload: Dict) -> requests.Response:
+        """Log in to ICBC; the auth token is returned in the Authorization response header."""
+        return self.request("PUT", settings.ICBC_LOGIN_URL, headers=constants.LOGIN_HEADERS, json=payload)
+
+    def get_available_appointments(self, payload: Dict, auth_token: str, stream: bool = False) -> requests.Response:
+        """
+        Request the available appointments of one test center.
+
+        With `stream`, only the headers are read; the body is read while iterating the
+        response, which must then be consumed or closed to release the connection.
+        """
+        headers = {
+            **constants.LOGIN_HEADERS,
+            "Authorization": auth_token,
+        }
+        return self.request("POST", settings.ICBC_APPOINTMENT_URL, headers=headers, json=payload, stream=stream)
+
+    def get_test_centers(self, payload: Dict, auth_token: str) -> requests.Response:
+        """Request the test centers around a location."""
+        headers = {
+            **constants.TEST_CENTERS_HEADERS,
+            "Authorization": auth_token,
+        }
+        return self.request("PUT", settings.ICBC_TEST_CENTERS_LOCATION_URL, headers=headers, json=payload)
+
+    def close(self):
+        """Close every pooled connection."""
+        self.session.close()
+
+
+_client: Optional[ICBCClient] = None
+_client_lock = threading.Lock()
+
+
+def get_icbc_client() -> ICBCClient:
+    """Return the process-wide ICBC client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ICBCClient()
+    return _client
@@ -1,28 +1,101 @@
+import threading
+import time
+from typing import Callable, Optional
+
 import requests
+from jose import jwt, JWTError
 
-from app.external_services.crawlers import constants
 from app.core.config import settings
+from app.external_services.crawlers.icbc_client import get_icbc_client
 from app.external_services.logging_config import setup_logging
 
 
-logger = setup_logging(__name__, log_file="icbc_login.py")
+logger = setup_logging(__name__, log_file="icbc_login.log")
 
 
 def get_auth_token():
     """Get authentication token."""
     try:
-        response = requests.put(
-            settings.ICBC_LOGIN_URL,
-            headers=constants.LOGIN_HEADERS,
-            json={
+        response = get_icbc_client().login({
             'drvrLastName': settings.USER_LAST_NAME,
             'licenceNumber': settings.USER_LICENSE_NUMBER,
             'keyword': settings.USER_KEYWORD
-        },
-            timeout=10
-        )
-        response.raise_for_status()
+        })
         return response.headers.get('Authorization', None)
     except requests.RequestException as e:
         logger.error(f"Authentication failed: {e}")
         raise e
+
+
+class ICBCTokenManager:
+    """
+    Cache of the ICBC Authorization header shared by every crawler in the process.
+
+    The token's lifetime is read from the JWT `exp` claim when there is one, otherwise it is
+    assumed to live settings.ICBC_TOKEN_TTL_SECONDS. It is refreshed
+    settings.ICBC_TOKEN_REFRESH_MARGIN_SECONDS before it expires, or as soon as ICBC rejects it.
+    """
+
+    def __init__(self, login: Optional[Callable[[], Optional[str]]] = None):
+        """
+        Args:
+            login: Callable returning a fresh Authorization header, defaults to get_auth_token.
+        """
+        self._login = login
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+
+    def get_token(self) -> Optional[str]:
+        """Return the cached token, logging in again if there is none or it is about to expire."""
+        with self._lock:
+            if self._token is None or time.time() >= self._expires_at:
+                token = self._login() if self._login else get_auth_token()
+                self._token = token
+                self._expires_at = self._expiry(token) if token else 0.0
+            return self._token
+
+    def invalidate(self, token: Optional[str] = None):
+        """
+        Drop the cached token.
+
+        When `token` is given, the cache is only dropped if it still holds that token, so
+        concurrent requests rejected with the same token trigger a single login.
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def with_token(self, send: Callable[[str], requests.Response]) -> requests.Response:
+        """
+        Call `send` with the current token, refreshing it and retrying once on a 401.
+
+        Args:
+            send: Callable performing the request with the given Authorization header.
+
+        Returns:
+            requests.Response: The response of the successful attempt.
+        """
+        token = self.get_token()
+        try:
+            return send(token)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise
+            logger.info("ICBC rejected the auth token; logging in again.")
+            self.invalidate(token)
+            return send(self.get_token())
+
+    @staticmethod
+    def _expiry(token: str) -> float:
+        """Epoch time after which `token` should no longer be used."""
+        try:
+            claims = jwt.get_unverified_claims(token.removeprefix('Bearer ').strip())
+            expires_at = float(claims['exp'])
+        except (JWTError, KeyError, TypeError, ValueError):
+            expires_at = time.time() + settings.ICBC_TOKEN_TTL_SECONDS
+        return expires_at - settings.ICBC_TOKEN_REFRESH_MARGIN_SECONDS
+
+
+token_manager = ICBCTokenManager()
@@ -0,0 +1,120 @@
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, List, Optional
+
+from app.core.config import settings
+
+
+class CenterPollScheduler:
+    """
+    Priority queue deciding which centers to poll next.
+
+    The global request budget (settings.ICBC_POLL_BUDGET_PER_MINUTE) is shared between
+    centers in proportion to their weight, `subscribers * (1 + change_rate)`, where
+    change_rate is a moving average of how often a center's availability changed between
+    polls. Busy centers are therefore polled close to settings.ICBC_POLL_MIN_INTERVAL_SECONDS
+    and idle ones close to settings.ICBC_POLL_MAX_INTERVAL_SECONDS. Newly scheduled centers
+    are due immediately, and due() never hands out more polls than the budget allows over a
+    rolling minute, so polls are spread out instead of fired in bursts.
+    """
+
+    def __init__(self, budget_per_minute: Optional[int] = None, min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None, change_decay: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.budget_per_minute = budget_per_minute or settings.ICBC_POLL_BUDGET_PER_MINUTE
+        self.min_interval = min_interval or settings.ICBC_POLL_MIN_INTERVAL_SECONDS
+        self.max_interval = max_interval or settings.ICBC_POLL_MAX_INTERVAL_SECONDS
+        self.change_decay = settings.ICBC_POLL_CHANGE_DECAY if change_decay is None else change_decay
+        self._clock = clock
+
+        self._heap = []  # (next_poll_at, sequence, pos_id), stale entries are skipped lazily
+        self._sequence = itertools.count()
+        self._next_poll_at: Dict[int, float] = {}
+        self._subscribers: Dict[int, int] = {}
+        self._change_rate: Dict[int, float] = {}
+        self._fingerprints: Dict[int, Hashable] = {}
+        self._recent_polls = deque()
+
+    def sync(self, subscribers: Dict[int, int]):
+        """
+        Align the scheduled centers with the current subscriber counts.
+
+        Args:
+            subscribers: Number of active preferences per center pos_id. Centers missing from
+                it are no longer polled; new ones are due immediately.
+        """
+        now = self._clock()
+        for pos_id in set(self._subscribers) - set(subscribers):
+            self._forget(pos_id)
+        for pos_id, count in subscribers.items():
+            if pos_id not in self._subscribers:
+                self._change_rate[pos_id] = 1.0
+                self._schedule(pos_id, now)
+            self._subscribers[pos_id] = count
+
+    def due(self) -> List[int]:
+        """Pop the centers whose poll time has come, within the remaining request budget."""
+        now = self._clock()
+        while self._recent_polls and self._recent_polls[0] <= now - 60:
+            self._recent_polls.popleft()
+
+        due = []
+        while self._heap and len(self._recent_polls) < self.budget_per_minute:
+            next_poll_at, _, pos_id = self._heap[0]
+            if self._next_poll_at.get(pos_id) != next_poll_at:
+                heapq.heappop(self._heap)  # Superseded or forgotten entry
+                continue
+            if next_poll_at > now:
+                break
+            heapq.heappop(self._heap)
+            del self._next_poll_at[pos_id]
+            self._recent_polls.append(now)
+            due.append(pos_id)
+        return due
+
+    def record(self, pos_id: int, fingerprint: Optional[Hashable]):
+        """
+        Record the outcome of polling a center and schedule its next poll.
+
+        Args:
+            pos_id: The polled center.
+            fingerprint: Hashable summary of the center's availability, or None if the poll
+                failed. A fingerprint different from the previous one counts as a change.
+        """
+        if pos_id not in self._subscribers:
+            return
+        if fingerprint is not None:
+            changed = pos_id in self._fingerprints and self._fingerprints[pos_id] != fingerprint
+            self._fingerprints[pos_id] = fingerprint
+            self._change_rate[pos_id] = (
+                self.change_decay * self._change_rate[pos_id] + (1 - self.change_decay) * changed
+            )
+        self._schedule(pos_id, self._clock() + self.interval(pos_id))
+
+    def interval(self, pos_id: int) -> float:
+        """Seconds between two polls of a center, given its share of the request budget."""
+        total_weight = sum(self._weight(p) for p in self._subscribers)
+        weight = self._weight(pos_id)
+        if not weight:
+            return self.max_interval
+        polls_per_minute = self.budget_per_minute * weight / total_weight
+        return min(self.max_interval, max(self.min_interval, 60 / polls_per_minute))
+
+    def seconds_until_due(self) -> Optional[float]:
+        """Seconds until the earliest scheduled poll, or None if nothing is scheduled."""
+        if not self._next_poll_at:
+            return None
+        return max(0.0, min(self._next_poll_at.values()) - self._clock())
+
+    def _weight(self, pos_id: int) -> float:
+        return self._subscribers.get(pos_id, 0) * (1 + self._change_rate.get(pos_id, 0.0))
+
+    def _schedule(self, pos_id: int, at: float):
+        self._next_poll_at[pos_id] = at
+        heapq.heappush(self._heap, (at, next(self._sequence), pos_id))
+
+    def _forget(self, pos_id: int):
+        for state in (self._next_poll_at, self._subscribers, self._change_rate, self._fingerprints):
+            state.pop(pos_id, None)
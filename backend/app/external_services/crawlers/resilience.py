@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, TypeVar
+
+import requests
+
+from app.core.config import settings
+
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Tokens are refilled continuously at `rate` per second up to `capacity`; acquire() blocks
+    until a token is available, so bursts of at most `capacity` requests are allowed and the
+    long-run rate never exceeds `rate`.
+    """
+
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate or settings.ICBC_RATE_LIMIT_PER_SECOND
+        self.capacity = capacity or settings.ICBC_RATE_LIMIT_BURST
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self.capacity)
+        self._updated_at = clock()
+
+    def acquire(self):
+        """Take one token, waiting for the bucket to refill if it is empty."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Connection problems, timeouts, 429 and 5xx responses are worth retrying."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def call_with_retries(send: Callable[[], T], attempts: Optional[int] = None,
+                      base_delay: Optional[float] = None, max_delay: Optional[float] = None,
+                      sleep: Optional[Callable[[float], None]] = None) -> T:
+    """
+    Call `send`, retrying retryable request errors with exponential backoff and full jitter.
+
+    The n-th retry waits a random time between 0 and min(max_delay, base_delay * 2 ** n), so
+    concurrent callers hitting the same failure do not retry in lockstep.
+
+    Args:
+        send: The request to perform.
+        attempts: Total number of attempts, defaults to settings.ICBC_RETRY_ATTEMPTS.
+        base_delay: Backoff of the first retry, defaults to settings.ICBC_RETRY_BASE_DELAY_SECONDS.
+        max_delay: Backoff cap, defaults to settings.ICBC_RETRY_MAX_DELAY_SECONDS.
+
+    Returns:
+        The result of the first successful attempt. The last error is raised once the attempts
+        are exhausted; non-retryable errors are raised immediately.
+    """
+    attempts = max(1, attempts or settings.ICBC_RETRY_ATTEMPTS)
+    base_delay = settings.ICBC_RETRY_BASE_DELAY_SECONDS if base_delay is None else base_delay
+    max_delay = settings.ICBC_RETRY_MAX_DELAY_SECONDS if max_delay is None else max_delay
+    sleep = sleep or time.sleep
+
+    for attempt in range(attempts):
+        try:
+            return send()
+        except requests.RequestException as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Per-key circuit breaker.
+
+    After `failure_threshold` consecutive failures a key's circuit opens and allow() rejects it
+    for `cooldown` seconds. Then a single trial call is let through: success closes the
+    circuit, failure opens it for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = None, cooldown: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold or settings.ICBC_CIRCUIT_FAILURE_THRESHOLD
+        self.cooldown = settings.ICBC_CIRCUIT_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures: Dict[Hashable, int] = {}
+        self._open_until: Dict[Hashable, float] = {}
+
+    def allow(self, key: Hashable) -> bool:
+        """Whether a call for `key` may be attempted now."""
+        with self._lock:
+            open_until = self._open_until.get(key)
+            if open_until is None:
+                return True
+            if self._clock() < open_until:
+                return False
+            # Half-open: let this call through, keep others out until it reports back
+            self._open_until[key] = self._clock() + self.cooldown
+            return True
+
+    def record_success(self, key: Hashable):
+        with self._lock:
+            self._failures.pop(key, None)
+            self._open_until.pop(key, None)
+
+    def record_failure(self, key: Hashable):
+        with self._lock:
+            failures = self._failures.get(key, 0) + 1
+            self._failures[key] = failures
+            if failures >= self.failure_threshold:
+                self._open_until[key] = self._clock() + self.cooldown
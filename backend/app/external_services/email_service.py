@@ -1,5 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.message import Message
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from queue import Empty, LifoQueue
+from typing import Callable, Iterable, List, Optional, Tuple, Union
 import smtplib
 
 from app.core.config import settings
@@ -9,6 +14,20 @@ from .logging_config import setup_logging
 logger = setup_logging(__name__, log_file="email_service.log")
 
 
+def build_message(subject, message, from_header, sender_email, to_emails, subtype='html') -> MIMEMultipart:
+    """Create an email message."""
+    msg = MIMEMultipart('alternative') # todo: what is subtype
+    msg['Subject'] = subject
+    msg['From'] = f'{from_header}{sender_email}'
+    msg['To'] = to_emails
+
+    # Attach content
+    part = MIMEText(message, subtype)
+    msg.attach(part)
+
+    return msg
+
+
 class SMTPGmailService:
     SMTP_SERVER = settings.SMTP_SERVER
     SMTP_PORT = settings.SMTP_PORT
@@ -17,7 +36,8 @@ class SMTPGmailService:
         """
         Initialize the SendEmail class with SMTP server connection and login.
 
-        This method sets up an SMTP connection, upgrades it to a secure SSL/TLS connection,
+        This method sets up an SMTP connection, upgrades it to a secure SSL/TLS connection
+        (unless settings.SMTP_STARTTLS is off, e.g. for a local stand-in),
         and logs in using the provided credentials.
 
         Parameters:
@@ -25,29 +45,38 @@ class SMTPGmailService:
         sender_email (str): The email address of the sender.
         to_emails (str): A comma-separated string of recipient email addresses.
         """
-        self.server = smtplib.SMTP(self.SMTP_SERVER, self.SMTP_PORT)
-        self.server.starttls()  # Upgrade the connection to a secure encrypted SSL/TLS connection
-        self.server.login(sender_email, app_password)
+        self.app_password = app_password
         self.sender_email = sender_email
         self.to_emails = to_emails
+        self.server = self._connect()
 
-    def create_message(self, subject, message, from_header, subtype='html'):
-        """Create an email message."""
-        msg = MIMEMultipart('alternative') # todo: what is subtype
-        msg['Subject'] = subject
-        msg['From'] = f'{from_header}{self.sender_email}'
-        msg['To'] = self.to_emails
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.SMTP_SERVER, self.SMTP_PORT, timeout=settings.SMTP_TIMEOUT)
+        try:
+            if settings.SMTP_STARTTLS:
+                server.starttls()  # Upgrade the connection to a secure encrypted SSL/TLS connection
+            server.login(self.sender_email, self.app_password)
+        except Exception:
+            server.close()
+            raise
+        return server
 
-        # Attach content
-        part = MIMEText(message, subtype)
-        msg.attach(part)
+    def reconnect(self):
+        """Drop the current connection, if still open, and log in over a new one."""
+        try:
+            self.server.close()
+        finally:
+            self.server = self._connect()
 
-        return msg
+    def create_message(self, subject, message, from_header, subtype='html'):
+        """Create an email message."""
+        return build_message(subject, message, from_header, self.sender_email, self.to_emails, subtype)
 
     def send_message(self, message):
-        """Send the email message using Gmail SMTP."""
+        """Send the email message using Gmail SMTP; `message` may already be serialized with as_string()."""
         try:
-            self.server.sendmail(self.sender_email, self.to_emails.split(', '), message.as_string())
+            body = message if isinstance(message, str) else message.as_string()
+            self.server.sendmail(self.sender_email, self.to_emails.split(', '), body)
             logger.info("Email sent successfully!")
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
@@ -56,3 +85,131 @@ class SMTPGmailService:
     def close_connection(self):
         """Close the SMTP connection."""
         self.server.quit()
+
+
+@dataclass
+class DispatchResult:
+    key: str  # What the message was queued under, e.g. the lead's email
+    sent: bool
+    attempts: int  # Sends tried, reconnects included
+    error: Optional[str] = None
+
+
+class SMTPDispatcher:
+    """
+    Send many messages in parallel over a pool of authenticated SMTP connections.
+
+    Up to `pool_size` workers take messages from a queue, each sending over a connection
+    borrowed from the pool and returned after the send, so connections (and their
+    STARTTLS + login handshake) are reused across messages and across send_messages calls.
+    A connection that drops (SMTPServerDisconnected or a socket error) is reconnected and the
+    message retried, up to `attempts` sends; other SMTP errors, such as a refused recipient,
+    fail only that message.
+    """
+
+    def __init__(self, connect: Callable[[], SMTPGmailService], sender_email: str, to_emails: str,
+                 pool_size: Optional[int] = None, attempts: Optional[int] = None):
+        """
+        Args:
+            connect: Opens a new authenticated connection, e.g. an SMTPGmailService factory.
+            sender_email: Sender of the messages built by create_message.
+            to_emails: Recipients of the messages built by create_message.
+            pool_size: Parallel sends and pooled connections, defaults to settings.SMTP_POOL_SIZE.
+            attempts: Sends per message, defaults to settings.SMTP_SEND_ATTEMPTS.
+        """
+        self.connect = connect
+        self.sender_email = sender_email
+        self.to_emails = to_emails
+        self.pool_size = max(1, pool_size or settings.SMTP_POOL_SIZE)
+        self.attempts = max(1, attempts or settings.SMTP_SEND_ATTEMPTS)
+        self._idle: LifoQueue = LifoQueue()
+
+    def create_message(self, subject, message, from_header, subtype='html'):
+        """Create an email message."""
+        return build_message(subject, message, from_header, self.sender_email, self.to_emails, subtype)
+
+    def send_messages(self, messages: Iterable[Tuple[str, Union[Message, str]]]) -> List[DispatchResult]:
+        """
+        Send every (key, message) pair; never raises for a failed message.
+
+        Returns:
+            List[DispatchResult]: One result per message, in the order given.
+        """
+        with ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="smtp") as executor:
+            return list(executor.map(lambda pair: self._send(*pair), messages))
+
+    def _send(self, key: str, message: Message) -> DispatchResult:
+        connection = self._acquire()
+        error = None
+        for attempt in range(1, self.attempts + 1):
+            try:
+                if connection is None:
+                    connection = self.connect()
+                elif attempt > 1:
+                    connection.reconnect()
+            except Exception as e:
+                error = e
+                logger.warning(f"Failed to connect to SMTP sending to {key} (attempt {attempt}/{self.attempts}): {e}")
+                continue
+
+            try:
+                connection.send_message(message)
+            except smtplib.SMTPServerDisconnected as e:
+                error = e
+            except smtplib.SMTPException as e:
+                # The connection is still usable; only this message is rejected
+                self._idle.put(connection)
+                return DispatchResult(key, sent=False, attempts=attempt, error=str(e))
+            except OSError as e:  # Reset or timed out socket
+                error = e
+            except Exception as e:
+                self._discard(connection)
+                return DispatchResult(key, sent=False, attempts=attempt, error=str(e))
+            else:
+                self._idle.put(connection)
+                return DispatchResult(key, sent=True, attempts=attempt)
+            logger.warning(f"SMTP connection lost sending to {key} (attempt {attempt}/{self.attempts}): {error}")
+
+        self._discard(connection)
+        logger.error(f"Failed to send message to {key}: {error}")
+        return DispatchResult(key, sent=False, attempts=self.attempts, error=str(error))
+
+    def _acquire(self) -> Optional[SMTPGmailService]:
+        """An idle pooled connection, None when a new one has to be opened."""
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            return None
+
+    @staticmethod
+    def _discard(connection: Optional[SMTPGmailService]):
+        if connection is None:
+            return
+        try:
+            connection.server.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close every pooled connection."""
+        while True:
+            connection = self._acquire()
+            if connection is None:
+                return
+            try:
+                connection.close_connection()
+            except Exception as e:
+                logger.warning(f"Failed to close SMTP connection: {e}")
+
+
+def build_dispatcher() -> SMTPDispatcher:
+    """SMTP dispatcher for the configured Gmail account; it only connects once a message is sent."""
+    return SMTPDispatcher(
+        connect=lambda: SMTPGmailService(
+            app_password=settings.APP_PASSWORD,
+            sender_email=settings.SENDER_EMAIL,
+            to_emails=settings.TO_EMAILS
+        ),
+        sender_email=settings.SENDER_EMAIL,
+        to_emails=settings.TO_EMAILS,
+    )
@@ -0,0 +1,77 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_WHITESPACE = " \t\n\r"
+_ELEMENT_END = _WHITESPACE + ",]"
+
+
+def iter_json_array(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array as its bytes arrive.
+
+    Only the element being parsed is buffered, so memory stays bounded by the largest
+    element and the chunk size rather than the whole document.
+
+    Args:
+        chunks: The document in pieces of any size, e.g. requests.Response.iter_content().
+        encoding: Encoding of the document.
+
+    Raises:
+        ValueError: The document is not a well-formed JSON array.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder(encoding)()
+    buffer = ""
+    position = 0
+    started = finished = expect_value = False
+    empty = True
+    chunks = iter(chunks)
+    at_end = False
+
+    while not at_end:
+        chunk = next(chunks, None)
+        at_end = chunk is None
+        buffer = buffer[position:] + text.decode(chunk or b"", final=at_end)
+        position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                break
+            if finished:
+                raise ValueError(f"Unexpected data after the JSON array: {buffer[position:position + 20]!r}")
+
+            char = buffer[position]
+            if not started:
+                if char != "[":
+                    raise ValueError(f"Expected a JSON array, got {buffer[position:position + 20]!r}")
+                started = expect_value = True
+                position += 1
+                continue
+            if char == "]" and (not expect_value or empty):
+                finished = True
+                position += 1
+                continue
+            if not expect_value:
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+                expect_value = True
+                position += 1
+                continue
+
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if at_end:
+                    raise
+                break  # The element continues in the next chunk
+            if not at_end and (end == len(buffer) or buffer[end] not in _ELEMENT_END):
+                break  # A number may continue in the next chunk, e.g. "1" then ".5"
+            yield value
+            position = end
+            expect_value = empty = False
+
+    if not finished:
+        raise ValueError("Truncated JSON array")
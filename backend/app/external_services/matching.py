@@ -0,0 +1,310 @@
+import datetime
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, ContextManager, DefaultDict, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.crud.crud_lead import match_slot_keys
+
+try:
+    import numpy as np
+except ImportError:  # Only the "numpy" MATCHING_ENGINE needs it
+    np = None
+
+# (center pos_id, weekday value) a lead is indexed under
+BucketKey = Tuple[int, int]
+
+
+@dataclass(frozen=True, slots=True)
+class LeadCriteria:
+    """What a lead wants, flattened out of its Lead/UserPreference/Center rows."""
+    email: str
+    pos_ids: FrozenSet[int]
+    days: FrozenSet[int]
+    start_date: datetime.date
+    end_date: datetime.date
+    id: Optional[UUID] = None
+
+    @classmethod
+    def create(cls, lead_id, email, pos_ids, days, start_date, end_date) -> Optional['LeadCriteria']:
+        """Criteria of a lead, None if it cannot match anything."""
+        pos_ids = frozenset(pos_ids or [])
+        days = frozenset(days or [])
+        if not email or not pos_ids or not days:
+            return None
+        return cls(
+            email=email,
+            pos_ids=pos_ids,
+            days=days,
+            start_date=start_date or datetime.date.min,
+            end_date=end_date or datetime.date.max,
+            id=lead_id,
+        )
+
+    @classmethod
+    def from_lead(cls, lead) -> Optional['LeadCriteria']:
+        """
+        Criteria of a lead, None if it cannot match anything.
+
+        `lead` is a Lead with its preference loaded, a row streamed by
+        crud_lead.iter_active_lead_preferences or already a LeadCriteria.
+        """
+        if isinstance(lead, LeadCriteria):
+            return lead
+        if isinstance(lead, Row):
+            return cls.create(lead.id, lead.email, lead.pos_ids, lead.preferred_days, lead.start_date, lead.end_date)
+        preference = lead.preference
+        if preference is None:
+            return None
+        return cls.create(getattr(lead, "id", None), lead.email,
+                          (center.pos_id for center in preference.preferred_centers or []),
+                          preference.preferred_days, preference.start_date, preference.end_date)
+
+
+def lead_criteria(leads: Iterable) -> Iterable[LeadCriteria]:
+    """Criteria of the leads that can match anything."""
+    return filter(None, (LeadCriteria.from_lead(lead) for lead in leads))
+
+
+class _Bucket:
+    """The leads of one (pos_id, weekday), sorted by start_date for a bisect per date."""
+
+    def __init__(self, leads: List[LeadCriteria]):
+        leads.sort(key=lambda lead: lead.start_date)
+        self.leads = leads
+        self.starts = [lead.start_date for lead in leads]
+
+    def stab(self, date: datetime.date) -> List[str]:
+        """Emails of the leads whose [start_date, end_date] contains `date`."""
+        return [lead.email for lead in self.leads[:bisect_right(self.starts, date)] if lead.end_date >= date]
+
+
+class InvertedIndexMatcher:
+    """
+    Match a cycle's slots against every lead at once.
+
+    Leads are indexed once by (center pos_id, weekday), each bucket sorted by start date.
+    Slots on the same center and date share one bucket lookup, so a cycle costs about
+    O(slots + matches) rather than the O(leads × slots × centers) of calling
+    match_availability_to_users per lead.
+    """
+
+    def __init__(self, leads: Iterable[LeadCriteria]):
+        buckets: DefaultDict[BucketKey, List[LeadCriteria]] = defaultdict(list)
+        for lead in leads:
+            for pos_id in lead.pos_ids:
+                for day in lead.days:
+                    buckets[(pos_id, day)].append(lead)
+        self._buckets = {key: _Bucket(bucket_leads) for key, bucket_leads in buckets.items()}
+
+    @classmethod
+    def from_leads(cls, leads: Iterable) -> 'InvertedIndexMatcher':
+        """Index Lead rows with their preference and preferred centers loaded."""
+        return cls(lead_criteria(leads))
+
+    def match(self, availability_data: List) -> Dict[str, DefaultDict[str, List]]:
+        """
+        Match availability items to the indexed leads.
+
+        Args:
+            availability_data: Availability items with a center attached, as returned by find_available_dates.
+
+        Returns:
+            Dict mapping each matched lead's email to the same Center.name → slots mapping
+            match_availability_to_users returns, slots kept in availability_data order.
+            Leads without a match are left out.
+        """
+        matches: Dict[str, DefaultDict[str, List]] = {}
+        stabbed: Dict[Tuple[int, datetime.date], List[str]] = {}
+        for item in availability_data:
+            if item.center is None:
+                continue
+            date = item.appointmentDt.date
+            key = (item.center.pos_id, date)
+            emails = stabbed.get(key)
+            if emails is None:
+                bucket = self._buckets.get((item.center.pos_id, item.appointmentDt.dayOfWeek.value))
+                emails = stabbed[key] = bucket.stab(date) if bucket else []
+            for email in emails:
+                lead_matches = matches.get(email)
+                if lead_matches is None:
+                    lead_matches = matches[email] = defaultdict(list)
+                lead_matches[item.center.name].append(item)
+        return matches
+
+
+class NumpyMatcher:
+    """
+    Vectorized matching for very large lead populations.
+
+    Every lead is encoded once into parallel arrays: its centers as a bitset over the
+    center index (uint64 words), its preferred days as a 7-bit mask and its date window
+    as two int32 ordinals. Slots are encoded the same way, and each center's slots are
+    matched against the leads wanting that center with batched boolean array operations.
+    Gives the same matches as InvertedIndexMatcher and match_availability_to_users.
+    """
+
+    # Largest leads × slots boolean matrix built at once
+    MAX_CELLS = 1 << 22
+
+    def __init__(self, leads: Iterable[LeadCriteria]):
+        if np is None:
+            raise ImportError("The numpy matching engine requires numpy; install it or use another MATCHING_ENGINE")
+        self.leads = list(leads)
+        self._center_index = {
+            pos_id: index
+            for index, pos_id in enumerate(sorted({pos_id for lead in self.leads for pos_id in lead.pos_ids}))
+        }
+        words = max(1, -(-len(self._center_index) // 64))
+
+        bitsets = []
+        for lead in self.leads:
+            bitset = 0
+            for pos_id in lead.pos_ids:
+                bitset |= 1 << self._center_index[pos_id]
+            bitsets.append([(bitset >> (64 * word)) & 0xFFFFFFFFFFFFFFFF for word in range(words)])
+        self._centers = np.array(bitsets, dtype=np.uint64).reshape(len(self.leads), words)
+        self._days = np.array([sum(1 << day for day in lead.days) for lead in self.leads], dtype=np.uint8)
+        self._starts = np.array([lead.start_date.toordinal() for lead in self.leads], dtype=np.int32)
+        self._ends = np.array([lead.end_date.toordinal() for lead in self.leads], dtype=np.int32)
+
+    @classmethod
+    def from_leads(cls, leads: Iterable) -> 'NumpyMatcher':
+        """Encode Lead rows with their preference and preferred centers loaded."""
+        return cls(lead_criteria(leads))
+
+    def _encode_slots(self, availability_data: List) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+        """Center index (-1 when no lead wants it), weekday and date ordinal of every slot."""
+        centers, days, ordinals = [], [], []
+        for item in availability_data:
+            center = item.center
+            centers.append(-1 if center is None else self._center_index.get(center.pos_id, -1))
+            days.append(item.appointmentDt.dayOfWeek.value)
+            ordinals.append(item.appointmentDt.date.toordinal())
+        return (np.array(centers, dtype=np.int64), np.array(days, dtype=np.uint8),
+                np.array(ordinals, dtype=np.int32))
+
+    def match_pairs(self, availability_data: List) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Match availability items to the encoded leads.
+
+        Returns:
+            Two equally long arrays (lead_idx, slot_idx): self.leads[lead_idx[i]] matches
+            availability_data[slot_idx[i]].
+        """
+        return self._match_encoded(*self._encode_slots(availability_data))
+
+    def _match_encoded(self, centers: 'np.ndarray', days: 'np.ndarray',
+                       ordinals: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+        lead_parts, slot_parts = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        if not self.leads or not len(centers):
+            return lead_parts[0], slot_parts[0]
+
+        by_center = np.argsort(centers, kind="stable")
+        center_values, first, counts = np.unique(centers[by_center], return_index=True, return_counts=True)
+        for center, start, count in zip(center_values.tolist(), first.tolist(), counts.tolist()):
+            if center < 0:
+                continue
+            wants_center = (self._centers[:, center >> 6] >> np.uint64(center & 63)) & np.uint64(1)
+            candidates = np.flatnonzero(wants_center)
+            if not len(candidates):
+                continue
+            lead_days = self._days[candidates, None]
+            starts = self._starts[candidates, None]
+            ends = self._ends[candidates, None]
+
+            slots = by_center[start:start + count]
+            chunk = max(1, self.MAX_CELLS // len(candidates))
+            for offset in range(0, len(slots), chunk):
+                chunk_slots = slots[offset:offset + chunk]
+                slot_ordinals = ordinals[None, chunk_slots]
+                hit = ((lead_days >> days[None, chunk_slots]) & 1).astype(bool)
+                hit &= starts <= slot_ordinals
+                hit &= ends >= slot_ordinals
+                lead_idx, slot_idx = np.nonzero(hit)
+                lead_parts.append(candidates[lead_idx])
+                slot_parts.append(chunk_slots[slot_idx])
+
+        return np.concatenate(lead_parts), np.concatenate(slot_parts)
+
+    def match(self, availability_data: List) -> Dict[str, DefaultDict[str, List]]:
+        """Same result as InvertedIndexMatcher.match, center names in the same order too."""
+        centers, days, ordinals = self._encode_slots(availability_data)
+        lead_idx, slot_idx = self._match_encoded(centers, days, ordinals)
+        if not len(lead_idx):
+            return {}
+
+        # Order the slots by where their center first appears, then by position, and the pairs
+        # by lead and that slot rank: every (lead, center) becomes one contiguous run of slots
+        # already in availability_data order
+        center_values, first_slot = np.unique(centers, return_index=True)
+        center_order = first_slot[np.searchsorted(center_values, centers)]
+        slot_rank = np.empty(len(centers), dtype=np.int64)
+        slot_rank[np.lexsort((np.arange(len(centers)), center_order))] = np.arange(len(centers))
+        order = np.argsort(lead_idx * len(centers) + slot_rank[slot_idx])
+        lead_idx, slot_idx = lead_idx[order], slot_idx[order]
+
+        matched_items = list(map(availability_data.__getitem__, slot_idx.tolist()))
+        matched_centers = centers[slot_idx]
+        run_starts = np.flatnonzero(np.diff(lead_idx, prepend=-1) | np.diff(matched_centers, prepend=-2))
+        center_names = {
+            center: availability_data[slot].center.name
+            for center, slot in zip(center_values.tolist(), first_slot.tolist()) if center >= 0
+        }
+
+        matches: Dict[str, DefaultDict[str, List]] = {}
+        lead_matches = None
+        previous_lead = -1
+        run_ends = run_starts[1:].tolist() + [len(matched_items)]
+        for start, end, lead, center in zip(run_starts.tolist(), run_ends, lead_idx[run_starts].tolist(),
+                                            matched_centers[run_starts].tolist()):
+            if lead != previous_lead:
+                lead_matches = matches[self.leads[lead].email] = defaultdict(list)
+                previous_lead = lead
+            lead_matches[center_names[center]] = matched_items[start:end]
+        return matches
+
+
+class SqlMatcher:
+    """
+    Match a cycle's slots against the leads inside Postgres, for the "sql" MATCHING_ENGINE.
+
+    Leads are never loaded: the distinct (center pos_id, date, weekday) keys of the slots
+    are sent in one query, joined with every preference there by crud_lead.match_slot_keys,
+    and only the matching (lead, key) pairs come back, which are expanded to the slots of
+    each key. Gives the same matches as InvertedIndexMatcher, and as nothing is kept
+    between cycles it needs no refresh; the id of every lead matched is kept in lead_ids,
+    as the leads are not otherwise known.
+    """
+
+    def __init__(self, session_factory: Callable[[], ContextManager[Session]]):
+        self._session_factory = session_factory
+        self.lead_ids: Dict[str, UUID] = {}
+
+    def match(self, availability_data: List) -> Dict[str, DefaultDict[str, List]]:
+        """Same result as InvertedIndexMatcher.match."""
+        slots_by_key: Dict[Tuple[int, datetime.date, int], List[int]] = {}
+        for index, item in enumerate(availability_data):
+            if item.center is not None:
+                key = (item.center.pos_id, item.appointmentDt.date, item.appointmentDt.dayOfWeek.value)
+                slots_by_key.setdefault(key, []).append(index)
+        keys = list(slots_by_key)
+
+        matched: DefaultDict[str, List[int]] = defaultdict(list)
+        with self._session_factory() as db:
+            for lead_id, email, lead_keys in match_slot_keys(db, keys):
+                self.lead_ids[email] = lead_id
+                for key in lead_keys:
+                    matched[email].extend(slots_by_key[keys[key]])
+
+        matches: Dict[str, DefaultDict[str, List]] = {}
+        for email, slot_indexes in matched.items():
+            lead_matches = matches[email] = defaultdict(list)
+            for index in sorted(slot_indexes):
+                item = availability_data[index]
+                lead_matches[item.center.name].append(item)
+        return matches
@@ -0,0 +1,102 @@
+import datetime
+import hashlib
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Mapping, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_notification import get_notified_fingerprints, purge_notified_slots, record_notified_slots
+from .availability_delta import slot_key
+
+
+def slot_fingerprint(item) -> int:
+    """Signed 64-bit hash of an availability item's slot_key, as stored in notified_slots."""
+    digest = hashlib.blake2b(repr(slot_key(item)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class NotifiedSlots:
+    """
+    The slots each lead was already notified about, so leads are only told about new ones.
+
+    The fingerprints notified within the last settings.NOTIFICATION_DEDUP_WINDOW_HOURS are
+    loaded once per cycle into a set per lead; a slot still open once its window has passed
+    is notified again, as a reminder. Slots notified this cycle are remembered in memory and
+    written back, expired rows purged, by save().
+
+    Fingerprints are cached by the id of the slot object, so like MessageRenderer an
+    instance must not outlive the availability list it filters: create one per cycle.
+    """
+
+    def __init__(self, now: Optional[datetime.datetime] = None, window_hours: Optional[int] = None):
+        self.now = now or datetime.datetime.now(datetime.UTC)
+        self.since = self.now - datetime.timedelta(hours=window_hours or settings.NOTIFICATION_DEDUP_WINDOW_HOURS)
+        self._seen: Dict[UUID, Set[int]] = {}
+        self._fingerprints: Dict[int, int] = {}
+        self._pending: List[Dict] = []
+
+    def load(self, db: Session, shard: Optional[Tuple[int, int]] = None) -> "NotifiedSlots":
+        """Load the fingerprints within the window, of one shard's leads only when shard is set."""
+        self._seen = get_notified_fingerprints(db, self.since, shard)
+        return self
+
+    def fingerprint(self, slot) -> int:
+        fingerprint = self._fingerprints.get(id(slot))
+        if fingerprint is None:
+            fingerprint = self._fingerprints[id(slot)] = slot_fingerprint(slot)
+        return fingerprint
+
+    def unseen(self, lead_id: UUID, matched_availability: Mapping[str, List]) -> DefaultDict[str, List]:
+        """The part of a lead's Center.name → slots matches it was not notified about yet."""
+        seen = self._seen.get(lead_id, ())
+        unseen = defaultdict(list)
+        for center_name, slots in matched_availability.items():
+            new_slots = [slot for slot in slots if self.fingerprint(slot) not in seen]
+            if new_slots:
+                unseen[center_name] = new_slots
+        return unseen
+
+    def drop_seen(self, matches: Mapping[str, Mapping[str, List]],
+                  lead_ids: Mapping[str, UUID]) -> Dict[str, DefaultDict[str, List]]:
+        """
+        Filter the matches of every lead (email → Center.name → slots) down to its new slots.
+
+        Leads left without a new slot are dropped entirely.
+        """
+        new_matches = {}
+        for lead_email, matched_availability in matches.items():
+            unseen = self.unseen(lead_ids[lead_email], matched_availability)
+            if unseen:
+                new_matches[lead_email] = unseen
+        return new_matches
+
+    def remember(self, lead_id: UUID, matched_availability: Mapping[str, List]) -> None:
+        """Record that the lead was notified about these slots; written to the database by save()."""
+        seen = self._seen.setdefault(lead_id, set())
+        for slots in matched_availability.values():
+            for slot in slots:
+                fingerprint = self.fingerprint(slot)
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                self._pending.append({
+                    "lead_id": lead_id,
+                    "fingerprint": fingerprint,
+                    "slot_date": slot.appointmentDt.date,
+                    "notified_at": self.now,
+                })
+
+    def save(self, db: Session) -> int:
+        """
+        Write the slots remembered since the last save and purge the expired ones.
+
+        Returns:
+            int: Number of notified slots written.
+        """
+        pending, self._pending = self._pending, []
+        record_notified_slots(db, pending)
+        purge_notified_slots(db, self.since, datetime.date.today())
+        db.commit()
+        return len(pending)
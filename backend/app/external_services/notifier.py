@@ -1,19 +1,40 @@
+import argparse
+import datetime
+import hashlib
+import multiprocessing
+import signal
+import threading
+import time
 from collections import defaultdict
-from typing import Any, List, Dict, DefaultDict
+from concurrent.futures import ProcessPoolExecutor
+from email.message import Message
+from typing import Any, Callable, ContextManager, List, Dict, DefaultDict, Optional, Tuple, Union
 
-from sqlalchemy import Row
+from sqlalchemy import create_engine
 from sqlalchemy.engine import Row
-from app.crud.crud_lead import get_lead_preferences
+from sqlalchemy.orm import Session, sessionmaker
+from app.crud.crud_lead import iter_active_lead_preferences
+from app.crud.crud_notification import enqueue_notifications
 from app.db.session import db_session_as_context
 from app.core.config import settings
+from app.external_services.availability_delta import AvailabilitySnapshotStore, slot_key
 from app.external_services.crawlers.availability_finder import find_available_dates
-from .email_service import SMTPGmailService
+from app.external_services.crawlers.icbc_centers_crawler import ICBCCentersCrawler
+from app.external_services.crawlers.poll_scheduler import CenterPollScheduler
+from app.external_services.matching import InvertedIndexMatcher, LeadCriteria, NumpyMatcher, SqlMatcher, lead_criteria
+from .email_service import DispatchResult, SMTPDispatcher, SMTPGmailService, build_dispatcher
+from .notification_dedup import NotifiedSlots
+from .outbox_sender import drain_outbox
+from .rendering import MessageRenderer
+from .sharding import RunSummary, ShardSummary
 from .logging_config import setup_logging
 
 # todo: implement tommorrow_onwards logic
 
 logger = setup_logging(__name__, log_file="notifier.log")
 
+Matcher = Union[InvertedIndexMatcher, NumpyMatcher, SqlMatcher]
+
 
 
 def match_availability_to_users(availability_data: List, lead_preference: Row) -> DefaultDict[str, List]:
@@ -27,35 +48,34 @@ def match_availability_to_users(availability_data: List, lead_preference: Row) -
         availability_data (List): A list of availability items, each with a center object attached.
             Each item should have attributes: posId, appointmentDt (with date and dayOfWeek.value), 
             center (Center object), and other appointment details.
-        lead_preference (Row): A SQLAlchemy Row object containing user preferences.
-            Should have attributes: email, preferred_centers_ids (List[int]), 
-            preferred_days (List[int]), start_date (date), and end_date (date).
+        lead_preference (Row): A lead as accepted by LeadCriteria.from_lead: a row streamed by
+            crud_lead.iter_active_lead_preferences, a LeadCriteria or a Lead with its preference
+            and preferred centers loaded.
 
     Returns:
         DefaultDict[str, List]: A defaultdict mapping Center.name to lists of matching 
             appointment slots for the user. Empty defaultdict if no matches found.
     """
-    user_centers = lead_preference.preference.preferred_centers
-    user_days = lead_preference.preference.preferred_days
-    user_start_date = lead_preference.preference.start_date
-    user_end_date = lead_preference.preference.end_date
-    
+    criteria = LeadCriteria.from_lead(lead_preference)
+
     # Filter availability for this user
     matching_slots = defaultdict(list)
+    if criteria is None:
+        return matching_slots
     for item in availability_data:
         # Check if slot matches user preferences
         if (
             item.center is not None and
-            any(item.center.pos_id == c.pos_id for c in user_centers) and
-            item.appointmentDt.dayOfWeek.value in user_days and
-            user_start_date <= item.appointmentDt.date <= user_end_date
+            item.center.pos_id in criteria.pos_ids and
+            item.appointmentDt.dayOfWeek.value in criteria.days and
+            criteria.start_date <= item.appointmentDt.date <= criteria.end_date
         ):  # inclusive dates
             matching_slots[item.center.name].append(item)
 
     return matching_slots
 
 
-def prepare_message(available_slots: DefaultDict[str, List]) -> str:
+def prepare_message(available_slots: DefaultDict[str, List], renderer: Optional[MessageRenderer] = None) -> str:
     """
     Prepare HTML email message from available appointment slots.
     
@@ -63,89 +83,495 @@ def prepare_message(available_slots: DefaultDict[str, List]) -> str:
         available_slots (DefaultDict[Center, List]): A defaultdict mapping Center objects to lists of 
             appointment slot objects. Each slot should have attributes: appointmentDt (with date 
             and dayOfWeek), startTm, endTm, and other appointment details.
+        renderer (MessageRenderer, optional): The cycle's renderer, so lines, centers and whole
+            messages already rendered for another lead are reused.
     
     Returns:
         str: HTML formatted message content for email.
     """
-    # Create the body of the message (HTML version).
-    html_content = "<html><body><h2>ICBC Road Test Availability</h2><ul>"
-    
-    for center_name, slots in available_slots.items():
-        if slots:  # Only show centers with available slots
-            html_content += f"<li><strong>{center_name}</strong>:<ul>"
-            for slot in slots:
-                # Access attributes from the Pydantic model objects
-                date_str = slot.appointmentDt.date.strftime('%Y-%m-%d')
-                day_of_week = slot.appointmentDt.dayOfWeek.name.title()
-                start_time = slot.startTm
-                end_time = slot.endTm
-                
-                html_content += f"<li>{date_str} ({day_of_week}) - {start_time} to {end_time}</li>"
-            html_content += "</ul></li>"
-    
-    html_content += "</ul></body></html>"
+    html_content = (renderer or MessageRenderer()).render(available_slots)
 
     logger.info("Message content prepared for sending.")
 
     return html_content
 
 
-def notify_lead_by_preference(lead_preferences: List[Row], full_availability: List, gmail_service: SMTPGmailService):
-    for lead_preference in lead_preferences:
-        lead_email = lead_preference.get("email")
+def load_leads(db: Session, shard: Optional[Tuple[int, int]] = None) -> List[LeadCriteria]:
+    """
+    The criteria of every lead that can match a slot from today on.
+
+    Leads are streamed in batches by crud_lead.iter_active_lead_preferences, each batch
+    flattened to LeadCriteria before the next is fetched. With `shard` as (shard, shards),
+    only the leads lead_shard puts in that shard are read from the database. None are
+    loaded for the "sql" MATCHING_ENGINE, which matches them inside the database.
+    """
+    leads = []
+    if settings.MATCHING_ENGINE == "sql":
+        return leads
+    for batch in iter_active_lead_preferences(db, datetime.date.today(), shard=shard):
+        leads.extend(lead_criteria(batch))
+    return leads
 
-        matched_availability = match_availability_to_users(full_availability, lead_preference)
 
-        if not matched_availability:
-            logger.info(f"No matching availability for user: {lead_email}")
-            return
+def build_matcher(lead_preferences: List[Row],
+                  session_factory: Callable[[], ContextManager[Session]] = db_session_as_context) -> Optional[Matcher]:
+    """
+    The settings.MATCHING_ENGINE matcher for these leads, None for "scan".
 
-        try:
-            logger.info(f"Sending email to user: {lead_email}")
-            prepared_message = prepare_message(matched_availability)
+    The "sql" matcher ignores the leads, matching those in the database in a session of session_factory.
+    """
+    if settings.MATCHING_ENGINE == "scan":
+        return None
+    if settings.MATCHING_ENGINE == "sql":
+        return SqlMatcher(session_factory)
+    matcher = NumpyMatcher if settings.MATCHING_ENGINE == "numpy" else InvertedIndexMatcher
+    return matcher.from_leads(lead_preferences)
+
+
+def match_leads(lead_preferences: List[Row], availability_data: List,
+                matcher: Optional[Matcher] = None) -> Dict[str, DefaultDict[str, List]]:
+    """
+    Match available slots to every lead with the engine selected by settings.MATCHING_ENGINE.
+
+    "index" (the default) indexes the leads once per cycle with InvertedIndexMatcher,
+    "numpy" matches them with the vectorized NumpyMatcher, "sql" matches the leads in the
+    database with SqlMatcher and "scan" calls match_availability_to_users for each lead.
+    A matcher already built for these leads with build_matcher is reused rather than built again.
+
+    Returns:
+        Dict mapping the email of each lead with at least one match to its Center.name → slots mapping.
+    """
+    if settings.MATCHING_ENGINE == "scan":
+        matches = {}
+        for lead_preference in lead_preferences:
+            matched_availability = match_availability_to_users(availability_data, lead_preference)
+            if matched_availability and lead_preference.email:
+                matches[lead_preference.email] = matched_availability
+        return matches
+
+    return (matcher or build_matcher(lead_preferences)).match(availability_data)
+
+
+def match_new_slots(lead_preferences: List[Row], full_availability: List, notified: Optional[NotifiedSlots],
+                    matcher: Optional[Matcher] = None) -> Tuple[Dict[str, DefaultDict[str, List]], Dict[str, Any]]:
+    """
+    match_leads, less the slots each lead was already notified about when `notified` is given.
+
+    Returns:
+        The matches, and the id of every matched lead by email.
+    """
+    matcher = matcher or build_matcher(lead_preferences)
+    matches = match_leads(lead_preferences, full_availability, matcher)
+    if isinstance(matcher, SqlMatcher):  # The leads were never loaded
+        lead_ids = matcher.lead_ids
+        logger.info(f"{len(matches)} users have matching availability")
+    else:
+        lead_ids = {lead_preference.email: lead_preference.id for lead_preference in lead_preferences}
+        logger.info(f"{len(matches)} of {len(lead_preferences)} users have matching availability")
+    if notified is not None:
+        matches = notified.drop_seen(matches, lead_ids)
+        logger.info(f"{len(matches)} users have matching slots they were not notified about yet")
+    return matches, lead_ids
+
+
+def notify_lead_by_preference(lead_preferences: List[Row], full_availability: List,
+                              gmail_service: Union[SMTPGmailService, SMTPDispatcher],
+                              notified: Optional[NotifiedSlots] = None,
+                              matcher: Optional[Matcher] = None) -> List[DispatchResult]:
+    """
+    Email every lead with matching availability.
+
+    With an SMTPDispatcher, every message is rendered first and then sent in parallel over its
+    connection pool; with a single SMTPGmailService they are sent one after the other.
+    With `notified`, leads are only emailed the slots they were not notified about yet, and
+    the slots of every email sent are remembered in it.
+
+    Returns:
+        List[DispatchResult]: The outcome of each lead's email.
+    """
+    matches, lead_ids = match_new_slots(lead_preferences, full_availability, notified, matcher)
+
+    # Leads with the same matches share one body, and so one message serialized once
+    renderer = MessageRenderer()
+    messages_by_body = {}
+    messages = []
+    for lead_email, matched_availability in matches.items():
+        prepared_message = prepare_message(matched_availability, renderer)
+        message = messages_by_body.get(prepared_message)
+        if message is None:
             message = gmail_service.create_message(
                 subject=settings.MAIL_SUBJECT,
                 message=prepared_message,
                 from_header=settings.FROM_HEADER
             )
-            gmail_service.send_message(message)
-            logger.info(f"Message sent to user: {lead_email}")
-        except Exception as e:
-            logger.error(f"Error sending email to {lead_email}: {str(e)}")
+            message = messages_by_body[prepared_message] = (
+                message.as_string() if isinstance(message, Message) else message
+            )
+        messages.append((lead_email, message))
+    logger.info(f"Rendered {len(messages_by_body)} distinct messages for {len(messages)} users")
+
+    if isinstance(gmail_service, SMTPDispatcher):
+        results = gmail_service.send_messages(messages)
+    else:
+        results = []
+        for lead_email, message in messages:
+            try:
+                logger.info(f"Sending email to user: {lead_email}")
+                gmail_service.send_message(message)
+                results.append(DispatchResult(lead_email, sent=True, attempts=1))
+            except Exception as e:
+                results.append(DispatchResult(lead_email, sent=False, attempts=1, error=str(e)))
 
+    for result in results:
+        if not result.sent:
+            logger.error(f"Error sending email to {result.key}: {result.error}")
+        elif notified is not None:
+            notified.remember(lead_ids[result.key], matches[result.key])
+    logger.info(f"Sent {sum(result.sent for result in results)} of {len(results)} emails")
+    return results
 
-def main():
+
+def notification_key(lead_id, matched_availability: DefaultDict[str, List]) -> str:
+    """Idempotency key of a notification: sha256 of the lead id and the set of slots it lists."""
+    digest = hashlib.sha256(str(lead_id).encode())
+    for key in sorted(slot_key(slot) for slots in matched_availability.values() for slot in slots):
+        digest.update(repr(key).encode())
+    return digest.hexdigest()
+
+
+def enqueue_lead_notifications(db: Session, lead_preferences: List[Row], full_availability: List,
+                               notified: Optional[NotifiedSlots] = None, matcher: Optional[Matcher] = None) -> int:
+    """
+    Queue a notification in the outbox for every lead with matching availability.
+
+    A lead already queued for the exact same slots (e.g. a cycle run again after a crash)
+    is not queued again. With `notified`, only the slots a lead was not notified about yet
+    are queued, and remembered in it: the outbox sender retries until they are sent.
+
+    Returns:
+        int: Number of notifications queued.
+    """
+    matches, lead_ids = match_new_slots(lead_preferences, full_availability, notified, matcher)
+    renderer = MessageRenderer()
+    rows = [
+        {
+            "lead_id": lead_ids[lead_email],
+            "email": lead_email,
+            "idempotency_key": notification_key(lead_ids[lead_email], matched_availability),
+            "subject": settings.MAIL_SUBJECT,
+            "body": prepare_message(matched_availability, renderer),
+        }
+        for lead_email, matched_availability in matches.items()
+    ]
+    queued = enqueue_notifications(db, rows)
+    if notified is not None:
+        for row, matched_availability in zip(rows, matches.values()):
+            notified.remember(row["lead_id"], matched_availability)
+    logger.info(f"Queued {queued} of {len(rows)} notifications in the outbox")
+    return queued
+
+
+class LeadIndex:
+    """
+    The leads and their matcher, kept between the cycles of a long-running notifier.
+
+    They are reloaded, in a session of their own so they never expire with another
+    session's commit, once settings.NOTIFIER_LEAD_REFRESH_SECONDS have passed or after
+    invalidate().
+    """
+
+    def __init__(self, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic,
+                 session_factory: Callable[[], ContextManager[Session]] = db_session_as_context,
+                 shard: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            ttl: Seconds the leads are kept, defaults to settings.NOTIFIER_LEAD_REFRESH_SECONDS.
+            clock: Monotonic clock, replaceable in tests.
+            session_factory: Opens the session the leads are loaded in.
+            shard: (shard, shards) to only keep the leads lead_shard puts in that shard.
+        """
+        self.ttl = settings.NOTIFIER_LEAD_REFRESH_SECONDS if ttl is None else ttl
+        self._clock = clock
+        self._session_factory = session_factory
+        self.shard = shard
+        self._loaded_at: Optional[float] = None
+        self.lead_preferences: List[LeadCriteria] = []
+        self.matcher: Optional[Matcher] = None
+
+    def refresh(self) -> List[LeadCriteria]:
+        """The current leads, reloaded first if they are stale."""
+        now = self._clock()
+        if self._loaded_at is None or now - self._loaded_at >= self.ttl:
+            with self._session_factory() as session:
+                self.lead_preferences = load_leads(session, self.shard)
+            self.matcher = build_matcher(self.lead_preferences, self._session_factory)
+            self._loaded_at = now
+            logger.info(f"Loaded {len(self.lead_preferences)} leads")
+        return self.lead_preferences
+
+    def invalidate(self):
+        self._loaded_at = None
+
+
+# State of a shard worker process, set up by _init_shard_worker
+_worker_shard: int = 0
+_worker_sessions: Optional[sessionmaker] = None
+_worker_leads: Optional[LeadIndex] = None
+
+
+def _init_shard_worker(shard: int, shards: int, database_url: str):
+    global _worker_shard, _worker_sessions, _worker_leads
+    _worker_shard = shard
+    _worker_sessions = sessionmaker(autocommit=False, autoflush=False, bind=create_engine(database_url))
+    _worker_leads = LeadIndex(session_factory=_worker_sessions, shard=(shard, shards))
+
+
+def enqueue_shard(full_availability: List) -> ShardSummary:
+    """Match, render and queue the notifications of the worker's shard of leads."""
+    start = time.perf_counter()
+    summary = ShardSummary(_worker_shard)
+    try:
+        lead_preferences = _worker_leads.refresh()
+        summary.leads = len(lead_preferences)
+        with _worker_sessions() as session:
+            notified = None
+            if settings.NOTIFICATION_DEDUP_ENABLED:
+                notified = NotifiedSlots().load(session, _worker_leads.shard)
+            summary.queued = enqueue_lead_notifications(session, lead_preferences, full_availability, notified,
+                                                        _worker_leads.matcher)
+            if notified is not None:
+                notified.save(session)
+    except Exception as e:
+        logger.error(f"Shard {_worker_shard} failed: {str(e)}")
+        summary.error = str(e)
+    summary.seconds = time.perf_counter() - start
+    return summary
+
+
+class ShardPool:
+    """
+    Match, render and queue notifications from one long-lived worker process per shard.
+
+    Leads are partitioned by lead_shard, a stable hash of their id, so every shard worker
+    keeps its own leads and matcher warm between cycles in a LeadIndex, with a database
+    engine of its own. Each cycle the slots are handed to every worker once, and the shards
+    match and queue their notifications in the outbox independently, so the stage scales
+    with the CPU cores instead of running on one; the outbox joins them back together, its
+    notifications sent by drain_outbox or the outbox sender as usual. Workers are spawned
+    rather than forked, as the daemon runs threads, and a worker that dies is replaced.
+    """
+
+    def __init__(self, shards: Optional[int] = None, database_url: Optional[str] = None):
+        self.shards = shards or settings.NOTIFIER_SHARDS
+        self.database_url = database_url or settings.DATABASE_URL
+        self._executors = [self._executor(shard) for shard in range(self.shards)]
+
+    def _executor(self, shard: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_shard_worker, initargs=(shard, self.shards, self.database_url))
+
+    def enqueue(self, full_availability: List) -> RunSummary:
+        """
+        Queue the notifications of every shard for these slots.
+
+        Returns:
+            RunSummary: The merged summaries of the shards.
+        """
+        start = time.perf_counter()
+        futures = [executor.submit(enqueue_shard, full_availability) for executor in self._executors]
+        summary = RunSummary()
+        for shard, future in enumerate(futures):
+            try:
+                summary.shards.append(future.result())
+            except Exception as e:  # The worker died, e.g. BrokenProcessPool
+                logger.error(f"Shard {shard} worker failed: {str(e)}")
+                summary.shards.append(ShardSummary(shard, error=str(e)))
+                self._executors[shard].shutdown(wait=False, cancel_futures=True)
+                self._executors[shard] = self._executor(shard)
+        summary.seconds = time.perf_counter() - start
+        logger.info(str(summary))
+        return summary
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown()
+
+
+def build_shard_pool() -> Optional[ShardPool]:
+    """The ShardPool for settings.NOTIFIER_SHARDS, None to notify from the current process."""
+    if settings.NOTIFIER_SHARDS <= 1:
+        return None
+    if not settings.NOTIFICATION_OUTBOX_ENABLED:
+        logger.warning(f"NOTIFIER_SHARDS={settings.NOTIFIER_SHARDS} needs NOTIFICATION_OUTBOX_ENABLED; "
+                       f"notifying from a single process")
+        return None
+    if settings.MATCHING_ENGINE == "sql":
+        logger.warning(f"NOTIFIER_SHARDS={settings.NOTIFIER_SHARDS} is ignored with MATCHING_ENGINE=sql, "
+                       f"which matches every lead in one query")
+        return None
+    return ShardPool()
+
+
+def build_snapshot_store() -> Optional[AvailabilitySnapshotStore]:
+    """The AvailabilitySnapshotStore for settings.NOTIFY_ONLY_NEW_SLOTS, None to notify every open slot."""
+    if not settings.NOTIFY_ONLY_NEW_SLOTS:
+        return None
+    if settings.NOTIFICATION_DEDUP_ENABLED:
+        logger.warning("NOTIFY_ONLY_NEW_SLOTS is ignored with NOTIFICATION_DEDUP_ENABLED, which already "
+                       "skips the slots each lead was notified about and reminds it of those still open")
+        return None
+    return AvailabilitySnapshotStore(settings.AVAILABILITY_SNAPSHOT_FILE or None)
+
+
+def run_cycle(dispatcher: SMTPDispatcher, snapshot_store: Optional[AvailabilitySnapshotStore] = None,
+              scheduler: Optional[CenterPollScheduler] = None, lead_index: Optional[LeadIndex] = None,
+              shard_pool: Optional[ShardPool] = None):
+    """
+    Crawl the availability once and notify, or queue notifications for, the matching leads.
+
+    Leads are loaded from the database unless a lead_index is given; with a shard_pool
+    they are matched and queued by its shard workers instead. The snapshot's changes are
+    only saved once every lead was notified or queued; otherwise, e.g. when a shard or an
+    email failed, they are discarded so the slots are new again next cycle. The dispatcher
+    and the shard pool are left open for the next cycle.
+    """
+    delivered = False  # Whether every lead was notified, or queued a notification, of the new slots
     try:
         with db_session_as_context() as db:
-            availability_result = find_available_dates(db)
-        
+            availability_result = find_available_dates(db, scheduler=scheduler, snapshot_store=snapshot_store)
+
         if not availability_result:
             logger.error("Error getting availability.")
             return
-        
+
         full_availability, available_tomorrow_onwards = availability_result
         if not full_availability:
-            logger.info("No available dates found.")
+            logger.info("No new available dates found." if snapshot_store else "No available dates found.")
+            delivered = True
             return
 
-        with db_session_as_context() as session:
-            lead_preferences = get_lead_preferences(session)
+        if shard_pool is not None:
+            delivered = not shard_pool.enqueue(full_availability).failed
+        else:
+            matcher = None
+            with db_session_as_context() as session:
+                if lead_index is None:
+                    lead_preferences = load_leads(session)
+                else:
+                    lead_preferences, matcher = lead_index.refresh(), lead_index.matcher
+                notified = NotifiedSlots().load(session) if settings.NOTIFICATION_DEDUP_ENABLED else None
+                if settings.NOTIFICATION_OUTBOX_ENABLED:
+                    enqueue_lead_notifications(session, lead_preferences, full_availability, notified, matcher)
+                    delivered = True
+                    if notified is not None:
+                        notified.save(session)
+
+        if settings.NOTIFICATION_OUTBOX_ENABLED and not settings.NOTIFICATION_OUTBOX_DRAIN_INLINE:
+            logger.info("Notifications queued for outbox_sender.")
+        else:
+            try:
+                if settings.NOTIFICATION_OUTBOX_ENABLED:
+                    with db_session_as_context() as session:
+                        drain_outbox(session, dispatcher)
+                else:
+                    results = notify_lead_by_preference(lead_preferences, full_availability, dispatcher, notified,
+                                                        matcher)
+                    delivered = all(result.sent for result in results)
+                    if notified is not None:
+                        with db_session_as_context() as session:
+                            notified.save(session)
+            except Exception as e:
+                logger.error(f"Error processing leads: {str(e)}")
+    finally:
+        # Only saved once notified or queued, so a failure re-sends rather than loses new slots
+        if snapshot_store is not None and delivered:
+            snapshot_store.save()
+        elif snapshot_store is not None:
+            logger.warning("Not saving the availability snapshot: some leads could not be notified")
+            snapshot_store.discard()
 
-        gmail_service = SMTPGmailService(
-            app_password=settings.APP_PASSWORD,
-            sender_email=settings.SENDER_EMAIL,
-            to_emails=settings.TO_EMAILS
-        )
 
+class NotifierDaemon:
+    """
+    Run notifier cycles in one long-lived process instead of one process per cycle.
+
+    The database pool, the ICBC client and its token, the SMTP connection pool, the center
+    registry, the availability snapshot and the leads with their matcher all stay warm
+    between cycles. A cycle runs every settings.NOTIFIER_CYCLE_SECONDS, fetching only the
+    centers the adaptive CenterPollScheduler reports as due, and the centers are re-crawled
+    with ICBCCentersCrawler every settings.NOTIFIER_CENTERS_REFRESH_SECONDS. SIGINT and
+    SIGTERM stop the daemon once the current cycle is over.
+    """
+
+    def __init__(self, cycle_seconds: Optional[float] = None, centers_refresh_seconds: Optional[float] = None,
+                 dispatcher: Optional[SMTPDispatcher] = None, centers_crawler: Optional[ICBCCentersCrawler] = None):
+        self.cycle_seconds = cycle_seconds or settings.NOTIFIER_CYCLE_SECONDS
+        self.centers_refresh_seconds = centers_refresh_seconds or settings.NOTIFIER_CENTERS_REFRESH_SECONDS
+        self.dispatcher = dispatcher or build_dispatcher()
+        self.centers_crawler = centers_crawler or ICBCCentersCrawler()
+        self.scheduler = CenterPollScheduler()
+        self.lead_index = LeadIndex()
+        self.shard_pool = build_shard_pool()
+        self.snapshot_store = build_snapshot_store()
+        self._stopped = threading.Event()
+
+    def stop(self, *_):
+        """Stop once the current cycle is over; usable as a signal handler."""
+        if not self._stopped.is_set():
+            logger.info("Stopping notifier daemon")
+        self._stopped.set()
+
+    def serve(self):
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+
+        logger.info(f"Notifier daemon started: a cycle every {self.cycle_seconds}s, "
+                    f"centers refreshed every {self.centers_refresh_seconds}s")
+        next_cycle = next_centers_refresh = time.monotonic()
+        next_centers_refresh += self.centers_refresh_seconds  # The centers table is usually fresh at startup
         try:
-            notify_lead_by_preference(lead_preferences, full_availability, gmail_service)
-        except Exception as e:
-            logger.error(f"Error processing leads: {str(e)}")
+            while not self._stopped.is_set():
+                if time.monotonic() >= next_centers_refresh:
+                    self.centers_crawler.run()
+                    next_centers_refresh = time.monotonic() + self.centers_refresh_seconds
+                if time.monotonic() >= next_cycle:
+                    next_cycle = time.monotonic() + self.cycle_seconds
+                    try:
+                        run_cycle(self.dispatcher, self.snapshot_store, self.scheduler, self.lead_index,
+                                  self.shard_pool)
+                    except Exception as e:
+                        logger.error(f"An unexpected error occurred: {str(e)}")
+                self._stopped.wait(max(0.0, min(next_cycle, next_centers_refresh) - time.monotonic()))
         finally:
-            gmail_service.close_connection()
+            self.dispatcher.close()
+            if self.shard_pool is not None:
+                self.shard_pool.close()
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            logger.info("Notifier daemon stopped")
+
+
+def main(serve: bool = False):
+    """Run a single notifier cycle, or with `serve` keep running them as a NotifierDaemon."""
+    if serve:
+        NotifierDaemon().serve()
+        return
+
+    dispatcher = build_dispatcher()
+    shard_pool = None
+    try:
+        shard_pool = build_shard_pool()
+        run_cycle(dispatcher, build_snapshot_store(), shard_pool=shard_pool)
     except Exception as e:
         logger.error(f"An unexpected error occurred: {str(e)}")
+    finally:
+        dispatcher.close()
+        if shard_pool is not None:
+            shard_pool.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Notify leads of available road test appointments.")
+    parser.add_argument("--serve", action="store_true", help="Keep running cycles instead of running a single one")
+    main(serve=parser.parse_args().serve)
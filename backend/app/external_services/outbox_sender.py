@@ -0,0 +1,109 @@
+"""
+Send the notifications queued in the notification outbox.
+
+Run it next to the notifier when NOTIFICATION_OUTBOX_ENABLED is set, as many copies as SMTP
+allows: each claims its own batches with SELECT ... FOR UPDATE SKIP LOCKED.
+
+    python -m app.external_services.outbox_sender          # drain the outbox once
+    python -m app.external_services.outbox_sender --loop   # keep draining
+"""
+
+import argparse
+import datetime
+import time
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_notification import claim_pending_notifications, mark_failed, mark_sent
+from app.db.session import db_session_as_context
+from .email_service import SMTPDispatcher, build_dispatcher
+from .logging_config import setup_logging
+
+logger = setup_logging(__name__, log_file="outbox_sender.log")
+
+
+def send_batch(db: Session, dispatcher: SMTPDispatcher, batch_size: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Claim one batch of due notifications, send it over the dispatcher and record the outcomes.
+
+    The claimed rows stay locked while they are sent, so no other sender picks them up; if
+    the process dies before the commit they are simply pending again.
+
+    Returns:
+        Tuple[int, int]: Notifications claimed and notifications sent.
+    """
+    now = datetime.datetime.now(datetime.UTC)
+    notifications = claim_pending_notifications(db, batch_size or settings.NOTIFICATION_OUTBOX_BATCH_SIZE, now)
+    if not notifications:
+        db.commit()
+        return 0, 0
+
+    # Leads with the same matches were queued with the same body: serialize it once
+    messages = {}
+    batch = []
+    for notification in notifications:
+        key = (notification.subject, notification.body)
+        if key not in messages:
+            messages[key] = dispatcher.create_message(
+                subject=notification.subject,
+                message=notification.body,
+                from_header=settings.FROM_HEADER
+            ).as_string()
+        batch.append((notification.email, messages[key]))
+
+    results = dispatcher.send_messages(batch)
+    sent_at = datetime.datetime.now(datetime.UTC)
+    for notification, result in zip(notifications, results):
+        if result.sent:
+            mark_sent(notification, sent_at)
+        else:
+            mark_failed(notification, result.error or "unknown error", sent_at)
+    db.commit()
+
+    sent = sum(result.sent for result in results)
+    logger.info(f"Sent {sent} of {len(notifications)} outbox notifications")
+    return len(notifications), sent
+
+
+def drain_outbox(db: Session, dispatcher: SMTPDispatcher, batch_size: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Send batches until no due notification is left.
+
+    Returns:
+        Tuple[int, int]: Notifications claimed and notifications sent, over every batch.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+    claimed = sent = 0
+    while True:
+        batch_claimed, batch_sent = send_batch(db, dispatcher, batch_size)
+        claimed += batch_claimed
+        sent += batch_sent
+        if batch_claimed < batch_size:
+            return claimed, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send the notifications queued in the outbox.")
+    parser.add_argument("--loop", action="store_true", help="Keep draining instead of stopping once empty")
+    args = parser.parse_args()
+
+    dispatcher = build_dispatcher()
+    try:
+        while True:
+            with db_session_as_context() as db:
+                claimed, sent = drain_outbox(db, dispatcher)
+            if claimed:
+                logger.info(f"Outbox drained: {sent} of {claimed} notifications sent")
+            if not args.loop:
+                return
+            time.sleep(settings.NOTIFICATION_OUTBOX_POLL_SECONDS)
+    except KeyboardInterrupt:
+        logger.info("Stopping outbox sender")
+    finally:
+        dispatcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+MESSAGE_HEAD = "<html><body><h2>ICBC Road Test Availability</h2><ul>"
+MESSAGE_TAIL = "</ul></body></html>"
+
+# Identity of a center's slot list within a cycle: its name and the ids of its slots, in order
+FragmentKey = Tuple[str, Tuple[int, ...]]
+
+
+class MessageRenderer:
+    """
+    Render notification bodies, reusing whatever was already rendered this cycle.
+
+    Each slot's line, each center's fragment (keyed by the center and the exact slots
+    listed) and each whole message (keyed by its fragments) is rendered once; leads with
+    the same matches get the very same body string. Bodies are built with a single join,
+    so rendering is linear in the size of the message.
+
+    Keys use the ids of the slot objects, so a renderer must not outlive the availability
+    list it renders: create one per cycle.
+    """
+
+    def __init__(self):
+        self._lines: Dict[int, str] = {}
+        self._fragments: Dict[FragmentKey, str] = {}
+        self._messages: Dict[Tuple[FragmentKey, ...], str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def line(self, slot) -> str:
+        line = self._lines.get(id(slot))
+        if line is None:
+            date_str = slot.appointmentDt.date.strftime('%Y-%m-%d')
+            day_of_week = slot.appointmentDt.dayOfWeek.name.title()
+            line = self._lines[id(slot)] = f"<li>{date_str} ({day_of_week}) - {slot.startTm} to {slot.endTm}</li>"
+        return line
+
+    def fragment(self, key: FragmentKey, slots: Sequence) -> str:
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            parts = [f"<li><strong>{key[0]}</strong>:<ul>"]
+            parts.extend(self.line(slot) for slot in slots)
+            parts.append("</ul></li>")
+            fragment = self._fragments[key] = "".join(parts)
+        return fragment
+
+    def render(self, available_slots: Mapping[str, List]) -> str:
+        """The HTML body listing `available_slots` (Center.name → slots), centers without slots left out."""
+        listed = [(center_name, slots) for center_name, slots in available_slots.items() if slots]
+        keys = tuple((center_name, tuple(map(id, slots))) for center_name, slots in listed)
+        message = self._messages.get(keys)
+        if message is not None:
+            self.hits += 1
+            return message
+
+        self.misses += 1
+        parts = [MESSAGE_HEAD]
+        parts.extend(self.fragment(key, slots) for key, (_, slots) in zip(keys, listed))
+        parts.append(MESSAGE_TAIL)
+        message = self._messages[keys] = "".join(parts)
+        return message
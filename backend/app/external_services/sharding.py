@@ -0,0 +1,46 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Hashable, List, Optional
+
+
+def lead_shard(lead_id: Hashable, shards: int) -> int:
+    """
+    Shard of a lead; stable across processes and runs, unlike hash() of a str.
+
+    The first 32 bits of the md5 of the id, modulo shards, so crud_lead.lead_shard_clause
+    can select a shard's leads in SQL.
+    """
+    return int(hashlib.md5(str(lead_id).encode()).hexdigest()[:8], 16) % shards
+
+
+@dataclass
+class ShardSummary:
+    shard: int
+    leads: int = 0
+    queued: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None  # Set if the shard failed; the cycle's snapshot is then not saved
+
+
+@dataclass
+class RunSummary:
+    """The merged outcome of every shard of a notification run."""
+    shards: List[ShardSummary] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def leads(self) -> int:
+        return sum(shard.leads for shard in self.shards)
+
+    @property
+    def queued(self) -> int:
+        return sum(shard.queued for shard in self.shards)
+
+    @property
+    def failed(self) -> List[ShardSummary]:
+        return [shard for shard in self.shards if shard.error is not None]
+
+    def __str__(self) -> str:
+        slowest = max((shard.seconds for shard in self.shards), default=0.0)
+        return (f"{self.queued} notifications queued for {self.leads} leads by {len(self.shards)} shards "
+                f"in {self.seconds:.2f}s (slowest shard {slowest:.2f}s, {len(self.failed)} failed)")
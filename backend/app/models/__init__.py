@@ -1,2 +1,4 @@
 from .user import User, Lead, UserPreference, user_preferences_centers
 from .center import Center
+from .availability import AvailabilitySlot
+from .notification import NotificationOutbox, NotifiedSlot
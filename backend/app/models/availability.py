@@ -0,0 +1,28 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Date, DateTime, ForeignKey, Index, UniqueConstraint
+
+from app.db.base import Base
+
+
+class AvailabilitySlot(Base):
+    """History of every slot seen at a center, one row per (pos_id, date, start_tm, resource_id)."""
+    __tablename__ = "availability_slots"
+
+    id = Column(BigInteger, primary_key=True)
+    pos_id = Column(Integer, ForeignKey("centers.pos_id"), nullable=False)
+    date = Column(Date, nullable=False)
+    day_of_week = Column(Integer, nullable=False)
+    start_tm = Column(String, nullable=False)
+    end_tm = Column(String, nullable=False)
+    resource_id = Column(Integer, nullable=False)
+    exam_code = Column(String, nullable=False)
+
+    first_seen = Column(DateTime(timezone=True), nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
+    gone_at = Column(DateTime(timezone=True), nullable=True)  # NULL while the slot is still offered
+
+    __table_args__ = (
+        UniqueConstraint("pos_id", "date", "start_tm", "resource_id", name="uq_availability_slots_slot"),
+        Index("ix_availability_slots_active_pos_id", "pos_id", postgresql_where=gone_at.is_(None)),
+        Index("ix_availability_slots_date", "date"),
+        Index("ix_availability_slots_last_seen", "last_seen"),
+    )
@@ -0,0 +1,48 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, Date, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"  # Gave up after NOTIFICATION_OUTBOX_MAX_ATTEMPTS
+
+
+class NotificationOutbox(Base):
+    """Notification emails written by the notifier, sent and tracked by the outbox sender."""
+    __tablename__ = "notification_outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    lead_id = Column(UUID(as_uuid=True), ForeignKey("leads.id", ondelete="CASCADE"), nullable=False)
+    email = Column(String, nullable=False)
+    idempotency_key = Column(String(64), nullable=False)  # sha256 of the lead id and the slots notified
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+
+    status = Column(String, nullable=False, default=OUTBOX_PENDING, server_default=OUTBOX_PENDING)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("idempotency_key", name="uq_notification_outbox_idempotency_key"),
+        Index("ix_notification_outbox_pending", "next_attempt_at", postgresql_where=status == OUTBOX_PENDING),
+    )
+
+
+class NotifiedSlot(Base):
+    """A slot a lead was already notified about, kept for settings.NOTIFICATION_DEDUP_WINDOW_HOURS."""
+    __tablename__ = "notified_slots"
+
+    lead_id = Column(UUID(as_uuid=True), ForeignKey("leads.id", ondelete="CASCADE"), primary_key=True)
+    fingerprint = Column(BigInteger, primary_key=True)  # 64-bit hash of the slot's key, see slot_fingerprint
+    slot_date = Column(Date, nullable=False)  # Useless once the slot's date has passed
+    notified_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_notified_slots_notified_at", "notified_at"),
+    )
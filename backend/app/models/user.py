@@ -1,7 +1,7 @@
 from calendar import Day
 import uuid
 
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, Table, Date
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, Table, Date, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
@@ -12,8 +12,10 @@ from app.db.base import Base
 user_preferences_centers = Table(
     'user_preferences_centers',
     Base.metadata,
-    Column('user_preference_id', UUID, ForeignKey('user_preferences.id')),
-    Column('center_id', Integer, ForeignKey('centers.id'))
+    Column('user_preference_id', UUID, ForeignKey('user_preferences.id'), primary_key=True),
+    Column('center_id', Integer, ForeignKey('centers.id'), primary_key=True),
+    # The primary key serves preference → centers; this serves center → preferences
+    Index('ix_user_preferences_centers_center_id', 'center_id', 'user_preference_id'),
 )
 
 class User(Base):
@@ -54,7 +56,7 @@ class UserPreference(Base):
     __tablename__ = "user_preferences"
 
     id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
-    lead_id = Column(UUID, ForeignKey("leads.id"), nullable=False)
+    lead_id = Column(UUID, ForeignKey("leads.id"), nullable=False, index=True)
     start_date = Column(Date)
     end_date = Column(Date)
     preferred_days = Column(ARRAY(Integer))
@@ -64,6 +66,11 @@ class UserPreference(Base):
 
     lead = relationship("Lead", back_populates="preference", uselist=False)
 
+    __table_args__ = (
+        # Active windows (end_date >= today), with their earliest start_date read from the index
+        Index("ix_user_preferences_end_date_start_date", "end_date", "start_date"),
+    )
+
     @property
     def days_of_week(self):
         return [Day(day) for day in self.preferred_days]
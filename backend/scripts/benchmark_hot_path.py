@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Benchmark the notifier hot path: serialize → match → render.
+
+For every combination of --slots and --leads it builds synthetic ICBC appointments
+(the same payloads fake_icbc_server.py serves) and synthetic leads, then measures:
+- serialize  AvailabilitySerializer.with_centers over the raw appointments, on its fast or validating path
+- match      every lead, with the InvertedIndexMatcher, the NumpyMatcher or the per-lead
+             match_availability_to_users scan
+- render     prepare_message for every lead with at least one match, sharing one MessageRenderer
+
+Each stage is timed once as-is, then run again under tracemalloc for its peak memory.
+The scan engine is quadratic, so it stops after --match-budget seconds and the time for
+all leads is extrapolated from the leads measured.
+
+Results are written as JSON so runs can be compared, e.g. before and after an optimisation:
+    python scripts/benchmark_hot_path.py --slots 1000 10000 --leads 1000 10000
+    python scripts/benchmark_hot_path.py --compare benchmarks/hot_path-<before>.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from calendar import Day
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.external_services import notifier
+from app.external_services.availability_serializer import AvailabilitySerializer
+from app.external_services.matching import InvertedIndexMatcher, NumpyMatcher
+from app.external_services.rendering import MessageRenderer
+from app.models import Center, Lead, UserPreference
+from scripts.fake_icbc_server import FakeICBC, FakeICBCConfig
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DAYS = 30  # Days of availability per center
+START_DATE = datetime.date(2030, 1, 1)
+MATCHERS = {"index": InvertedIndexMatcher, "numpy": NumpyMatcher}
+
+
+@dataclass
+class StageResult:
+    seconds: float
+    peak_bytes: Optional[int]
+    count: int  # Items serialized, leads matched or messages rendered
+    extrapolated_seconds: Optional[float] = None  # Matching only, when the budget ran out
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_centers(n_centers: int) -> List[Dict]:
+    fake = FakeICBC(FakeICBCConfig(centers=n_centers))
+    return [location["pos"] for location in fake.locations()]
+
+
+def make_center(pos: Dict) -> Center:
+    return Center(
+        id=pos["posId"],
+        pos_id=pos["posId"],
+        name=pos["agency"],
+        address=pos["address"],
+        city=pos["city"],
+        url=pos["url"],
+        postal_code=pos["postcode"],
+        lat=pos["lat"],
+        lng=pos["lng"],
+    )
+
+
+def build_slots(n_slots: int, n_centers: int, seed: int) -> List[Dict]:
+    """Raw appointments spread evenly over the centers and DAYS days."""
+    slots_per_day = -(-n_slots // (n_centers * DAYS))
+    fake = FakeICBC(FakeICBCConfig(centers=n_centers, days=DAYS, slots_per_day=slots_per_day, churn=0, seed=seed))
+    slots = [slot for pos_id in fake.pos_ids() for slot in fake.appointments(pos_id, START_DATE)]
+    return random.Random(seed).sample(slots, n_slots)
+
+
+def build_leads(n_leads: int, centers: List[Center], seed: int) -> List[Lead]:
+    """Transient leads wanting 1-5 centers, 1-7 days and a window inside the slots' DAYS."""
+    rng = random.Random(seed)
+    leads = []
+    for i in range(n_leads):
+        start_date = START_DATE + datetime.timedelta(days=rng.randrange(DAYS))
+        preference = UserPreference(
+            start_date=start_date,
+            end_date=start_date + datetime.timedelta(days=rng.randrange(1, DAYS)),
+            preferred_days=sorted(day.value for day in rng.sample(list(Day), rng.randint(1, 7))),
+            preferred_centers=rng.sample(centers, rng.randint(1, min(5, len(centers)))),
+        )
+        leads.append(Lead(email=f"lead{i}@example.com", preference=preference))
+    return leads
+
+
+def center_session(positions: List[Dict]) -> Session:
+    """In-memory SQLite session holding the centers, for AvailabilitySerializer.with_centers."""
+    engine = create_engine("sqlite://")
+    Center.__table__.create(engine)
+    db = Session(engine)
+    db.add_all(make_center(pos) for pos in positions)
+    db.commit()
+    return db
+
+
+def measure(stage: Callable[[], object], memory: bool) -> Tuple[object, float, Optional[int]]:
+    """Run `stage` timed, then again under tracemalloc when `memory` is set."""
+    started = time.perf_counter()
+    result = stage()
+    seconds = time.perf_counter() - started
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def match_leads(items: List, leads: List[Lead], engine: str,
+                budget: Optional[float] = None) -> Tuple[int, List[Dict]]:
+    """
+    Match the leads with `engine`, returning how many leads were matched and the non-empty matches.
+
+    The "scan" engine stops early once `budget` seconds have passed.
+    """
+    if engine in MATCHERS:
+        return len(leads), list(MATCHERS[engine].from_leads(leads).match(items).values())
+
+    started = time.perf_counter()
+    matches = []
+    for count, lead in enumerate(leads, start=1):
+        matched = notifier.match_availability_to_users(items, lead)
+        if matched:
+            matches.append(matched)
+        if budget is not None and time.perf_counter() - started > budget:
+            return count, matches
+    return len(leads), matches
+
+
+def render(matches: List[Dict]) -> List[str]:
+    renderer = MessageRenderer()  # One per cycle, as in notify_lead_by_preference
+    return [notifier.prepare_message(matched, renderer) for matched in matches]
+
+
+def run_case(items: List, leads: List[Lead], engine: str, match_budget: float,
+             memory: bool) -> Dict[str, StageResult]:
+    (measured, matches), seconds, _ = measure(lambda: match_leads(items, leads, engine, match_budget), memory=False)
+    peak = None
+    if memory:
+        _, _, peak = measure(lambda: match_leads(items, leads[:measured], engine), memory=True)
+    match = StageResult(seconds, peak, measured)
+    if measured < len(leads):
+        match.extrapolated_seconds = seconds * len(leads) / measured
+
+    messages, seconds, peak = measure(lambda: render(matches), memory)
+    return {"match": match, "render": StageResult(seconds, peak, len(messages))}
+
+
+def run(slot_sizes: List[int], lead_sizes: List[int], n_centers: int, match_budget: float,
+        memory: bool, seed: int, engine: str = "index", serializer: str = "fast") -> Dict:
+    # Every log line would otherwise be part of the render timing
+    notifier.logger.setLevel(logging.WARNING)
+
+    positions = build_centers(n_centers)
+    db = center_session(positions)
+    lead_centers = [make_center(pos) for pos in positions]
+
+    cases = []
+    for n_slots in slot_sizes:
+        raw = build_slots(n_slots, n_centers, seed)
+        fast = serializer == "fast"
+        serialized, seconds, peak = measure(lambda: AvailabilitySerializer.with_centers(raw, db, fast=fast), memory)
+        serialize = StageResult(seconds, peak, len(serialized.root))
+        logger.info(f"⏱️ serialize {n_slots} slots: {seconds:.3f}s")
+
+        for n_leads in lead_sizes:
+            leads = build_leads(n_leads, lead_centers, seed)
+            stages = {"serialize": serialize, **run_case(serialized.root, leads, engine, match_budget, memory)}
+            match = stages["match"]
+            logger.info(f"⏱️ {n_slots} slots × {n_leads} leads: match {match.seconds:.3f}s "
+                        f"({match.count} leads), render {stages['render'].seconds:.3f}s")
+            cases.append({
+                "slots": n_slots,
+                "leads": n_leads,
+                "stages": {name: asdict(result) for name, result in stages.items()},
+            })
+    db.close()
+
+    return {
+        "benchmark": "hot_path",
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"engine": engine, "serializer": serializer, "centers": n_centers, "days": DAYS, "match_budget": match_budget, "memory": memory, "seed": seed},
+        "cases": cases,
+    }
+
+
+def stage_seconds(stage: Dict) -> float:
+    return stage["extrapolated_seconds"] or stage["seconds"]
+
+
+def compare(baseline: Dict, current: Dict) -> List[str]:
+    """One line per case and stage present in both results, with the speed-up over baseline."""
+    before = {(case["slots"], case["leads"]): case["stages"] for case in baseline["cases"]}
+    lines = []
+    for case in current["cases"]:
+        stages = before.get((case["slots"], case["leads"]))
+        if stages is None:
+            continue
+        for name, stage in case["stages"].items():
+            if name not in stages:
+                continue
+            old, new = stage_seconds(stages[name]), stage_seconds(stage)
+            lines.append(f"{case['slots']} slots × {case['leads']} leads {name}: "
+                         f"{old:.3f}s → {new:.3f}s ({old / new if new else float('inf'):.1f}×)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the serialize → match → render hot path.")
+    parser.add_argument("--slots", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--leads", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--centers", type=int, default=80)
+    parser.add_argument("--serializer", choices=["fast", "validated"], default="fast",
+                        help="AvailabilitySerializer.with_centers path to measure")
+    parser.add_argument("--engine", choices=["index", "numpy", "scan"], default="index", help="Matching engine to measure")
+    parser.add_argument("--match-budget", type=float, default=30.0,
+                        help="Seconds of matching per case before extrapolating")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Defaults to benchmarks/hot_path-<timestamp>.json")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args.slots, args.leads, args.centers, args.match_budget, not args.no_memory, args.seed, args.engine,
+                  args.serializer)
+
+    output = args.output or os.path.join(
+        "benchmarks", f"hot_path-{datetime.datetime.now():%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare(baseline, results):
+            logger.info(line)
+
+
+if __name__ == "__main__":
+    main()
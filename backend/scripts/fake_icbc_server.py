@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the ICBC booking API, for load testing the crawlers offline.
+
+Serves the three endpoints the crawlers call:
+- PUT  .../webLogin                 returns a JWT in the Authorization header
+- POST .../getAvailableAppointments returns the appointments of the requested aPosID
+- PUT  .../getNearestPos            returns the test centers (locations)
+
+Payloads come from recorded fixtures (see record_icbc_fixtures.py) when available, otherwise
+they are synthesized. Latency, error rate and token lifetime are tunable, so crawl concurrency,
+retries, circuit breaking and token refresh can be exercised and benchmarked.
+
+Usage:
+    python scripts/fake_icbc_server.py --port 8089 --latency-ms 300 --error-rate 0.05
+    # then, in .env:
+    ICBC_LOGIN_URL=http://localhost:8089/deas-api/v1/webLogin/webLogin
+    ICBC_APPOINTMENT_URL=http://localhost:8089/deas-api/v1/web/getAvailableAppointments
+    ICBC_TEST_CENTERS_LOCATION_URL=http://localhost:8089/deas-api/v1/web/getNearestPos
+"""
+
+import argparse
+import calendar
+import datetime
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from jose import jwt, JWTError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TOKEN_SECRET = "fake-icbc-secret"
+LOGIN_PATH = "/deas-api/v1/webLogin/webLogin"
+APPOINTMENTS_PATH = "/deas-api/v1/web/getAvailableAppointments"
+LOCATIONS_PATH = "/deas-api/v1/web/getNearestPos"
+
+
+@dataclass
+class FakeICBCConfig:
+    latency_ms: float = 0  # Mean added latency per request
+    jitter_ms: float = 0  # Latency varies uniformly by up to this much either way
+    error_rate: float = 0  # Fraction of appointment/location requests answered with a 503
+    token_ttl: int = 600  # Seconds before an issued token is rejected with a 401
+    centers: int = 80  # Synthetic centers when no locations fixture is present
+    days: int = 30  # Days of synthetic availability per center
+    slots_per_day: int = 4  # Synthetic slots per center and day (before churn)
+    churn: float = 0.1  # Fraction of synthetic slots randomly missing from each response
+    fixtures_dir: Optional[str] = None  # Directory written by record_icbc_fixtures.py
+    seed: int = 0
+
+
+class FakeICBC:
+    """Payload and token logic of the fake server, independent of HTTP."""
+
+    def __init__(self, config: FakeICBCConfig):
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._locations = self._load_fixture("locations.json")
+
+    def issue_token(self) -> str:
+        expires_at = int(time.time()) + self.config.token_ttl
+        return "Bearer " + jwt.encode({"exp": expires_at, "sub": "fake"}, TOKEN_SECRET, algorithm="HS256")
+
+    @staticmethod
+    def is_valid_token(authorization: Optional[str]) -> bool:
+        if not authorization or not authorization.startswith("Bearer "):
+            return False
+        try:
+            jwt.decode(authorization.removeprefix("Bearer "), TOKEN_SECRET, algorithms=["HS256"])
+        except JWTError:  # Bad signature or expired
+            return False
+        return True
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.config.error_rate
+
+    def delay(self):
+        with self._lock:
+            jitter = self._random.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        time.sleep(max(0.0, self.config.latency_ms + jitter) / 1000)
+
+    def locations(self) -> List[Dict]:
+        if self._locations is not None:
+            return self._locations
+        return [
+            {
+                "pos": {
+                    "posId": pos_id,
+                    "agency": f"Fake Driver Licensing {pos_id}",
+                    "address": f"{pos_id} Fake Street",
+                    "city": "Fakeville",
+                    "postcode": f"V{pos_id:05d}",
+                    "lat": 49.28,
+                    "lng": -123.13,
+                    "url": f"http://fake-icbc.local/centers/{pos_id}",
+                }
+            }
+            for pos_id in self.pos_ids()
+        ]
+
+    def pos_ids(self) -> List[int]:
+        if self._locations is not None:
+            return [location["pos"]["posId"] for location in self._locations]
+        return list(range(1, self.config.centers + 1))
+
+    def appointments(self, pos_id: int, exam_date: datetime.date) -> List[Dict]:
+        recorded = self._load_fixture(os.path.join("appointments", f"{pos_id}.json"))
+        if recorded is not None:
+            return recorded
+
+        # The same center always offers the same slots, minus a random share to simulate churn
+        center_random = random.Random(f"{self.config.seed}-{pos_id}")
+        with self._lock:
+            keep = [self._random.random() >= self.config.churn
+                    for _ in range(self.config.days * self.config.slots_per_day)]
+        slots = []
+        for day in range(self.config.days):
+            date = exam_date + datetime.timedelta(days=day)
+            for slot in range(self.config.slots_per_day):
+                start_minutes = 8 * 60 + center_random.randrange(0, 16) * 30
+                if not keep[day * self.config.slots_per_day + slot]:
+                    continue
+                slots.append({
+                    "appointmentDt": {"date": date.isoformat(), "dayOfWeek": calendar.day_name[date.weekday()]},
+                    "dlExam": {"code": "5-R-1", "description": "5-R-ROAD"},
+                    "endTm": f"{(start_minutes + 35) // 60:02d}:{(start_minutes + 35) % 60:02d}",
+                    "lemgMsgId": 35,
+                    "posId": pos_id,
+                    "resourceId": 20000 + pos_id * 10 + slot,
+                    "signature": f"{pos_id}-{date.isoformat()}-{slot}-{center_random.getrandbits(64):x}",
+                    "startTm": f"{start_minutes // 60:02d}:{start_minutes % 60:02d}",
+                })
+        return slots
+
+    def _load_fixture(self, name: str):
+        if not self.config.fixtures_dir:
+            return None
+        path = os.path.join(self.config.fixtures_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+
+def make_handler(fake: FakeICBC):
+    class FakeICBCHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+        def do_PUT(self):
+            if self.path.endswith("webLogin"):
+                self._read_json()
+                fake.delay()
+                self._send(200, {}, headers={"Authorization": fake.issue_token()})
+            elif self.path.endswith("getNearestPos"):
+                self._authorized(lambda body: fake.locations())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.endswith("getAvailableAppointments"):
+                self._authorized(lambda body: fake.appointments(
+                    int(body["aPosID"]),
+                    datetime.date.fromisoformat(body.get("examDate") or datetime.date.today().isoformat()),
+                ))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _authorized(self, respond):
+            body = self._read_json()
+            fake.delay()
+            if not fake.is_valid_token(self.headers.get("Authorization")):
+                self._send(401, {"error": "unauthorized"})
+            elif fake.should_fail():
+                self._send(503, {"error": "service unavailable"})
+            else:
+                self._send(200, respond(body))
+
+        def _read_json(self) -> Dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _send(self, status: int, payload, headers: Optional[Dict] = None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return FakeICBCHandler
+
+
+class FakeICBCServer:
+    """Threaded HTTP server running FakeICBC, usable from scripts and tests."""
+
+    def __init__(self, config: Optional[FakeICBCConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.fake = FakeICBC(config or FakeICBCConfig())
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.fake))
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self) -> Dict[str, str]:
+        """ICBC_*_URL settings pointing at this server."""
+        return {
+            "ICBC_LOGIN_URL": self.base_url + LOGIN_PATH,
+            "ICBC_APPOINTMENT_URL": self.base_url + APPOINTMENTS_PATH,
+            "ICBC_TEST_CENTERS_LOCATION_URL": self.base_url + LOCATIONS_PATH,
+        }
+
+    def start(self) -> "FakeICBCServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake ICBC booking API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--token-ttl", type=int, default=600)
+    parser.add_argument("--centers", type=int, default=80)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--slots-per-day", type=int, default=4)
+    parser.add_argument("--churn", type=float, default=0.1)
+    parser.add_argument("--fixtures-dir", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeICBCConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        token_ttl=args.token_ttl,
+        centers=args.centers,
+        days=args.days,
+        slots_per_day=args.slots_per_day,
+        churn=args.churn,
+        fixtures_dir=args.fixtures_dir,
+        seed=args.seed,
+    )
+    server = FakeICBCServer(config, host=args.host, port=args.port)
+    logger.info(f"🚦 Fake ICBC listening on {server.base_url}; point your .env at it:")
+    for name, url in server.urls.items():
+        logger.info(f"{name}={url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 Stopping fake ICBC")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
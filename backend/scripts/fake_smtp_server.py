@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gmail SMTP server, for testing and load testing email dispatch offline.
+
+Speaks enough SMTP for smtplib (EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP,
+QUIT), accepts any credentials and keeps every delivered message in memory. It does not
+offer STARTTLS, so point the notifier at it with SMTP_STARTTLS=false. Per-message latency,
+dropped connections and refused recipients are tunable, so pooling, parallel sending and
+reconnects can be exercised.
+
+Usage:
+    python scripts/fake_smtp_server.py --port 8025 --latency-ms 200 --drop-after 50
+    # then, in .env:
+    SMTP_SERVER=localhost
+    SMTP_PORT=8025
+    SMTP_STARTTLS=false
+"""
+
+import argparse
+import logging
+import socketserver
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FakeSMTPConfig:
+    latency_ms: float = 0  # Added delay before a message is accepted
+    drop_after: int = 0  # Close each connection after this many messages; 0 never does
+    refuse: Set[str] = field(default_factory=set)  # Recipients answered with a 550
+
+
+@dataclass
+class DeliveredMessage:
+    mail_from: str
+    rcpt_tos: List[str]
+    data: str
+
+
+def make_handler(server: "FakeSMTPServer"):
+    class FakeSMTPHandler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            server.record_connection()
+            self.reply("220 fake-smtp ESMTP ready")
+            mail_from, rcpt_tos, delivered = None, [], 0
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command, _, argument = line.decode().rstrip("\r\n").partition(" ")
+                command = command.upper()
+
+                if command == "EHLO":
+                    self.reply("250-fake-smtp", "250-AUTH PLAIN LOGIN", "250 8BITMIME")
+                elif command == "HELO":
+                    self.reply("250 fake-smtp")
+                elif command == "AUTH":
+                    self.authenticate(argument)
+                elif command == "MAIL":
+                    mail_from, rcpt_tos = self.address(argument), []
+                    self.reply("250 OK")
+                elif command == "RCPT":
+                    recipient = self.address(argument)
+                    if recipient in server.config.refuse:
+                        self.reply(f"550 {recipient} refused")
+                    else:
+                        rcpt_tos.append(recipient)
+                        self.reply("250 OK")
+                elif command == "DATA":
+                    if not rcpt_tos:
+                        self.reply("503 Need RCPT first")
+                        continue
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = self.read_data()
+                    time.sleep(server.config.latency_ms / 1000)
+                    server.deliver(DeliveredMessage(mail_from, rcpt_tos, data))
+                    self.reply("250 OK queued")
+                    mail_from, rcpt_tos = None, []
+                    delivered += 1
+                    if server.config.drop_after and delivered >= server.config.drop_after:
+                        return  # Hang up without a 421, like a server timing the session out
+                elif command == "RSET":
+                    mail_from, rcpt_tos = None, []
+                    self.reply("250 OK")
+                elif command == "NOOP":
+                    self.reply("250 OK")
+                elif command == "QUIT":
+                    self.reply("221 Bye")
+                    return
+                else:
+                    self.reply("502 Command not implemented")
+
+        def authenticate(self, argument: str):
+            mechanism, _, initial = argument.partition(" ")
+            if mechanism.upper() == "PLAIN" and not initial:
+                self.reply("334 ")
+                self.rfile.readline()
+            elif mechanism.upper() == "LOGIN":
+                if not initial:
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                self.reply("334 UGFzc3dvcmQ6")
+                self.rfile.readline()
+            self.reply("235 Authentication successful")
+
+        def read_data(self) -> str:
+            lines = []
+            while True:
+                line = self.rfile.readline().decode().rstrip("\r\n")
+                if line == ".":
+                    return "\n".join(lines)
+                lines.append(line[1:] if line.startswith("..") else line)
+
+        @staticmethod
+        def address(argument: str) -> str:
+            _, _, address = argument.partition(":")
+            return address.split()[0].strip("<>") if address.split() else ""
+
+        def reply(self, *lines: str):
+            self.wfile.write("".join(f"{line}\r\n" for line in lines).encode())
+
+    return FakeSMTPHandler
+
+
+class FakeSMTPServer:
+    """Threaded fake SMTP server, usable from scripts and tests."""
+
+    def __init__(self, config: Optional[FakeSMTPConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeSMTPConfig()
+        self.messages: List[DeliveredMessage] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self.tcp_server = socketserver.ThreadingTCPServer((host, port), make_handler(self))
+        self.tcp_server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        return self.tcp_server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.tcp_server.server_address[1]
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def deliver(self, message: DeliveredMessage):
+        with self._lock:
+            self.messages.append(message)
+
+    def start(self) -> "FakeSMTPServer":
+        self._thread = threading.Thread(target=self.tcp_server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.tcp_server.shutdown()
+        self.tcp_server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake SMTP server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--drop-after", type=int, default=0)
+    parser.add_argument("--refuse", nargs="*", default=[])
+    args = parser.parse_args()
+
+    config = FakeSMTPConfig(latency_ms=args.latency_ms, drop_after=args.drop_after, refuse=set(args.refuse))
+    server = FakeSMTPServer(config, host=args.host, port=args.port)
+    logger.info(f"📮 Fake SMTP listening on {server.host}:{server.port}; point your .env at it:")
+    logger.info(f"SMTP_SERVER={server.host}")
+    logger.info(f"SMTP_PORT={server.port}")
+    logger.info("SMTP_STARTTLS=false")
+    try:
+        server.tcp_server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info(f"🛑 Stopping fake SMTP after {len(server.messages)} messages")
+    finally:
+        server.tcp_server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Record real ICBC responses into fixture files replayed by fake_icbc_server.py.
+
+Logs in with the credentials from .env, then saves:
+- <output>/locations.json                 every test center returned for TEST_LOCATIONS_TO_SCRAPE
+- <output>/appointments/<posId>.json      the available appointments of each of those centers
+
+Usage:
+    python scripts/record_icbc_fixtures.py --output tests/fixtures/icbc
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+from functools import partial
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from app.core.config import settings
+from app.external_services.crawlers import constants
+from app.external_services.crawlers.icbc_client import get_icbc_client
+from app.external_services.crawlers.icbc_login import token_manager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def write_json(path: str, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def record_locations(client) -> list:
+    today = datetime.date.today().isoformat()
+    locations = {}
+    for location in constants.TEST_LOCATIONS_TO_SCRAPE:
+        body = {"lng": location["lng"], "lat": location["lat"], "examType": "5-R-1", "startDate": today}
+        try:
+            data = token_manager.with_token(partial(client.get_test_centers, body)).json()
+        except requests.RequestException as e:
+            logger.error(f"❌ Failed to record locations for {location['city']}: {e}")
+            continue
+        for center in data if isinstance(data, list) else [data]:
+            locations[center["pos"]["posId"]] = center
+    return list(locations.values())
+
+
+def record_appointments(client, pos_id: int) -> list:
+    payload = {
+        'aPosID': pos_id,
+        'examType': '5-R-1',
+        'examDate': datetime.date.today().isoformat(),
+        'ignoreReserveTime': False,
+        'prfDaysOfWeek': '[0,1,2,3,4,5,6]',
+        'prfPartsOfDay': '[0,1]',
+        'lastName': settings.USER_LAST_NAME,
+        'licenseNumber': settings.USER_LICENSE_NUMBER,
+    }
+    return token_manager.with_token(partial(client.get_available_appointments, payload)).json()
+
+
+def run(output: str):
+    logger.info(f"🎙️ Recording ICBC responses into {output}")
+    client = get_icbc_client()
+
+    locations = record_locations(client)
+    write_json(os.path.join(output, "locations.json"), locations)
+    logger.info(f"✅ Recorded {len(locations)} test centers")
+
+    for center in locations:
+        pos_id = center["pos"]["posId"]
+        try:
+            appointments = record_appointments(client, pos_id)
+        except requests.RequestException as e:
+            logger.error(f"❌ Failed to record appointments for {pos_id}: {e}")
+            continue
+        write_json(os.path.join(output, "appointments", f"{pos_id}.json"), appointments)
+        logger.info(f"✅ Recorded {len(appointments)} appointments for {pos_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record real ICBC responses as fake server fixtures.")
+    parser.add_argument("--output", default=os.path.join("tests", "fixtures", "icbc"))
+    run(parser.parse_args().output)
@@ -1,15 +1,24 @@
+import calendar
+import datetime
+from unittest.mock import MagicMock, Mock
 from urllib.parse import urljoin
 import pytest
+import requests
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.core.config import settings
+from app.crud.center_registry import center_registry
+from app.crud.crud_lead import create_lead_with_preference, get_lead_preferences
 from app.db.base import Base
+from app.external_services.availability_serializer import AvailabilityItem
+from app.external_services.email_service import DispatchResult, SMTPDispatcher, build_message
 from app.main import app
 from app.db.session import get_db
 from app.models import Center, Lead
+from app.schemas import LeadCreate, UserPreferenceCreate
 
 
 # Use an test dedicated database for testing
@@ -18,6 +27,42 @@ SQLALCHEMY_DATABASE_URL = settings.TEST_DATABASE_URL
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+SLOT_DATE = datetime.date(2030, 1, 7)  # A Monday
+
+
+def raw_slot(pos_id, date=SLOT_DATE, start="09:00", end="09:35", resource_id=21903, signature="signature"):
+    """An available slot at `pos_id` as the ICBC API returns it, on SLOT_DATE unless `date` is given."""
+    return {
+        "appointmentDt": {"date": date.isoformat(), "dayOfWeek": calendar.day_name[date.weekday()]},
+        "dlExam": {"code": "5-R-1", "description": "5-R-ROAD"},
+        "endTm": end,
+        "lemgMsgId": 35,
+        "posId": pos_id,
+        "resourceId": resource_id,
+        "signature": signature,
+        "startTm": start,
+    }
+
+
+def slot(center, start="09:00", **fields):
+    """An available slot at `center`, on SLOT_DATE unless `fields` give raw_slot another date."""
+    return AvailabilityItem.with_center(raw_slot(center.pos_id, start=start, **fields), center)
+
+
+def http_error(status_code):
+    """A requests.HTTPError carrying a response with `status_code`."""
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f"{status_code} error", response=response)
+
+
+@pytest.fixture(autouse=True)
+def fresh_center_registry():
+    """Every test starts with an empty database, so it must not see the centers cached by another."""
+    center_registry.invalidate()
+    yield
+    center_registry.invalidate()
+
 
 @pytest.fixture(scope="function")
 def db():
@@ -86,6 +131,48 @@ def centers(db):
     return centers
 
 
+@pytest.fixture
+def lead_centers():
+    """The preferred center ids of each lead created by `leads`; override it to change them."""
+    return [[69], [69], [85]]
+
+
+@pytest.fixture
+def leads(db, centers, lead_centers):
+    """Leads wanting SLOT_DATE's Monday at their lead_centers, as streamed to the notifier."""
+    for i, center_ids in enumerate(lead_centers):
+        create_lead_with_preference(
+            db,
+            LeadCreate(email=f"lead{i}@example.com"),
+            UserPreferenceCreate(start_date=SLOT_DATE, end_date=SLOT_DATE + datetime.timedelta(days=7),
+                                 preferred_centers_ids=center_ids, preferred_days=[calendar.MONDAY]),
+        )
+    return get_lead_preferences(db)
+
+
+@pytest.fixture
+def sample_lead_preference(centers):
+    """A mock Lead wanting Mondays, Tuesdays and Fridays of June 2024 at the first two centers."""
+    lead = Mock()
+    lead.email = "test@example.com"
+    lead.preference.preferred_centers = [centers[0], centers[1]]
+    lead.preference.preferred_days = [0, 1, 4]  # Monday, Tuesday, Friday
+    lead.preference.start_date = datetime.date(2024, 6, 1)
+    lead.preference.end_date = datetime.date(2024, 6, 30)
+    return lead
+
+
+@pytest.fixture
+def dispatcher():
+    """An SMTPDispatcher that builds real messages and reports every one of them as sent."""
+    dispatcher = MagicMock(spec=SMTPDispatcher)
+    dispatcher.create_message.side_effect = lambda subject, message, from_header: build_message(
+        subject, message, from_header, "sender@example.com", "inbox@example.com")
+    dispatcher.send_messages.side_effect = lambda batch: [DispatchResult(key, sent=True, attempts=1)
+                                                          for key, _ in batch]
+    return dispatcher
+
+
 @pytest.fixture(scope="function")
 def existing_lead(db):
     lead = Lead(email="existing@example.com")
@@ -0,0 +1,97 @@
+from calendar import Day
+from datetime import date, datetime, timedelta, UTC
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_availability import HistorySlot, record_availability
+from app.external_services.availability_serializer import AvailabilityItem
+from app.models import AvailabilitySlot
+from tests.conftest import raw_slot
+
+
+def make_item(pos_id, day, start_tm="09:00"):
+    return AvailabilityItem.model_validate(raw_slot(pos_id, date(2024, 6, day), start_tm, "10:30", signature="sig"))
+
+
+class TestRecordAvailability:
+    """Test writing crawl cycles into the availability history."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db: Session, centers):
+        self.db = db
+        self.pos_id = centers[0].pos_id
+        self.other_pos_id = centers[1].pos_id
+        self.first_cycle = datetime(2024, 6, 1, 12, tzinfo=UTC)
+        self.second_cycle = self.first_cycle + timedelta(minutes=5)
+        self.exam_date = self.first_cycle.date()
+
+    def slots(self):
+        return {(slot.pos_id, slot.date.day, slot.start_tm): slot
+                for slot in self.db.query(AvailabilitySlot).populate_existing()}
+
+    def test_inserts_new_slots(self):
+        with patch.object(settings, "AVAILABILITY_HISTORY_BATCH_SIZE", 2):
+            record_availability(self.db, {
+                self.pos_id: [make_item(self.pos_id, 10), make_item(self.pos_id, 11), make_item(self.pos_id, 11)],
+                self.other_pos_id: [make_item(self.other_pos_id, 10)],
+            }, self.first_cycle, self.exam_date)
+
+        slots = self.slots()
+        assert set(slots) == {(self.pos_id, 10, "09:00"), (self.pos_id, 11, "09:00"), (self.other_pos_id, 10, "09:00")}
+        slot = slots[(self.pos_id, 10, "09:00")]
+        assert slot.first_seen == slot.last_seen == self.first_cycle
+        assert slot.day_of_week == Day.MONDAY.value
+        assert slot.exam_code == "5-R-1"
+        assert slot.gone_at is None
+
+    def test_updates_seen_and_gone_slots(self):
+        record_availability(self.db, {
+            self.pos_id: [make_item(self.pos_id, 10), make_item(self.pos_id, 11)],
+            self.other_pos_id: [make_item(self.other_pos_id, 10)],
+        }, self.first_cycle, self.exam_date)
+
+        # The other center is not part of this cycle, its slots must stay untouched
+        record_availability(self.db, {self.pos_id: [make_item(self.pos_id, 10)]}, self.second_cycle, self.exam_date)
+
+        slots = self.slots()
+        still_offered = slots[(self.pos_id, 10, "09:00")]
+        assert still_offered.first_seen == self.first_cycle
+        assert still_offered.last_seen == self.second_cycle
+        assert still_offered.gone_at is None
+        assert slots[(self.pos_id, 11, "09:00")].gone_at == self.second_cycle
+        assert slots[(self.other_pos_id, 10, "09:00")].gone_at is None
+
+    def test_reappearing_slot_is_active_again(self):
+        record_availability(self.db, {self.pos_id: [make_item(self.pos_id, 10)]}, self.first_cycle, self.exam_date)
+        record_availability(self.db, {self.pos_id: []}, self.second_cycle, self.exam_date)
+        assert self.slots()[(self.pos_id, 10, "09:00")].gone_at == self.second_cycle
+
+        third_cycle = self.second_cycle + timedelta(minutes=5)
+        record_availability(self.db, {self.pos_id: [make_item(self.pos_id, 10)]}, third_cycle, self.exam_date)
+
+        slot = self.slots()[(self.pos_id, 10, "09:00")]
+        assert slot.gone_at is None
+        assert slot.last_seen == third_cycle
+
+    def test_slots_before_the_exam_date_are_not_marked_gone(self):
+        record_availability(self.db, {
+            self.pos_id: [make_item(self.pos_id, 10), make_item(self.pos_id, 11)],
+        }, self.first_cycle, self.exam_date)
+
+        # A later crawl only asked about the slots from the 11th on
+        record_availability(self.db, {self.pos_id: []}, self.second_cycle, date(2024, 6, 11))
+
+        slots = self.slots()
+        assert slots[(self.pos_id, 10, "09:00")].gone_at is None
+        assert slots[(self.pos_id, 11, "09:00")].gone_at == self.second_cycle
+
+    def test_records_history_slots(self):
+        item = make_item(self.pos_id, 10)
+
+        record_availability(self.db, {self.pos_id: {HistorySlot.from_item(item)}}, self.first_cycle, self.exam_date)
+
+        slot = self.slots()[(self.pos_id, 10, "09:00")]
+        assert (slot.day_of_week, slot.end_tm, slot.exam_code) == (Day.MONDAY.value, "10:30", "5-R-1")
@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.crud.center_registry import CenterRegistry
+from app.crud.crud_center import get_centers_by_ids
+from app.models import Center
+from tests.conftest import engine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def registry(clock):
+    return CenterRegistry(ttl=60, clock=clock)
+
+
+@pytest.fixture
+def queries():
+    """Statements sent to the test database while the fixture is active."""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def add_center(db: Session, pos_id: int) -> Center:
+    center = Center(id=pos_id, pos_id=pos_id, name=f"Center {pos_id}", address=f"{pos_id} Street",
+                    city="Town", url=f"http://{pos_id}.example", postal_code=str(pos_id), lat=1, lng=1)
+    db.add(center)
+    db.commit()
+    return center
+
+
+class TestCenterRegistry:
+    """Test the in-memory center registry."""
+
+    def test_loads_centers_once(self, registry, db, centers, queries):
+        assert [center.pos_id for center in registry.all(db)] == [69, 85, 6985]
+        assert set(registry.by_pos_ids(db, [69, 6985])) == {69, 6985}
+        assert [center.id for center in registry.get_by_ids(db, [85])] == [85]
+
+        assert len(queries) == 1
+
+    def test_reloads_after_ttl(self, registry, clock, db, centers, queries):
+        registry.all(db)
+        db.query(Center).filter(Center.id == 69).update({"name": "Renamed"})
+        db.commit()
+
+        clock.now = 59
+        assert registry.by_pos_ids(db, [69])[69].name == "Center 1"
+        clock.now = 60
+        assert registry.by_pos_ids(db, [69])[69].name == "Renamed"
+
+    def test_invalidate(self, registry, db, centers):
+        registry.all(db)
+        add_center(db, 7)
+
+        registry.invalidate()
+
+        assert 7 in {center.pos_id for center in registry.all(db)}
+
+    def test_unknown_id_reloads_at_most_once_per_interval(self, registry, clock, db, centers, queries):
+        registry.all(db)
+        add_center(db, 7)
+        queries.clear()
+
+        assert [center.id for center in registry.get_by_ids(db, [7, 8])] == [7]
+        assert registry.get_by_ids(db, [8]) == []
+        assert len(queries) == 1
+
+        clock.now = CenterRegistry.MISS_REFRESH_SECONDS
+        registry.get_by_ids(db, [8])
+        assert len(queries) == 2
+
+    def test_get_by_ids_attaches_to_session(self, registry, db, centers):
+        other = Session(bind=engine)
+        try:
+            found = registry.get_by_ids(other, [85, 69, 85])
+
+            assert [center.id for center in found] == [85, 69]
+            assert all(center in other for center in found)
+            assert found[0].name == "Center 2"
+        finally:
+            other.close()
+
+    def test_snapshots_are_detached(self, registry, db, centers):
+        snapshot = registry.by_pos_ids(db, [69])[69]
+
+        assert snapshot not in db
+        assert snapshot is not centers[0]
+
+    def test_get_centers_by_ids(self, db, centers):
+        assert {center.id for center in get_centers_by_ids(db, [69, 6985, 1])} == {69, 6985}
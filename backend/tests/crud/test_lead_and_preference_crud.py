@@ -5,7 +5,8 @@ import pytest
 from sqlalchemy.orm import Session
 from app.crud.crud_lead import (
     create_lead_with_preference,
-    get_lead_preferences
+    get_lead_preferences,
+    iter_active_lead_preferences
 )
 from app.schemas import LeadCreate, UserPreferenceCreate
 
@@ -64,9 +65,37 @@ class TestLeadAndPreferenceCRUD:
         assert len(result) == 1
         lead = result[0]
         assert lead.email == "test@example.com"
-        pref = lead.preference
-        assert pref is not None
-        assert set([c.id for c in pref.preferred_centers]) == {self.centers[0].id, self.centers[2].id}
-        assert pref.start_date == self.base_date
-        assert pref.end_date == self.end_date
-        assert pref.preferred_days == [Day.MONDAY, Day.TUESDAY]
+        assert set(lead.pos_ids) == {self.centers[0].pos_id, self.centers[2].pos_id}
+        assert lead.start_date == self.base_date
+        assert lead.end_date == self.end_date
+        assert lead.preferred_days == [Day.MONDAY, Day.TUESDAY]
+
+    def test_get_lead_preferences_skips_ended_windows(self):
+        """Test that preferences which ended before today are not loaded."""
+        for email, end_date in [("ended@example.com", self.base_date - timedelta(days=1)),
+                                ("today@example.com", self.base_date)]:
+            create_lead_with_preference(self.db, LeadCreate(email=email), UserPreferenceCreate(
+                start_date=self.base_date - timedelta(days=7),
+                end_date=end_date,
+                preferred_centers_ids=[self.centers[0].id],
+                preferred_days=[Day.MONDAY]
+            ))
+
+        assert [lead.email for lead in get_lead_preferences(self.db)] == ["today@example.com"]
+
+    @pytest.mark.parametrize("batch_size", [1, 2, 3, 100])
+    def test_iter_active_lead_preferences_pages_through_every_lead(self, batch_size):
+        """Test that keyset pagination yields every lead exactly once, in full batches."""
+        for i in range(5):
+            create_lead_with_preference(self.db, LeadCreate(email=f"lead{i}@example.com"), UserPreferenceCreate(
+                start_date=self.base_date,
+                end_date=self.end_date,
+                preferred_centers_ids=[self.centers[0].id, self.centers[1].id],
+                preferred_days=[Day.MONDAY]
+            ))
+
+        batches = list(iter_active_lead_preferences(self.db, self.base_date, batch_size=batch_size))
+
+        assert all(len(batch) == batch_size for batch in batches[:-1])
+        assert sorted(lead.email for batch in batches for lead in batch) == [f"lead{i}@example.com" for i in range(5)]
+        assert all(sorted(lead.pos_ids) == [69, 85] for batch in batches for lead in batch)
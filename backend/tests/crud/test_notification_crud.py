@@ -0,0 +1,131 @@
+from datetime import date, datetime, timedelta, UTC
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_notification import (
+    claim_pending_notifications, enqueue_notifications, get_notified_fingerprints, mark_failed, mark_sent,
+    purge_notified_slots, record_notified_slots,
+)
+from app.models import NotificationOutbox, NotifiedSlot
+from app.models.notification import OUTBOX_FAILED, OUTBOX_PENDING, OUTBOX_SENT
+from tests.conftest import TestingSessionLocal
+
+
+def row(lead, key):
+    return {"lead_id": lead.id, "email": lead.email, "idempotency_key": key, "subject": "Subject", "body": f"<p>{key}</p>"}
+
+
+class TestNotificationOutbox:
+    """Test queuing, claiming and tracking outbox notifications."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db: Session, existing_lead):
+        self.db = db
+        self.lead = existing_lead
+        self.now = datetime.now(UTC) + timedelta(seconds=1)
+
+    def test_enqueue_is_idempotent(self):
+        assert enqueue_notifications(self.db, [row(self.lead, "a"), row(self.lead, "b")]) == 2
+        assert enqueue_notifications(self.db, [row(self.lead, "b"), row(self.lead, "c")]) == 1
+
+        notifications = self.db.query(NotificationOutbox).order_by(NotificationOutbox.id).all()
+        assert [n.idempotency_key for n in notifications] == ["a", "b", "c"]
+        assert all(n.status == OUTBOX_PENDING and n.attempts == 0 for n in notifications)
+
+    def test_enqueue_in_batches(self):
+        with patch.object(settings, "NOTIFICATION_OUTBOX_BATCH_SIZE", 2):
+            assert enqueue_notifications(self.db, [row(self.lead, str(i)) for i in range(5)]) == 5
+
+    def test_claim_skips_rows_locked_by_another_sender(self):
+        enqueue_notifications(self.db, [row(self.lead, str(i)) for i in range(5)])
+        other = TestingSessionLocal()
+        try:
+            first = claim_pending_notifications(self.db, 3, self.now)
+            second = claim_pending_notifications(other, 3, self.now)
+
+            assert [n.idempotency_key for n in first] == ["0", "1", "2"]
+            assert [n.idempotency_key for n in second] == ["3", "4"]
+        finally:
+            other.rollback()
+            other.close()
+            self.db.rollback()
+
+    def test_claim_only_due_pending_rows(self):
+        enqueue_notifications(self.db, [row(self.lead, str(i)) for i in range(3)])
+        sent, retrying, due = claim_pending_notifications(self.db, 3, self.now)
+        mark_sent(sent, self.now)
+        mark_failed(retrying, "boom", self.now)
+        self.db.commit()
+
+        assert claim_pending_notifications(self.db, 3, self.now) == [due]
+        self.db.rollback()
+        assert claim_pending_notifications(self.db, 3, retrying.next_attempt_at) == [retrying, due]
+        self.db.rollback()
+
+    def test_mark_sent(self):
+        enqueue_notifications(self.db, [row(self.lead, "a")])
+        [notification] = claim_pending_notifications(self.db, 1, self.now)
+
+        mark_sent(notification, self.now)
+        self.db.commit()
+
+        assert (notification.status, notification.attempts, notification.sent_at) == (OUTBOX_SENT, 1, self.now)
+
+    def test_mark_failed_backs_off_then_gives_up(self):
+        enqueue_notifications(self.db, [row(self.lead, "a")])
+        [notification] = claim_pending_notifications(self.db, 1, self.now)
+
+        with patch.multiple(settings, NOTIFICATION_OUTBOX_MAX_ATTEMPTS=3, NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS=60):
+            mark_failed(notification, "first", self.now)
+            assert notification.next_attempt_at == self.now + timedelta(seconds=60)
+            mark_failed(notification, "second", self.now)
+            assert notification.next_attempt_at == self.now + timedelta(seconds=120)
+            assert notification.status == OUTBOX_PENDING
+            mark_failed(notification, "third", self.now)
+
+        assert (notification.status, notification.attempts, notification.last_error) == (OUTBOX_FAILED, 3, "third")
+
+
+class TestNotifiedSlots:
+    """Test remembering, loading and purging the slots leads were notified about."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db: Session, existing_lead):
+        self.db = db
+        self.lead = existing_lead
+        self.now = datetime.now(UTC)
+
+    def notified(self, fingerprint, slot_date=date(2030, 1, 7), notified_at=None):
+        return {"lead_id": self.lead.id, "fingerprint": fingerprint, "slot_date": slot_date,
+                "notified_at": notified_at or self.now}
+
+    def test_fingerprints_within_window(self):
+        record_notified_slots(self.db, [
+            self.notified(1),
+            self.notified(-2),
+            self.notified(3, notified_at=self.now - timedelta(days=5)),
+        ])
+        self.db.commit()
+
+        assert get_notified_fingerprints(self.db, self.now - timedelta(days=1)) == {self.lead.id: {1, -2}}
+
+    def test_notified_again_bumps_notified_at(self):
+        record_notified_slots(self.db, [self.notified(1, notified_at=self.now - timedelta(days=5))])
+        record_notified_slots(self.db, [self.notified(1)])
+        self.db.commit()
+
+        [notified_slot] = self.db.query(NotifiedSlot).all()
+        assert notified_slot.notified_at == self.now
+
+    def test_purge_expired_and_past_slots(self):
+        record_notified_slots(self.db, [
+            self.notified(1),
+            self.notified(2, notified_at=self.now - timedelta(days=5)),
+            self.notified(3, slot_date=date(2020, 1, 6)),
+        ])
+
+        assert purge_notified_slots(self.db, self.now - timedelta(days=1), date.today()) == 2
+        assert [n.fingerprint for n in self.db.query(NotifiedSlot)] == [1]
@@ -0,0 +1,77 @@
+import datetime
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, insert, text
+
+from app.crud.crud_center import get_subscribed_centers
+from app.crud.crud_lead import get_active_preferences_window, get_lead_preferences, match_slot_keys
+from app.models import Lead, UserPreference, user_preferences_centers
+
+
+@pytest.fixture
+def many_leads(db, centers):
+    """5000 leads, of which only 1 in 100 has a window that has not ended yet."""
+    today = datetime.date.today()
+    leads, preferences, links = [], [], []
+    for i in range(5000):
+        lead_id, preference_id = uuid.uuid4(), uuid.uuid4()
+        active = i % 100 == 0
+        end_date = today + datetime.timedelta(days=7) if active else today - datetime.timedelta(days=1 + i % 300)
+        leads.append({"id": lead_id, "email": f"lead{i}@example.com"})
+        preferences.append({"id": preference_id, "lead_id": lead_id, "start_date": end_date - datetime.timedelta(days=30),
+                            "end_date": end_date, "preferred_days": [6] if active else [i % 6]})
+        links += [{"user_preference_id": preference_id, "center_id": center.id} for center in centers[:1 + i % 3]]
+    db.execute(insert(Lead), leads)
+    db.execute(insert(UserPreference), preferences)
+    db.execute(insert(user_preferences_centers), links)
+    db.commit()
+    for table in ("leads", "user_preferences", "user_preferences_centers", "centers"):
+        db.execute(text(f"ANALYZE {table}"))
+    return today
+
+
+@contextmanager
+def query_plans(db):
+    """EXPLAIN every SELECT run inside the block, collecting the plans."""
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            # Server side (yield_per) cursors cannot DECLARE an EXPLAIN, so use a plain one
+            with conn.connection.dbapi_connection.cursor() as plain:
+                plain.execute("EXPLAIN " + statement, parameters)
+                plans.append("\n".join(row[0] for row in plain.fetchall()))
+
+    event.listen(db.get_bind(), "before_cursor_execute", explain)
+    try:
+        yield plans
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", explain)
+
+
+class TestQueryPlans:
+    """Test that the preference and crawl plan queries are served by the user_preferences indexes."""
+
+    def test_active_windows_are_read_from_the_date_index(self, db, many_leads):
+        with query_plans(db) as plans:
+            get_lead_preferences(db, many_leads)
+            get_active_preferences_window(db, many_leads)
+            get_subscribed_centers(db, many_leads)
+
+        assert len(plans) == 4
+        for plan in plans:
+            assert "ix_user_preferences_end_date_start_date" in plan
+            assert "Seq Scan on user_preferences " not in plan
+
+    def test_matching_reads_the_date_and_association_indexes(self, db, many_leads):
+        slot_date = many_leads + datetime.timedelta(days=1)
+
+        with query_plans(db) as plans:
+            list(match_slot_keys(db, [(69, slot_date, slot_date.weekday()), (85, slot_date, slot_date.weekday())]))
+
+        [plan] = plans
+        assert "ix_user_preferences_end_date_start_date" in plan
+        assert "user_preferences_centers_pkey" in plan
+        assert "Seq Scan on user_preferences " not in plan
@@ -0,0 +1,91 @@
+from datetime import date
+
+from app.external_services.availability_delta import AvailabilitySnapshotStore, slot_key
+from app.external_services.availability_serializer import AvailabilityItem
+from tests.conftest import raw_slot
+
+
+def make_item(pos_id=69, day=10, start_tm="09:00", resource_id=21903, signature="sig"):
+    return AvailabilityItem.model_validate(
+        raw_slot(pos_id, date(2024, 6, day), start_tm, "10:30", resource_id, signature)
+    )
+
+
+class TestAvailabilitySnapshotStore:
+    """Test the per-center availability delta engine."""
+
+    def test_first_crawl_adds_everything(self):
+        store = AvailabilitySnapshotStore()
+        items = [make_item(day=10), make_item(day=11)]
+
+        delta = store.diff(69, items)
+
+        assert delta.added == items
+        assert delta.removed == []
+
+    def test_unchanged_slots_are_not_added_again(self):
+        store = AvailabilitySnapshotStore()
+        store.diff(69, [make_item(day=10)])
+        store.save()
+
+        delta = store.diff(69, [make_item(day=10, signature="new signature"), make_item(day=11)])
+
+        assert [item.appointmentDt.date for item in delta.added] == [date(2024, 6, 11)]
+        assert delta.removed == []
+
+    def test_removed_slots_are_reported_and_can_reappear(self):
+        store = AvailabilitySnapshotStore()
+        item = make_item(day=10)
+        store.diff(69, [item])
+        store.save()
+
+        delta = store.diff(69, [])
+        assert delta.removed == [slot_key(item)]
+        store.save()
+
+        assert store.diff(69, [item]).added == [item]
+
+    def test_centers_are_independent(self):
+        store = AvailabilitySnapshotStore()
+        store.diff(69, [make_item(pos_id=69)])
+        store.save()
+
+        delta = store.diff(85, [make_item(pos_id=85)])
+
+        assert len(delta.added) == 1
+        assert store.diff(69, [make_item(pos_id=69)]).added == []
+
+    def test_discarded_diffs_are_reported_again(self):
+        store = AvailabilitySnapshotStore()
+        store.diff(69, [make_item(day=10)])
+        store.save()
+        store.diff(69, [make_item(day=11)])
+
+        store.discard()
+
+        assert [item.appointmentDt.date for item in store.diff(69, [make_item(day=11)]).added] == [date(2024, 6, 11)]
+
+    def test_snapshot_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "snapshot.json")
+        store = AvailabilitySnapshotStore(path)
+        store.diff(69, [make_item(day=10)])
+        store.save()
+
+        reloaded = AvailabilitySnapshotStore(path)
+
+        assert reloaded.diff(69, [make_item(day=10)]).added == []
+
+    def test_save_without_changes_writes_nothing(self, tmp_path):
+        path = tmp_path / "snapshot.json"
+
+        AvailabilitySnapshotStore(str(path)).save()
+
+        assert not path.exists()
+
+    def test_unreadable_snapshot_is_ignored(self, tmp_path):
+        path = tmp_path / "snapshot.json"
+        path.write_text("{not json")
+
+        store = AvailabilitySnapshotStore(str(path))
+
+        assert len(store.diff(69, [make_item()]).added) == 1
@@ -0,0 +1,78 @@
+import copy
+from calendar import Day
+from datetime import date
+
+import pytest
+from pydantic import ValidationError
+
+from app.external_services.availability_serializer import AvailabilityItem, AvailabilitySerializer
+from scripts import benchmark_hot_path
+from tests.conftest import raw_slot
+
+
+@pytest.fixture
+def raw_items():
+    return [
+        raw_slot(pos_id, date(2030, 1, day), "09:55", "10:30", signature=f"signature-{pos_id}-{day}")
+        for pos_id in (69, 85, 404)
+        for day in (7, 8)
+    ]
+
+
+@pytest.fixture
+def center_db(centers, db):
+    return db
+
+
+class TestFastDeserialization:
+    """Test the single-call validation path of AvailabilitySerializer.with_centers."""
+
+    def test_same_items_as_validating_path(self, raw_items, center_db):
+        fast = AvailabilitySerializer.with_centers(raw_items, center_db, fast=True)
+        validated = AvailabilitySerializer.with_centers(raw_items, center_db, fast=False)
+
+        assert fast.model_dump() == validated.model_dump()
+        assert fast.root[0].appointmentDt.date == date(2030, 1, 7)
+        assert fast.root[0].appointmentDt.dayOfWeek == Day.MONDAY
+        assert fast.root[-1].center is None  # posId 404 is not a known center
+
+    def test_shares_one_center_response_per_center(self, raw_items, center_db):
+        items = AvailabilitySerializer.with_centers(raw_items, center_db, fast=True).root
+
+        assert items[0].center is items[1].center
+        assert items[0].center is not items[2].center
+
+    def test_matches_validating_path_on_synthetic_payload(self):
+        positions = benchmark_hot_path.build_centers(3)
+        db = benchmark_hot_path.center_session(positions)
+        raw = benchmark_hot_path.build_slots(300, 3, seed=5)
+
+        fast = AvailabilitySerializer.with_centers(raw, db, fast=True)
+        validated = AvailabilitySerializer.with_centers(raw, db, fast=False)
+        db.close()
+
+        assert fast.model_dump() == validated.model_dump()
+
+    def test_wrong_types_are_rejected(self, raw_items, center_db):
+        raw_items[-1]["lemgMsgId"] = "not a number"
+
+        with pytest.raises(ValidationError):
+            AvailabilitySerializer.with_centers(raw_items, center_db, fast=True)
+
+    def test_missing_keys_are_rejected(self, raw_items, center_db):
+        broken = copy.deepcopy(raw_items)
+        del broken[-1]["appointmentDt"]["dayOfWeek"]
+
+        with pytest.raises(ValidationError):
+            AvailabilitySerializer.with_centers(broken, center_db, fast=True)
+
+    def test_extra_keys_are_ignored(self, raw_items, centers, center_db):
+        raw_items[1]["newIcbcField"] = "whatever"
+
+        item = AvailabilitySerializer.with_centers(raw_items, center_db, fast=True).root[1]
+
+        assert item.model_dump() == AvailabilityItem.with_center(raw_items[1], centers[0]).model_dump()
+        assert not hasattr(item, "newIcbcField")
+
+    def test_empty_payload(self, center_db):
+        assert AvailabilitySerializer.with_centers([], center_db, fast=True).root == []
@@ -1,43 +1,71 @@
 import calendar
 import datetime
+import json
 import pytest
+import requests
 from unittest.mock import patch, MagicMock
-from app.external_services.crawlers.availability_finder import find_available_dates
+from app.core.config import settings
+from app.crud.crud_lead import create_lead_with_preference
+from app.external_services.availability_delta import AvailabilitySnapshotStore
+from app.external_services.crawlers.availability_finder import _fingerprint, fetch_available_items, find_available_dates
+from app.external_services.crawlers.icbc_login import ICBCTokenManager
+from app.external_services.crawlers.poll_scheduler import CenterPollScheduler
+from app.external_services.crawlers.resilience import CircuitBreaker
+from app.models import AvailabilitySlot
+from app.schemas import LeadCreate, UserPreferenceCreate
 from app.schemas.center import CenterResponse
+from tests.conftest import raw_slot
 
-@patch("app.external_services.crawlers.availability_finder.get_auth_token")
-@patch("app.external_services.crawlers.availability_finder.requests.post")
-def test_find_available_dates_success(mock_requests_post, mock_get_auth_token, db, centers):
-    mock_get_auth_token.return_value = "Bearer mock_token"
+
+@pytest.fixture(autouse=True)
+def center_breaker():
+    """Give each test its own circuit breaker so failures do not leak between tests."""
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    with patch("app.external_services.crawlers.availability_finder.center_breaker", breaker):
+        yield breaker
+
+
+@pytest.fixture
+def slot_date():
+    """A Friday far enough ahead to be after today."""
+    date = datetime.date.today() + datetime.timedelta(days=2)
+    return date + datetime.timedelta(days=(calendar.FRIDAY - date.weekday()) % 7)
+
+
+@pytest.fixture
+def subscribed_centers(db, centers, slot_date):
+    """Subscribe a lead to every test center on Fridays around slot_date."""
+    create_lead_with_preference(
+        db,
+        LeadCreate(email="subscriber@example.com"),
+        UserPreferenceCreate(
+            start_date=slot_date - datetime.timedelta(days=1),
+            end_date=slot_date + datetime.timedelta(days=7),
+            preferred_centers_ids=[center.id for center in centers],
+            preferred_days=[calendar.FRIDAY],
+        ),
+    )
+    return centers
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_success(mock_get_icbc_client, db, subscribed_centers, slot_date):
+    centers = subscribed_centers
 
     # Prepare a different response for each test center
-    def mock_post(url, headers, json):
-        pos_id = json['aPosID']
+    def mock_post(payload, auth_token):
+        assert auth_token == "Bearer mock_token"
+        pos_id = payload['aPosID']
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.raise_for_status = MagicMock()
         # Each center gets a unique appointment
-        mock_response.json.return_value = [
-            {
-                "appointmentDt": {
-                    "date": f"2023-12-01",  # unique date per center
-                    "dayOfWeek": "Friday",
-                },
-                "dlExam": {
-                    "code": "5-R-1",
-                    "description": "5-R-ROAD"
-                },
-                "endTm": "10:30",
-                "lemgMsgId": 35,
-                "posId": pos_id,
-                "resourceId": 21903,
-                "signature": f"test_signature{pos_id}",
-                "startTm": "09:00",
-            }
-        ]
+        mock_response.json.return_value = [raw_slot(pos_id, slot_date)]
         return mock_response
 
-    mock_requests_post.side_effect = mock_post
+    mock_get_available_appointments = mock_get_icbc_client.return_value.get_available_appointments
+    mock_get_available_appointments.side_effect = mock_post
 
     # Act
     results, available_not_only_today = find_available_dates(db)
@@ -49,11 +77,297 @@ def test_find_available_dates_success(mock_requests_post, mock_get_auth_token, d
     # Check each appointment's details
     for i, result in enumerate(results):
         center = centers[i]
-        assert result.appointmentDt.date == datetime.date(2023, 12, 1)
+        assert result.appointmentDt.date == slot_date
         assert result.appointmentDt.dayOfWeek == calendar.FRIDAY
         assert result.center is not None
         assert isinstance(result.center, CenterResponse)
         assert result.center.pos_id == center.pos_id
 
-    assert mock_requests_post.called
-    assert mock_get_auth_token.called
+    assert mock_get_available_appointments.called
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_skips_failed_centers(mock_get_icbc_client, db, subscribed_centers, slot_date):
+    centers = subscribed_centers
+    failing_pos_id = centers[1].pos_id
+
+    def mock_post(payload, auth_token):
+        pos_id = payload['aPosID']
+        if pos_id == failing_pos_id:
+            raise requests.Timeout("timed out")
+        mock_response = MagicMock()
+        mock_response.json.return_value = [raw_slot(pos_id, slot_date)]
+        return mock_response
+
+    mock_get_available_appointments = mock_get_icbc_client.return_value.get_available_appointments
+    mock_get_available_appointments.side_effect = mock_post
+
+    with patch.object(settings, "ICBC_CRAWL_MAX_WORKERS", 2):
+        results, _ = find_available_dates(db)
+
+    assert mock_get_available_appointments.call_count == len(centers)
+    assert [result.posId for result in results] == [
+        center.pos_id for center in centers if center.pos_id != failing_pos_id
+    ]
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_follows_crawl_plan(mock_get_icbc_client, db, centers, slot_date):
+    create_lead_with_preference(
+        db,
+        LeadCreate(email="subscriber@example.com"),
+        UserPreferenceCreate(
+            start_date=slot_date,
+            end_date=slot_date + datetime.timedelta(days=7),
+            preferred_centers_ids=[centers[0].id],
+            preferred_days=[calendar.FRIDAY],
+        ),
+    )
+    outside_window = slot_date + datetime.timedelta(days=14)
+    wrong_weekday = slot_date + datetime.timedelta(days=1)
+
+    def mock_post(payload, auth_token):
+        mock_response = MagicMock()
+        mock_response.json.return_value = [
+            raw_slot(payload['aPosID'], date) for date in (slot_date, outside_window, wrong_weekday)
+        ]
+        return mock_response
+
+    mock_get_available_appointments = mock_get_icbc_client.return_value.get_available_appointments
+    mock_get_available_appointments.side_effect = mock_post
+
+    results, _ = find_available_dates(db)
+
+    mock_get_available_appointments.assert_called_once()
+    payload = mock_get_available_appointments.call_args.args[0]
+    assert payload['aPosID'] == centers[0].pos_id
+    assert payload['examDate'] == slot_date.isoformat()
+    assert [result.appointmentDt.date for result in results] == [slot_date]
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager")
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_without_subscribers(mock_get_icbc_client, mock_token_manager, db, centers):
+    results, available_not_only_today = find_available_dates(db)
+
+    assert results == []
+    assert available_not_only_today is False
+    mock_token_manager.get_token.assert_not_called()
+    mock_get_icbc_client.return_value.get_available_appointments.assert_not_called()
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_polls_due_centers_only(mock_get_icbc_client, db, subscribed_centers, slot_date):
+    centers = subscribed_centers
+    scheduler = MagicMock()
+    scheduler.due.return_value = [centers[2].pos_id]
+    mock_get_available_appointments = mock_get_icbc_client.return_value.get_available_appointments
+    mock_get_available_appointments.return_value.json.return_value = [raw_slot(centers[2].pos_id, slot_date)]
+
+    results, _ = find_available_dates(db, scheduler=scheduler)
+
+    scheduler.sync.assert_called_once_with({center.pos_id: 1 for center in centers})
+    mock_get_available_appointments.assert_called_once()
+    scheduler.record.assert_called_once()
+    assert scheduler.record.call_args.args[0] == centers[2].pos_id
+    assert [result.posId for result in results] == [centers[2].pos_id]
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: None))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_reschedules_due_centers_on_failed_login(mock_get_icbc_client, db, subscribed_centers):
+    clock = MagicMock(return_value=0.0)
+    scheduler = CenterPollScheduler(budget_per_minute=60, min_interval=10, max_interval=100, clock=clock)
+
+    with pytest.raises(RuntimeError, match="Authorization failed"):
+        find_available_dates(db, scheduler=scheduler)
+
+    mock_get_icbc_client.return_value.get_available_appointments.assert_not_called()
+    assert scheduler.seconds_until_due() is not None
+    clock.return_value = 100.0
+    assert sorted(scheduler.due()) == sorted(center.pos_id for center in subscribed_centers)
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_returns_only_new_slots(mock_get_icbc_client, db, subscribed_centers, slot_date):
+    centers = subscribed_centers
+    snapshot_store = AvailabilitySnapshotStore()
+    responses = {center.pos_id: [raw_slot(center.pos_id, slot_date)] for center in centers}
+
+    def mock_post(payload, auth_token):
+        pos_id = payload['aPosID']
+        if responses[pos_id] is None:
+            raise requests.Timeout("timed out")
+        mock_response = MagicMock()
+        mock_response.json.return_value = responses[pos_id]
+        return mock_response
+
+    mock_get_icbc_client.return_value.get_available_appointments.side_effect = mock_post
+
+    first, _ = find_available_dates(db, snapshot_store=snapshot_store)
+    snapshot_store.save()
+    second, _ = find_available_dates(db, snapshot_store=snapshot_store)
+
+    # A center emptying out and a center failing to respond
+    responses[centers[0].pos_id] = []
+    responses[centers[1].pos_id] = None
+    find_available_dates(db, snapshot_store=snapshot_store)
+    snapshot_store.save()
+    responses[centers[0].pos_id] = [raw_slot(centers[0].pos_id, slot_date)]
+    responses[centers[1].pos_id] = [raw_slot(centers[1].pos_id, slot_date)]
+    fourth, _ = find_available_dates(db, snapshot_store=snapshot_store)
+    # Slots that could not be notified are new again next cycle
+    snapshot_store.discard()
+    fifth, _ = find_available_dates(db, snapshot_store=snapshot_store)
+
+    assert len(first) == len(centers)
+    assert second == []
+    assert [result.posId for result in fourth] == [centers[0].pos_id]
+    assert [result.posId for result in fifth] == [centers[0].pos_id]
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_skips_centers_with_open_circuit(mock_get_icbc_client, db, subscribed_centers,
+                                                              slot_date, center_breaker):
+    centers = subscribed_centers
+    failing_pos_id = centers[0].pos_id
+
+    def mock_post(payload, auth_token):
+        if payload['aPosID'] == failing_pos_id:
+            raise requests.ConnectionError("refused")
+        mock_response = MagicMock()
+        mock_response.json.return_value = [raw_slot(payload['aPosID'], slot_date)]
+        return mock_response
+
+    mock_get_available_appointments = mock_get_icbc_client.return_value.get_available_appointments
+    mock_get_available_appointments.side_effect = mock_post
+
+    for _ in range(center_breaker.failure_threshold):
+        find_available_dates(db)
+    mock_get_available_appointments.reset_mock()
+
+    results, _ = find_available_dates(db)
+
+    fetched = [c.args[0]['aPosID'] for c in mock_get_available_appointments.call_args_list]
+    assert failing_pos_id not in fetched
+    assert sorted(fetched) == sorted(center.pos_id for center in centers[1:])
+    assert len(results) == len(centers) - 1
+
+
+def streamed_response(appointments, chunk_size=7, broken_after=None):
+    """A streamed response whose body arrives `chunk_size` bytes at a time, optionally failing mid-way."""
+    body = json.dumps(appointments).encode()
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    def iter_content(size):
+        for i, chunk in enumerate(chunks):
+            if i == broken_after:
+                raise requests.exceptions.ChunkedEncodingError("connection broken")
+            yield chunk
+
+    mock_response = MagicMock()
+    mock_response.iter_content.side_effect = iter_content
+    mock_response.json.side_effect = AssertionError("a streamed body must not be loaded whole")
+    return mock_response
+
+
+@pytest.fixture
+def streaming():
+    with patch.object(settings, "ICBC_STREAM_APPOINTMENTS", True):
+        yield
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_streaming(mock_get_icbc_client, db, subscribed_centers, slot_date, streaming):
+    centers = subscribed_centers
+    responses = {}
+
+    def mock_post(payload, auth_token, stream=False):
+        assert stream is True
+        pos_id = payload['aPosID']
+        responses[pos_id] = streamed_response([raw_slot(pos_id, slot_date)])
+        return responses[pos_id]
+
+    mock_get_icbc_client.return_value.get_available_appointments.side_effect = mock_post
+
+    results, available_not_only_today = find_available_dates(db)
+
+    assert available_not_only_today is True
+    assert [result.posId for result in results] == [center.pos_id for center in centers]
+    assert [result.center.pos_id for result in results] == [center.pos_id for center in centers]
+    assert all(isinstance(result.center, CenterResponse) for result in results)
+    assert all(response.close.called for response in responses.values())
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_streaming_records_unwanted_slots(mock_get_icbc_client, db, subscribed_centers, slot_date,
+                                                               streaming):
+    centers = subscribed_centers
+    wrong_weekday = slot_date + datetime.timedelta(days=1)
+
+    def mock_post(payload, auth_token, stream=False):
+        pos_id = payload['aPosID']
+        return streamed_response([raw_slot(pos_id, slot_date), raw_slot(pos_id, wrong_weekday)])
+
+    mock_get_icbc_client.return_value.get_available_appointments.side_effect = mock_post
+
+    with patch.object(settings, "AVAILABILITY_HISTORY_ENABLED", True):
+        results, _ = find_available_dates(db)
+
+    assert {result.appointmentDt.date for result in results} == {slot_date}
+    recorded = {(slot.pos_id, slot.date) for slot in db.query(AvailabilitySlot)}
+    assert recorded == {(center.pos_id, date) for center in centers for date in (slot_date, wrong_weekday)}
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_find_available_dates_streaming_skips_broken_bodies(mock_get_icbc_client, db, subscribed_centers, slot_date,
+                                                            center_breaker, streaming):
+    centers = subscribed_centers
+    broken_pos_id = centers[1].pos_id
+    scheduler = MagicMock()
+    scheduler.due.return_value = [center.pos_id for center in centers]
+
+    def mock_post(payload, auth_token, stream=False):
+        pos_id = payload['aPosID']
+        appointments = [raw_slot(pos_id, slot_date)] * 3
+        return streamed_response(appointments, broken_after=5 if pos_id == broken_pos_id else None)
+
+    mock_get_icbc_client.return_value.get_available_appointments.side_effect = mock_post
+
+    results, _ = find_available_dates(db, scheduler=scheduler)
+
+    assert broken_pos_id not in {result.posId for result in results}
+    assert len(results) == 3 * (len(centers) - 1)
+    fingerprints = {c.args[0]: c.args[1] for c in scheduler.record.call_args_list}
+    assert fingerprints[broken_pos_id] is None
+    assert center_breaker._failures == {broken_pos_id: 1}
+
+
+@patch("app.external_services.crawlers.availability_finder.token_manager", ICBCTokenManager(login=lambda: "Bearer mock_token"))
+@patch("app.external_services.crawlers.availability_finder.get_icbc_client")
+def test_fetch_available_items_keeps_wanted_items(mock_get_icbc_client, centers, slot_date):
+    center = centers[0]
+    dates = [slot_date + datetime.timedelta(days=day) for day in range(3)]
+    raw = [raw_slot(center.pos_id, date) for date in dates]
+    mock_get_icbc_client.return_value.get_available_appointments.return_value = streamed_response(raw)
+    schemas = {center.pos_id: CenterResponse.model_validate(center)}
+
+    history = set()
+
+    fingerprint, items = fetch_available_items(center, schemas, keep=lambda item: item.appointmentDt.date != dates[1],
+                                               history=history)
+
+    assert [item.appointmentDt.date for item in items] == [dates[0], dates[2]]
+    assert sorted(slot.date for slot in history) == dates
+    assert items[0].center is schemas[center.pos_id]
+    # The fingerprint covers every appointment, like the buffered path's, whatever their order
+    assert fingerprint == sum(hash((date.isoformat(), "09:00", 21903)) for date in dates)
+    assert fingerprint == _fingerprint(reversed(raw))
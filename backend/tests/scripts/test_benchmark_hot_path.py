@@ -0,0 +1,37 @@
+import json
+
+from scripts import benchmark_hot_path
+
+
+class TestBenchmarkHotPath:
+    """Smoke test the hot path benchmark at tiny sizes."""
+
+    def test_run_records_every_stage(self):
+        results = benchmark_hot_path.run([100], [10, 20], n_centers=4, match_budget=60, memory=True, seed=1)
+
+        assert [(case["slots"], case["leads"]) for case in results["cases"]] == [(100, 10), (100, 20)]
+        stages = results["cases"][1]["stages"]
+        assert stages["serialize"]["count"] == 100
+        assert stages["match"]["count"] == 20
+        assert stages["match"]["extrapolated_seconds"] is None
+        assert 0 < stages["render"]["count"] <= 20
+        assert all(stage["peak_bytes"] > 0 for stage in stages.values())
+        json.dumps(results)
+
+    def test_match_budget_extrapolates(self):
+        results = benchmark_hot_path.run([100], [50], n_centers=4, match_budget=0, memory=False, seed=1,
+                                         engine="scan")
+
+        match = results["cases"][0]["stages"]["match"]
+        assert match["count"] == 1
+        assert match["extrapolated_seconds"] == match["seconds"] * 50
+        assert match["peak_bytes"] is None
+
+    def test_compare(self):
+        def result(seconds):
+            stage = {"seconds": seconds, "peak_bytes": None, "count": 1, "extrapolated_seconds": None}
+            return {"cases": [{"slots": 1, "leads": 2, "stages": {"match": stage}}]}
+
+        assert benchmark_hot_path.compare(result(4.0), result(1.0)) == [
+            "1 slots × 2 leads match: 4.000s → 1.000s (4.0×)"
+        ]
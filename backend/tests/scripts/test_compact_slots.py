@@ -0,0 +1,70 @@
+import calendar
+import datetime
+import sys
+
+from app.crud.crud_availability import record_availability
+from app.external_services import notifier
+from app.external_services.availability_delta import slot_key
+from app.external_services.availability_serializer import AvailabilityItem, AvailabilitySerializer
+from app.external_services.compact_slots import CompactSlot, compact_items
+from app.external_services.matching import InvertedIndexMatcher
+from app.models import AvailabilitySlot
+from scripts import benchmark_hot_path
+from tests.conftest import raw_slot, slot as available_slot
+
+
+class TestCompactSlot:
+    """Test the compact slot representation."""
+
+    def test_round_trip(self, centers):
+        item = available_slot(centers[0], "14:55", end="15:30")
+
+        slot = CompactSlot.from_item(item)
+
+        assert (slot.date_ordinal, slot.weekday) == (datetime.date(2030, 1, 7).toordinal(), calendar.MONDAY)
+        assert (slot.start_minute, slot.end_minute) == (14 * 60 + 55, 15 * 60 + 30)
+        assert slot.to_item() == item
+        assert slot_key(slot) == slot_key(item)
+
+    def test_shares_records_between_slots(self, centers):
+        raw = [raw_slot(centers[0].pos_id, start=start) for start in ("09:00", "10:00")]
+        items = [AvailabilityItem.with_center(data, centers[0]) for data in raw]
+        assert items[0].center is not items[1].center
+
+        first, second = compact_items(items)
+
+        assert first.center is second.center
+        assert first.dlExam is second.dlExam
+        assert first.appointmentDt is second.appointmentDt
+        assert first.endTm is second.endTm
+
+    def test_no_instance_dict(self, centers):
+        slot = compact_items([available_slot(centers[0])])[0]
+
+        assert not hasattr(slot, "__dict__")
+        assert sys.getsizeof(slot) < 128
+
+    def test_matching_and_rendering_accept_compact_slots(self):
+        positions = benchmark_hot_path.build_centers(4)
+        db = benchmark_hot_path.center_session(positions)
+        items = AvailabilitySerializer.with_centers(benchmark_hot_path.build_slots(200, 4, seed=1), db).root
+        db.close()
+        leads = benchmark_hot_path.build_leads(50, [benchmark_hot_path.make_center(pos) for pos in positions], seed=1)
+        slots = compact_items(items)
+
+        expected = InvertedIndexMatcher.from_leads(leads).match(items)
+        matches = InvertedIndexMatcher.from_leads(leads).match(slots)
+
+        assert matches.keys() == expected.keys()
+        for email, matched in matches.items():
+            assert {name: [slot.to_item() for slot in found] for name, found in matched.items()} == expected[email]
+            assert notifier.prepare_message(matched) == notifier.prepare_message(expected[email])
+
+    def test_recorded_in_history(self, db, centers):
+        item = available_slot(centers[0])
+
+        record_availability(db, {centers[0].pos_id: compact_items([item])}, datetime.datetime.now(datetime.UTC),
+                            datetime.date.today())
+
+        row = db.query(AvailabilitySlot).one()
+        assert (row.date, row.start_tm, row.end_tm, row.exam_code) == (datetime.date(2030, 1, 7), "09:00", "09:35", "5-R-1")
@@ -0,0 +1,52 @@
+import calendar
+from datetime import date, timedelta
+
+import pytest
+
+from app.crud.crud_lead import create_lead_with_preference
+from app.external_services.crawlers.crawl_plan import build_crawl_plan
+from app.schemas import LeadCreate, UserPreferenceCreate
+
+
+TODAY = date(2024, 6, 1)
+
+
+@pytest.fixture
+def add_preference(db, centers):
+    def _add_preference(email, center_indexes, start_date, end_date, days):
+        return create_lead_with_preference(
+            db,
+            LeadCreate(email=email),
+            UserPreferenceCreate(
+                start_date=start_date,
+                end_date=end_date,
+                preferred_centers_ids=[centers[i].id for i in center_indexes],
+                preferred_days=days,
+            ),
+        )
+    return _add_preference
+
+
+class TestBuildCrawlPlan:
+    """Test computing the crawl plan from the preference tables."""
+
+    def test_empty_without_preferences(self, db, centers):
+        plan = build_crawl_plan(db, today=TODAY)
+
+        assert plan.centers == []
+        assert plan.start_date is None
+        assert plan.days == set()
+
+    def test_only_centers_with_active_preferences(self, db, centers, add_preference):
+        add_preference("a@example.com", [0, 1], TODAY, TODAY + timedelta(days=10), [calendar.MONDAY])
+        add_preference("b@example.com", [1], TODAY + timedelta(days=5), TODAY + timedelta(days=20), [calendar.FRIDAY])
+        add_preference("expired@example.com", [2], TODAY - timedelta(days=10), TODAY - timedelta(days=1),
+                       [calendar.SUNDAY])
+
+        plan = build_crawl_plan(db, today=TODAY)
+
+        assert [center.id for center in plan.centers] == [centers[0].id, centers[1].id]
+        assert plan.subscribers == {centers[0].pos_id: 1, centers[1].pos_id: 2}
+        assert plan.start_date == TODAY
+        assert plan.end_date == TODAY + timedelta(days=20)
+        assert plan.days == {calendar.MONDAY, calendar.FRIDAY}
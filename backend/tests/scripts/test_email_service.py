@@ -0,0 +1,112 @@
+import smtplib
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core.config import settings
+from app.external_services.email_service import SMTPDispatcher, SMTPGmailService
+from scripts.fake_smtp_server import FakeSMTPConfig, FakeSMTPServer
+
+TO_EMAILS = "inbox@example.com"
+
+
+@pytest.fixture
+def smtp_server(request):
+    config = getattr(request, "param", None) or FakeSMTPConfig()
+    with FakeSMTPServer(config) as server:
+        with patch.multiple(SMTPGmailService, SMTP_SERVER=server.host, SMTP_PORT=server.port), \
+             patch.object(settings, "SMTP_STARTTLS", False):
+            yield server
+
+
+def connect():
+    return SMTPGmailService(app_password="secret", sender_email="sender@example.com", to_emails=TO_EMAILS)
+
+
+@pytest.fixture
+def dispatcher(smtp_server):
+    dispatcher = SMTPDispatcher(connect, sender_email="sender@example.com", to_emails=TO_EMAILS,
+                                pool_size=4, attempts=3)
+    yield dispatcher
+    dispatcher.close()
+
+
+def messages(dispatcher, count):
+    return [(f"lead{i}@example.com", dispatcher.create_message("Subject", f"<p>{i}</p>", "Notifier "))
+            for i in range(count)]
+
+
+class TestSMTPGmailService:
+    """Test sending over a single connection."""
+
+    def test_send_message(self, smtp_server):
+        service = connect()
+        service.send_message(service.create_message("Subject", "<p>Hi</p>", "Notifier "))
+        service.close_connection()
+
+        [delivered] = smtp_server.messages
+        assert (delivered.mail_from, delivered.rcpt_tos) == ("sender@example.com", [TO_EMAILS])
+        assert "<p>Hi</p>" in delivered.data
+
+
+class TestSMTPDispatcher:
+    """Test the pooled, parallel SMTP dispatcher."""
+
+    @pytest.mark.parametrize("smtp_server", [FakeSMTPConfig(latency_ms=50)], indirect=True)
+    def test_sends_in_parallel_over_reused_connections(self, smtp_server, dispatcher):
+        started = time.perf_counter()
+        results = dispatcher.send_messages(messages(dispatcher, 16))
+        elapsed = time.perf_counter() - started
+
+        assert [result.key for result in results] == [f"lead{i}@example.com" for i in range(16)]
+        assert all(result.sent and result.attempts == 1 for result in results)
+        assert len(smtp_server.messages) == 16
+        assert smtp_server.connections <= 4
+        assert elapsed < 16 * 0.05 / 2  # Serial sending would take 0.8s
+
+        dispatcher.send_messages(messages(dispatcher, 4))
+        assert smtp_server.connections <= 4
+
+    @pytest.mark.parametrize("smtp_server", [FakeSMTPConfig(drop_after=2)], indirect=True)
+    def test_reconnects_when_the_server_hangs_up(self, smtp_server, dispatcher):
+        results = dispatcher.send_messages(messages(dispatcher, 10))
+
+        assert all(result.sent for result in results)
+        assert any(result.attempts == 2 for result in results)
+        assert len(smtp_server.messages) == 10
+
+    @pytest.mark.parametrize("smtp_server", [FakeSMTPConfig(refuse={TO_EMAILS})], indirect=True)
+    def test_reports_refused_messages(self, smtp_server, dispatcher):
+        [result] = dispatcher.send_messages(messages(dispatcher, 1))
+
+        assert (result.sent, result.attempts) == (False, 1)
+        assert "refused" in result.error
+
+    def test_gives_up_after_attempts(self):
+        connect = MagicMock(side_effect=ConnectionRefusedError("refused"))
+        dispatcher = SMTPDispatcher(connect, sender_email="sender@example.com", to_emails=TO_EMAILS, attempts=3)
+
+        [result] = dispatcher.send_messages([("lead@example.com", MagicMock())])
+
+        assert (result.sent, result.attempts) == (False, 3)
+        assert connect.call_count == 3
+
+    def test_close_quits_pooled_connections(self):
+        connection = MagicMock()
+        dispatcher = SMTPDispatcher(lambda: connection, sender_email="sender@example.com", to_emails=TO_EMAILS)
+
+        dispatcher.send_messages([("lead@example.com", MagicMock())])
+        dispatcher.close()
+
+        connection.close_connection.assert_called_once()
+
+    def test_reconnects_after_disconnect(self):
+        connection = MagicMock()
+        connection.send_message.side_effect = [smtplib.SMTPServerDisconnected("gone"), None]
+        dispatcher = SMTPDispatcher(lambda: connection, sender_email="sender@example.com", to_emails=TO_EMAILS)
+
+        [result] = dispatcher.send_messages([("lead@example.com", MagicMock())])
+
+        assert (result.sent, result.attempts) == (True, 2)
+        connection.reconnect.assert_called_once()
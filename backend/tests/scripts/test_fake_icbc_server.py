@@ -0,0 +1,109 @@
+import calendar
+import datetime
+import json
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from app.core.config import settings
+from app.crud.crud_lead import create_lead_with_preference
+from app.external_services.crawlers.availability_finder import find_available_dates
+from app.external_services.crawlers.icbc_client import ICBCClient
+from app.external_services.crawlers.icbc_login import ICBCTokenManager
+from app.schemas import LeadCreate, UserPreferenceCreate
+from scripts.fake_icbc_server import FakeICBCConfig, FakeICBCServer
+
+
+@pytest.fixture
+def fake_icbc(request):
+    config = getattr(request, "param", None) or FakeICBCConfig(centers=3, days=3, slots_per_day=2, churn=0)
+    with FakeICBCServer(config) as server:
+        with patch.multiple(settings, **server.urls):
+            yield server
+
+
+@pytest.fixture
+def client():
+    client = ICBCClient(retry_attempts=1)
+    yield client
+    client.close()
+
+
+def login(client):
+    return client.login({"drvrLastName": "x", "licenceNumber": "1", "keyword": "k"}).headers["Authorization"]
+
+
+class TestFakeICBCServer:
+    """Test the local ICBC stand-in used for offline load testing."""
+
+    def test_login_and_appointments(self, fake_icbc, client):
+        token = login(client)
+        exam_date = datetime.date(2030, 1, 7)
+
+        response = client.get_available_appointments({"aPosID": 2, "examDate": exam_date.isoformat()}, token)
+
+        slots = response.json()
+        assert len(slots) == 3 * 2
+        assert {slot["posId"] for slot in slots} == {2}
+        assert slots[0]["appointmentDt"] == {"date": "2030-01-07", "dayOfWeek": "Monday"}
+
+    def test_locations(self, fake_icbc, client):
+        data = client.get_test_centers({"lat": 49, "lng": -123}, login(client)).json()
+
+        assert [center["pos"]["posId"] for center in data] == [1, 2, 3]
+
+    def test_rejects_missing_token(self, fake_icbc, client):
+        with pytest.raises(requests.HTTPError) as e:
+            client.get_available_appointments({"aPosID": 1}, "Bearer nope")
+        assert e.value.response.status_code == 401
+
+    @pytest.mark.parametrize("fake_icbc", [FakeICBCConfig(centers=1, token_ttl=-1)], indirect=True)
+    def test_expired_token_is_refreshed(self, fake_icbc, client):
+        manager = ICBCTokenManager(login=lambda: login(client))
+        manager.get_token()
+
+        with pytest.raises(requests.HTTPError) as e:
+            manager.with_token(lambda token: client.get_available_appointments({"aPosID": 1}, token))
+        # The fresh token is expired too, so the retry was rejected as well
+        assert e.value.response.status_code == 401
+
+    @pytest.mark.parametrize("fake_icbc", [FakeICBCConfig(centers=1, error_rate=1)], indirect=True)
+    def test_error_rate(self, fake_icbc, client):
+        with pytest.raises(requests.HTTPError) as e:
+            client.get_available_appointments({"aPosID": 1}, login(client))
+        assert e.value.response.status_code == 503
+
+    def test_replays_recorded_fixtures(self, tmp_path, client):
+        recorded = [{"posId": 69, "startTm": "09:00"}]
+        (tmp_path / "appointments").mkdir()
+        (tmp_path / "appointments" / "69.json").write_text(json.dumps(recorded))
+        (tmp_path / "locations.json").write_text(json.dumps([{"pos": {"posId": 69}}]))
+
+        with FakeICBCServer(FakeICBCConfig(fixtures_dir=str(tmp_path))) as server:
+            with patch.multiple(settings, **server.urls):
+                token = login(client)
+                assert client.get_available_appointments({"aPosID": 69}, token).json() == recorded
+                assert client.get_test_centers({}, token).json() == [{"pos": {"posId": 69}}]
+
+    @pytest.mark.parametrize("fake_icbc", [FakeICBCConfig(days=14, slots_per_day=3, churn=0)], indirect=True)
+    def test_find_available_dates_against_fake_icbc(self, fake_icbc, client, db, centers):
+        today = datetime.date.today()
+        create_lead_with_preference(
+            db,
+            LeadCreate(email="subscriber@example.com"),
+            UserPreferenceCreate(
+                start_date=today,
+                end_date=today + datetime.timedelta(days=30),
+                preferred_centers_ids=[center.id for center in centers],
+                preferred_days=list(calendar.Day),
+            ),
+        )
+        manager = ICBCTokenManager(login=lambda: login(client))
+
+        with patch("app.external_services.crawlers.availability_finder.get_icbc_client", return_value=client), \
+             patch("app.external_services.crawlers.availability_finder.token_manager", manager):
+            results, _ = find_available_dates(db)
+
+        assert len(results) == len(centers) * 14 * 3
+        assert {result.center.pos_id for result in results} == {center.pos_id for center in centers}
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from app.crud.center_registry import center_registry
+from app.external_services.crawlers.icbc_centers_crawler import ICBCCentersCrawler
+from app.models import Center
+
+
+def location(pos_id, agency):
+    return {"pos": {"posId": pos_id, "agency": agency, "address": f"{pos_id} Street", "city": "Town",
+                    "postcode": f"V{pos_id}", "lat": 49, "lng": -123, "url": f"http://{pos_id}.example"}}
+
+
+class TestICBCCentersCrawler:
+    """Test saving crawled locations."""
+
+    def test_update_or_create(self, db, centers):
+        crawler = ICBCCentersCrawler()
+
+        crawler.update_or_create(db, location(7, "New Center"))
+        crawler.update_or_create(db, location(69, "Renamed Center"))
+
+        assert db.query(Center).filter(Center.pos_id == 7).one().name == "New Center"
+        assert db.query(Center).filter(Center.pos_id == 69).one().name == "Renamed Center"
+
+    def test_run_refreshes_center_registry(self, db, centers):
+        center_registry.all(db)
+        crawler = ICBCCentersCrawler()
+
+        with patch.object(crawler, "scrape_icbc_locations", return_value=[location(69, "Renamed Center")]), \
+             patch("app.external_services.crawlers.icbc_centers_crawler.db_session_as_context") as session:
+            session.return_value.__enter__.return_value = db
+            crawler.run()
+
+        assert center_registry.by_pos_ids(db, [69])[69].name == "Renamed Center"
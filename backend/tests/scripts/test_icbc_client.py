@@ -0,0 +1,95 @@
+import pytest
+import requests
+from unittest.mock import patch, MagicMock
+
+from app.core.config import settings
+from app.external_services.crawlers import constants, icbc_client
+from app.external_services.crawlers.icbc_client import ICBCClient, get_icbc_client
+from tests.conftest import http_error
+
+
+@pytest.fixture
+def client():
+    client = ICBCClient()
+    client.session.request = MagicMock()
+    client.session.request.return_value.raise_for_status = MagicMock()
+    return client
+
+
+class TestICBCClient:
+    """Test the pooled ICBC HTTP client."""
+
+    def test_mounts_pooled_adapter(self):
+        client = ICBCClient(pool_connections=2, pool_maxsize=5)
+
+        adapter = client.session.get_adapter("https://onlinebusiness.icbc.com")
+
+        assert adapter._pool_connections == 2
+        assert adapter._pool_maxsize == 5
+
+    def test_login_uses_login_headers_and_timeout(self, client):
+        client.login({"keyword": "secret"})
+
+        client.session.request.assert_called_once_with(
+            "PUT",
+            settings.ICBC_LOGIN_URL,
+            headers=constants.LOGIN_HEADERS,
+            json={"keyword": "secret"},
+            timeout=settings.ICBC_REQUEST_TIMEOUT,
+        )
+
+    def test_get_available_appointments_adds_authorization(self, client):
+        client.get_available_appointments({"aPosID": 69}, "Bearer token")
+
+        method, url = client.session.request.call_args.args
+        headers = client.session.request.call_args.kwargs["headers"]
+        assert (method, url) == ("POST", settings.ICBC_APPOINTMENT_URL)
+        assert headers["Authorization"] == "Bearer token"
+        assert headers["Referer"] == constants.LOGIN_HEADERS["Referer"]
+
+    def test_get_test_centers_uses_test_centers_headers(self, client):
+        client.get_test_centers({"lat": 1, "lng": 2}, "Bearer token")
+
+        method, url = client.session.request.call_args.args
+        headers = client.session.request.call_args.kwargs["headers"]
+        assert (method, url) == ("PUT", settings.ICBC_TEST_CENTERS_LOCATION_URL)
+        assert headers["Referer"] == constants.TEST_CENTERS_HEADERS["Referer"]
+        assert headers["Authorization"] == "Bearer token"
+
+    def test_raises_on_http_error(self, client):
+        response = requests.Response()
+        response.status_code = 404
+        client.session.request.return_value.raise_for_status.side_effect = requests.HTTPError(response=response)
+
+        with pytest.raises(requests.HTTPError):
+            client.login({})
+        client.session.request.assert_called_once()
+
+    @patch("app.external_services.crawlers.resilience.time.sleep")
+    def test_retries_server_errors_through_rate_limiter(self, mock_sleep, client):
+        response = requests.Response()
+        response.status_code = 503
+        client.session.request.return_value.raise_for_status.side_effect = [
+            requests.HTTPError(response=response), None
+        ]
+        client.rate_limiter = MagicMock()
+
+        client.login({})
+
+        assert client.session.request.call_count == 2
+        assert client.rate_limiter.acquire.call_count == 2
+        mock_sleep.assert_called_once()
+
+    @patch("app.external_services.crawlers.resilience.time.sleep")
+    def test_closes_failed_streamed_responses(self, mock_sleep, client):
+        failed, ok = MagicMock(), MagicMock()
+        failed.raise_for_status.side_effect = http_error(503)
+        client.session.request.side_effect = [failed, ok]
+
+        assert client.get_available_appointments({"aPosID": 69}, "Bearer token", stream=True) is ok
+        failed.close.assert_called_once()
+        ok.close.assert_not_called()
+
+    def test_get_icbc_client_is_shared(self):
+        with patch.object(icbc_client, "_client", None):
+            assert get_icbc_client() is get_icbc_client()
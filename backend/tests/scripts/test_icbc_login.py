@@ -0,0 +1,82 @@
+import time
+import pytest
+import requests
+from unittest.mock import MagicMock
+from jose import jwt
+
+from app.core.config import settings
+from app.external_services.crawlers.icbc_login import ICBCTokenManager
+from tests.conftest import http_error
+
+
+class TestICBCTokenManager:
+    """Test the shared ICBC auth token cache."""
+
+    def test_reuses_cached_token(self):
+        login = MagicMock(return_value="Bearer token")
+        manager = ICBCTokenManager(login=login)
+
+        assert manager.get_token() == "Bearer token"
+        assert manager.get_token() == "Bearer token"
+        login.assert_called_once()
+
+    def test_reads_lifetime_from_jwt_exp(self):
+        exp = int(time.time()) + 3600
+        token = "Bearer " + jwt.encode({"exp": exp}, "secret", algorithm="HS256")
+        manager = ICBCTokenManager(login=lambda: token)
+
+        manager.get_token()
+
+        assert manager._expires_at == exp - settings.ICBC_TOKEN_REFRESH_MARGIN_SECONDS
+
+    def test_falls_back_to_configured_ttl(self):
+        manager = ICBCTokenManager(login=lambda: "Bearer opaque")
+
+        before = time.time()
+        manager.get_token()
+
+        expected = before + settings.ICBC_TOKEN_TTL_SECONDS - settings.ICBC_TOKEN_REFRESH_MARGIN_SECONDS
+        assert manager._expires_at == pytest.approx(expected, abs=5)
+
+    def test_logs_in_again_when_expired(self):
+        expired = "Bearer " + jwt.encode({"exp": int(time.time()) - 60}, "secret", algorithm="HS256")
+        login = MagicMock(side_effect=[expired, "Bearer fresh"])
+        manager = ICBCTokenManager(login=login)
+
+        assert manager.get_token() == expired
+        assert manager.get_token() == "Bearer fresh"
+
+    def test_retries_once_with_fresh_token_on_401(self):
+        manager = ICBCTokenManager(login=MagicMock(side_effect=["Bearer stale", "Bearer fresh"]))
+        send = MagicMock(side_effect=[http_error(401), "response"])
+
+        assert manager.with_token(send) == "response"
+        assert [c.args[0] for c in send.call_args_list] == ["Bearer stale", "Bearer fresh"]
+
+    def test_second_401_is_raised(self):
+        manager = ICBCTokenManager(login=MagicMock(side_effect=["Bearer stale", "Bearer fresh"]))
+        send = MagicMock(side_effect=[http_error(401), http_error(401)])
+
+        with pytest.raises(requests.HTTPError):
+            manager.with_token(send)
+        assert send.call_count == 2
+
+    def test_other_errors_are_not_retried(self):
+        login = MagicMock(return_value="Bearer token")
+        manager = ICBCTokenManager(login=login)
+        send = MagicMock(side_effect=http_error(500))
+
+        with pytest.raises(requests.HTTPError):
+            manager.with_token(send)
+        send.assert_called_once()
+        login.assert_called_once()
+
+    def test_invalidate_ignores_already_replaced_token(self):
+        manager = ICBCTokenManager(login=MagicMock(side_effect=["Bearer old", "Bearer new"]))
+        manager.get_token()
+        manager.invalidate("Bearer old")
+        manager.get_token()
+
+        manager.invalidate("Bearer old")
+
+        assert manager.get_token() == "Bearer new"
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from app.external_services.json_stream import iter_json_array
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonArray:
+    """Test incremental parsing of JSON arrays."""
+
+    @pytest.mark.parametrize("size", [1, 2, 5, 64, 4096])
+    def test_any_chunk_boundaries(self, size):
+        document = [
+            {"appointmentDt": {"date": "2030-01-04", "dayOfWeek": "Friday"}, "posId": 274, "note": "Café, ]"},
+            12.5e3, -7, "text", True, None, [1, [2, {}]], {},
+        ]
+        data = json.dumps(document).encode()
+
+        assert list(iter_json_array(chunked(data, size))) == document
+
+    def test_yields_before_the_end(self):
+        def chunks():
+            yield b'[{"a": 1}, '
+            raise AssertionError("read past the first element")
+
+        assert next(iter_json_array(chunks())) == {"a": 1}
+
+    @pytest.mark.parametrize("data", [b"[]", b" [ \n ] \n"])
+    def test_empty_array(self, data):
+        assert list(iter_json_array(chunked(data, 1))) == []
+
+    @pytest.mark.parametrize("data", [
+        b'{"error": "unauthorized"}',
+        b"",
+        b'[{"a": 1}',
+        b'[{"a": 1},]',
+        b'[{"a": 1} {"b": 2}]',
+        b'[{"a": 1}] trailing',
+        b'[{"a": }]',
+    ])
+    def test_malformed(self, data):
+        with pytest.raises(ValueError):
+            list(iter_json_array(chunked(data, 3)))
@@ -0,0 +1,212 @@
+import dataclasses
+import datetime
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.crud.crud_lead import create_lead_with_preference, get_lead_preferences
+from app.external_services import matching, notifier
+from app.external_services.availability_serializer import AvailabilitySerializer
+from app.external_services.matching import InvertedIndexMatcher, LeadCriteria, NumpyMatcher
+from app.models import NotificationOutbox
+from app.schemas import LeadCreate, UserPreferenceCreate
+from scripts import benchmark_hot_path
+from tests.conftest import slot as available_slot
+
+
+requires_numpy = pytest.mark.skipif(matching.np is None, reason="numpy is not installed")
+MATCHERS = [InvertedIndexMatcher, pytest.param(NumpyMatcher, marks=requires_numpy)]
+
+
+def lead(email, centers, days, start_date, end_date):
+    preference = SimpleNamespace(preferred_centers=centers, preferred_days=days,
+                                 start_date=start_date, end_date=end_date)
+    return SimpleNamespace(email=email, preference=preference)
+
+
+@pytest.fixture
+def slot(centers):
+    return available_slot(centers[0])
+
+
+@pytest.fixture
+def synthetic_cycle():
+    """Serialized slots and leads as built by the hot path benchmark."""
+    positions = benchmark_hot_path.build_centers(6)
+    db = benchmark_hot_path.center_session(positions)
+    raw = benchmark_hot_path.build_slots(500, 6, seed=3)
+    items = AvailabilitySerializer.with_centers(raw, db).root
+    leads = benchmark_hot_path.build_leads(300, [benchmark_hot_path.make_center(pos) for pos in positions], seed=3)
+    yield items, leads
+    db.close()
+
+
+@pytest.mark.parametrize("matcher", MATCHERS)
+class TestMatchers:
+    """Test the inverted index and NumPy matching engines."""
+
+    def test_matches_the_per_lead_scan(self, matcher, synthetic_cycle):
+        items, leads = synthetic_cycle
+        expected = {}
+        for each in leads:
+            matched = notifier.match_availability_to_users(items, each)
+            if matched:
+                expected[each.email] = matched
+        assert expected
+
+        matches = matcher.from_leads(leads).match(items)
+
+        assert matches == expected
+
+    def test_date_range_is_inclusive(self, matcher, slot, centers):
+        slot_date = slot.appointmentDt.date
+        day = slot.appointmentDt.dayOfWeek.value
+        leads = [
+            lead("starts@example.com", centers[:1], [day], slot_date, slot_date + datetime.timedelta(days=7)),
+            lead("ends@example.com", centers[:1], [day], slot_date - datetime.timedelta(days=7), slot_date),
+            lead("after@example.com", centers[:1], [day], slot_date + datetime.timedelta(days=1), None),
+            lead("before@example.com", centers[:1], [day], None, slot_date - datetime.timedelta(days=1)),
+        ]
+
+        matches = matcher.from_leads(leads).match([slot])
+
+        assert set(matches) == {"starts@example.com", "ends@example.com"}
+        assert matches["starts@example.com"][centers[0].name] == [slot]
+
+    def test_no_leads_or_slots(self, matcher, slot, centers):
+        day = slot.appointmentDt.dayOfWeek.value
+
+        assert matcher.from_leads([]).match([slot]) == {}
+        assert matcher.from_leads([lead("a@example.com", centers, [day], None, None)]).match([]) == {}
+
+    def test_skips_items_without_center(self, matcher, slot, centers):
+        slot.center = None
+        day = slot.appointmentDt.dayOfWeek.value
+
+        matcher = matcher.from_leads([lead("a@example.com", centers, [day], None, None)])
+
+        assert matcher.match([slot]) == {}
+
+
+class TestLeadCriteria:
+    """Test flattening leads into matching criteria."""
+
+    def test_skips_leads_that_cannot_match(self, centers):
+        today = datetime.date.today()
+
+        assert LeadCriteria.from_lead(SimpleNamespace(email="a@example.com", preference=None)) is None
+        assert LeadCriteria.from_lead(lead("a@example.com", [], [0], today, today)) is None
+        assert LeadCriteria.from_lead(lead("a@example.com", centers, [], today, today)) is None
+        assert LeadCriteria.from_lead(lead(None, centers, [0], today, today)) is None
+
+    def test_streamed_rows_match_like_leads(self, db, centers):
+        today, next_week = datetime.date.today(), datetime.date.today() + datetime.timedelta(days=7)
+        create_lead_with_preference(db, LeadCreate(email="a@example.com"), UserPreferenceCreate(
+            start_date=today, end_date=next_week, preferred_centers_ids=[69, 85], preferred_days=[0, 3]))
+
+        [row] = get_lead_preferences(db)
+        criteria = LeadCriteria.from_lead(row)
+
+        expected = LeadCriteria.from_lead(lead("a@example.com", centers[:2], [0, 3], today, next_week))
+        assert criteria == dataclasses.replace(expected, id=row.id)
+        assert LeadCriteria.from_lead(criteria) is criteria
+
+
+@requires_numpy
+class TestNumpyMatcher:
+    """Test the NumPy engine's encoding."""
+
+    def test_spans_several_bitset_words(self, slot):
+        # Sorted before the slot's center, which lands in the third word
+        many_centers = [SimpleNamespace(pos_id=pos_id) for pos_id in range(-200, -70)]
+        day = slot.appointmentDt.dayOfWeek.value
+        leads = [
+            lead("wanted@example.com", many_centers + [slot.center], [day], None, None),
+            lead("other@example.com", many_centers, [day], None, None),
+        ]
+
+        matcher = NumpyMatcher.from_leads(leads)
+
+        assert matcher._centers.shape == (2, 3)
+        assert list(matcher.match([slot])) == ["wanted@example.com"]
+
+    def test_match_pairs_are_chunked(self, synthetic_cycle):
+        items, leads = synthetic_cycle
+        matcher = NumpyMatcher.from_leads(leads)
+        lead_idx, slot_idx = matcher.match_pairs(items)
+
+        with patch.object(NumpyMatcher, "MAX_CELLS", 7):
+            chunked = matcher.match_pairs(items)
+
+        assert sorted(zip(lead_idx.tolist(), slot_idx.tolist())) == sorted(zip(*(a.tolist() for a in chunked)))
+
+
+class TestMatchLeads:
+    """Test the engine selection of notifier.match_leads."""
+
+    @pytest.mark.parametrize("engine", ["index", pytest.param("numpy", marks=requires_numpy), "scan"])
+    def test_engines_agree(self, engine, synthetic_cycle):
+        items, leads = synthetic_cycle
+
+        with patch.object(settings, "MATCHING_ENGINE", engine):
+            matches = notifier.match_leads(leads, items)
+
+        assert matches == InvertedIndexMatcher.from_leads(leads).match(items)
+
+
+class TestSqlMatcher:
+    """Test matching the slots against the leads inside the database."""
+
+    @pytest.fixture
+    def db_leads(self, db, centers):
+        today = datetime.date.today()
+        wanted = [  # centers, days, start, end
+            ([69], [0], today, today + datetime.timedelta(days=14)),
+            ([69, 85], [0, 2], today + datetime.timedelta(days=1), today + datetime.timedelta(days=7)),
+            ([85], [1, 2, 3], today, today + datetime.timedelta(days=2)),
+            ([6985], [0, 1, 2, 3, 4], today, today + datetime.timedelta(days=30)),
+        ]
+        for i, (center_ids, days, start_date, end_date) in enumerate(wanted):
+            create_lead_with_preference(db, LeadCreate(email=f"lead{i}@example.com"), UserPreferenceCreate(
+                start_date=start_date, end_date=end_date, preferred_centers_ids=center_ids, preferred_days=days))
+        return get_lead_preferences(db)
+
+    @pytest.fixture
+    def items(self, centers):
+        today = datetime.date.today()
+        items = []
+        for day in range(10):
+            date = today + datetime.timedelta(days=day)
+            for center in centers[:2]:
+                for start in ("09:00", "13:00"):
+                    items.append(available_slot(center, start, date=date))
+        return items
+
+    def test_matches_like_the_inverted_index(self, db, db_leads, items):
+        matcher = matching.SqlMatcher(lambda: nullcontext(db))
+
+        matches = matcher.match(items)
+
+        assert matches
+        assert matches == InvertedIndexMatcher.from_leads(db_leads).match(items)
+        assert matcher.lead_ids == {lead.email: lead.id for lead in db_leads if lead.email in matches}
+
+    def test_no_slots(self, db, db_leads, slot):
+        slot.center = None
+
+        assert matching.SqlMatcher(lambda: nullcontext(db)).match([]) == {}
+        assert matching.SqlMatcher(lambda: nullcontext(db)).match([slot]) == {}
+
+    def test_queues_notifications_without_loading_leads(self, db, db_leads, items):
+        with patch.object(settings, "MATCHING_ENGINE", "sql"):
+            assert notifier.load_leads(db) == []
+            matcher = notifier.build_matcher([], lambda: nullcontext(db))
+            queued = notifier.enqueue_lead_notifications(db, [], items, matcher=matcher)
+
+        expected = InvertedIndexMatcher.from_leads(db_leads).match(items)
+        assert queued == len(expected)
+        lead_ids = {lead.email: lead.id for lead in db_leads}
+        assert {(n.email, n.lead_id) for n in db.query(NotificationOutbox)} == {(e, lead_ids[e]) for e in expected}
@@ -0,0 +1,90 @@
+import datetime
+
+import pytest
+
+from app.external_services import notifier
+from app.external_services.email_service import DispatchResult
+from app.external_services.notification_dedup import NotifiedSlots, slot_fingerprint
+from app.models import NotifiedSlot
+from tests.conftest import slot
+
+
+@pytest.fixture
+def lead_centers():
+    return [[69], [69, 85]]
+
+
+def sent_to(dispatcher):
+    return sorted(key for key, _ in dispatcher.send_messages.call_args.args[0])
+
+
+def notify(db, leads, availability, dispatcher, now=None):
+    notified = NotifiedSlots(now=now, window_hours=24).load(db)
+    notifier.notify_lead_by_preference(leads, availability, dispatcher, notified)
+    notified.save(db)
+
+
+class TestSlotFingerprint:
+
+    def test_same_slot_same_fingerprint(self, centers):
+        assert slot_fingerprint(slot(centers[0])) == slot_fingerprint(slot(centers[0]))
+
+    def test_distinct_slots(self, centers):
+        fingerprints = {slot_fingerprint(slot(center, start)) for center in centers for start in ["09:00", "10:00"]}
+
+        assert len(fingerprints) == 2 * len(centers)
+        assert all(-2 ** 63 <= fingerprint < 2 ** 63 for fingerprint in fingerprints)
+
+
+class TestNotifiedSlots:
+    """Test that leads are only notified of slots they were not notified about yet."""
+
+    def test_only_new_slots_are_notified(self, db, centers, leads, dispatcher):
+        first = [slot(centers[0])]
+        notify(db, leads, first, dispatcher)
+        assert sent_to(dispatcher) == ["lead0@example.com", "lead1@example.com"]
+
+        dispatcher.send_messages.reset_mock()
+        notify(db, leads, [slot(centers[0]), slot(centers[1])], dispatcher)
+
+        [(lead_email, message)] = dispatcher.send_messages.call_args.args[0]
+        assert lead_email == "lead1@example.com"
+        assert "<strong>Center 2</strong>" in message and "<strong>Center 1</strong>" not in message
+        assert db.query(NotifiedSlot).count() == 3
+
+    def test_leads_with_nothing_new_are_skipped(self, db, centers, leads, dispatcher):
+        notify(db, leads, [slot(centers[0])], dispatcher)
+        dispatcher.send_messages.reset_mock()
+
+        notify(db, leads, [slot(centers[0])], dispatcher)
+
+        assert sent_to(dispatcher) == []
+
+    def test_failed_sends_are_not_remembered(self, db, centers, leads, dispatcher):
+        dispatcher.send_messages.side_effect = lambda batch: [
+            DispatchResult(key, sent=key == "lead1@example.com", attempts=1) for key, _ in batch
+        ]
+        notify(db, leads, [slot(centers[0])], dispatcher)
+        dispatcher.send_messages.reset_mock()
+
+        notify(db, leads, [slot(centers[0])], dispatcher)
+
+        assert sent_to(dispatcher) == ["lead0@example.com"]
+
+    def test_notified_again_once_window_expired(self, db, centers, leads, dispatcher):
+        now = datetime.datetime.now(datetime.UTC)
+        notify(db, leads, [slot(centers[0])], dispatcher, now=now - datetime.timedelta(hours=25))
+        dispatcher.send_messages.reset_mock()
+
+        notify(db, leads, [slot(centers[0])], dispatcher, now=now)
+
+        assert sent_to(dispatcher) == ["lead0@example.com", "lead1@example.com"]
+        assert {n.notified_at for n in db.query(NotifiedSlot)} == {now}
+
+    def test_outbox_queues_only_new_slots(self, db, centers, leads):
+        notified = NotifiedSlots().load(db)
+        assert notifier.enqueue_lead_notifications(db, leads, [slot(centers[0])], notified) == 2
+        notified.save(db)
+
+        notified = NotifiedSlots().load(db)
+        assert notifier.enqueue_lead_notifications(db, leads, [slot(centers[0]), slot(centers[1])], notified) == 1
@@ -8,53 +8,18 @@ from sqlalchemy import Row
 from typing import Optional, List
 
 from app.external_services import notifier
-from app.external_services.availability_serializer import AvailabilityItem, AppointmentDt, DlExam
+from app.external_services.availability_delta import AvailabilitySnapshotStore
+from app.external_services.availability_serializer import AvailabilityItem
+from app.external_services.email_service import DispatchResult, SMTPDispatcher
 from app.schemas.center import CenterResponse
+from tests.conftest import raw_slot, slot
 
 
 
 @pytest.fixture
 def sample_availability_item(centers):
     """Create a sample AvailabilityItem."""
-    appointment_dt = AppointmentDt(
-        date=date(2024, 6, 10),
-        dayOfWeek=Day.MONDAY
-    )
-    dl_exam = DlExam(
-        code="5-R-1",
-        description="5-R-ROAD"
-    )
-    
-    item = AvailabilityItem(
-        appointmentDt=appointment_dt,
-        dlExam=dl_exam,
-        endTm="10:30",
-        lemgMsgId=35,
-        posId=274,
-        resourceId=21903,
-        signature="test_signature",
-        startTm="09:00",
-        center=CenterResponse.model_validate(centers[0])
-    )
-    return item
-
-
-@pytest.fixture
-def sample_lead_preference(centers):
-    """Create a sample Lead ORM object with preference and preferred_centers."""
-    # Mock the UserPreference object
-    mock_preference = Mock()
-    mock_preference.preferred_centers = [centers[0], centers[1]]
-    mock_preference.preferred_days = [0, 1, 4]  # Monday, Tuesday, Friday
-    mock_preference.start_date = date(2024, 6, 1)
-    mock_preference.end_date = date(2024, 6, 30)
-    
-    # Mock the Lead object
-    mock_lead = Mock()
-    mock_lead.email = "test@example.com"
-    mock_lead.preference = mock_preference
-
-    return mock_lead
+    return slot(centers[0], end="10:30", date=date(2024, 6, 10), signature="test_signature")
 
 
 @pytest.fixture
@@ -198,7 +163,30 @@ class TestNotifyLeadByPreference:
         lead_preferences = [sample_lead_preference]
         
         # Should not raise exception
-        notifier.notify_lead_by_preference(lead_preferences, sample_availability_data, mock_gmail_service)
+        results = notifier.notify_lead_by_preference(lead_preferences, sample_availability_data, mock_gmail_service)
+
+        assert results == [DispatchResult(sample_lead_preference.email, sent=False, attempts=1, error="Send failed")]
+
+    def test_leads_with_identical_matches_share_a_message(self, sample_lead_preference, sample_availability_data,
+                                                          mock_gmail_service):
+        """Test that a message is created once for every lead with the same matches."""
+        twin = Mock(email="twin@example.com", preference=sample_lead_preference.preference)
+
+        notifier.notify_lead_by_preference([sample_lead_preference, twin], sample_availability_data, mock_gmail_service)
+
+        mock_gmail_service.create_message.assert_called_once()
+        assert mock_gmail_service.send_message.call_count == 2
+
+    def test_sends_through_dispatcher(self, sample_lead_preference, sample_availability_data):
+        """Test that a dispatcher gets every rendered message in a single batch."""
+        dispatcher = MagicMock(spec=SMTPDispatcher)
+        dispatcher.create_message.return_value = "mock_message"
+        dispatcher.send_messages.return_value = [DispatchResult(sample_lead_preference.email, sent=True, attempts=1)]
+
+        results = notifier.notify_lead_by_preference([sample_lead_preference], sample_availability_data, dispatcher)
+
+        dispatcher.send_messages.assert_called_once_with([(sample_lead_preference.email, "mock_message")])
+        assert results == dispatcher.send_messages.return_value
 
 
 class TestMainFunction:
@@ -214,8 +202,9 @@ class TestMainFunction:
         
         with patch('app.external_services.notifier.db_session_as_context') as mock_context, \
              patch('app.external_services.notifier.find_available_dates', return_value=(sample_availability_data, True)), \
-             patch('app.external_services.notifier.get_lead_preferences', return_value=[sample_lead_preference]), \
-             patch('app.external_services.notifier.SMTPGmailService', return_value=mock_gmail_service):
+             patch('app.external_services.notifier.load_leads', return_value=[sample_lead_preference]), \
+             patch('app.external_services.email_service.SMTPGmailService', return_value=mock_gmail_service), \
+             patch.object(notifier.settings, 'NOTIFICATION_DEDUP_ENABLED', False):
             
             mock_context.return_value.__enter__.side_effect = [mock_db, mock_session]
             mock_context.return_value.__exit__.return_value = None
@@ -245,8 +234,8 @@ class TestMainFunction:
         
         with patch('app.external_services.notifier.db_session_as_context') as mock_context, \
              patch('app.external_services.notifier.find_available_dates', return_value=(sample_availability_data, True)), \
-             patch('app.external_services.notifier.get_lead_preferences', return_value=[sample_lead_preference]), \
-             patch('app.external_services.notifier.SMTPGmailService', side_effect=Exception("Gmail error")):
+             patch('app.external_services.notifier.load_leads', return_value=[sample_lead_preference]), \
+             patch('app.external_services.email_service.SMTPGmailService', side_effect=Exception("Gmail error")):
             
             mock_context.return_value.__enter__.side_effect = [mock_db, mock_session]
             mock_context.return_value.__exit__.return_value = None
@@ -255,29 +244,62 @@ class TestMainFunction:
             notifier.main()
 
 
+class TestRunCycleSnapshot:
+    """Test that the availability snapshot only moves on once the new slots were notified."""
+
+    @pytest.fixture
+    def snapshot_store(self):
+        return MagicMock(spec=AvailabilitySnapshotStore)
+
+    @pytest.fixture
+    def cycle(self, sample_availability_data):
+        with patch.object(notifier, 'db_session_as_context'), \
+             patch.object(notifier, 'find_available_dates', return_value=(sample_availability_data, True)), \
+             patch.object(notifier, 'load_leads', return_value=[]), \
+             patch.multiple(notifier.settings, NOTIFICATION_OUTBOX_ENABLED=False, NOTIFICATION_DEDUP_ENABLED=False):
+            yield
+
+    @pytest.mark.parametrize("sent, saved", [(True, True), (False, False)])
+    def test_saved_only_when_every_email_was_sent(self, cycle, snapshot_store, sent, saved):
+        results = [DispatchResult("a@example.com", sent=True, attempts=1),
+                   DispatchResult("b@example.com", sent=sent, attempts=1)]
+        with patch.object(notifier, 'notify_lead_by_preference', return_value=results):
+            notifier.run_cycle(MagicMock(), snapshot_store)
+
+        assert snapshot_store.save.called is saved
+        assert snapshot_store.discard.called is not saved
+
+    def test_discarded_when_sending_raised(self, cycle, snapshot_store):
+        with patch.object(notifier, 'notify_lead_by_preference', side_effect=Exception("SMTP down")):
+            notifier.run_cycle(MagicMock(), snapshot_store)
+
+        snapshot_store.save.assert_not_called()
+        snapshot_store.discard.assert_called_once()
+
+    def test_discarded_when_the_crawl_raised(self, snapshot_store):
+        with patch.object(notifier, 'db_session_as_context'), \
+             patch.object(notifier, 'find_available_dates', side_effect=RuntimeError("Authorization failed")), \
+             pytest.raises(RuntimeError):
+            notifier.run_cycle(MagicMock(), snapshot_store)
+
+        snapshot_store.save.assert_not_called()
+        snapshot_store.discard.assert_called_once()
+
+    def test_ignored_with_dedup(self):
+        with patch.multiple(notifier.settings, NOTIFY_ONLY_NEW_SLOTS=True, NOTIFICATION_DEDUP_ENABLED=True):
+            assert notifier.build_snapshot_store() is None
+        with patch.multiple(notifier.settings, NOTIFY_ONLY_NEW_SLOTS=True, NOTIFICATION_DEDUP_ENABLED=False,
+                            AVAILABILITY_SNAPSHOT_FILE=""):
+            assert isinstance(notifier.build_snapshot_store(), AvailabilitySnapshotStore)
+
+
 class TestEndToEndIntegration:
     """End-to-end integration tests for the notifier system."""
     
     def test_complete_notification_workflow(self, centers):
         """Test the complete notification workflow with real data structures."""
         # Create realistic test data
-        appointment_dt = AppointmentDt(
-            date=date(2024, 6, 10),
-            dayOfWeek=Day.MONDAY
-        )
-        dl_exam = DlExam(code="5-R-1", description="5-R-ROAD")
-        
-        availability_item = AvailabilityItem(
-            appointmentDt=appointment_dt,
-            dlExam=dl_exam,
-            endTm="10:30",
-            lemgMsgId=35,
-            posId=centers[0].pos_id,
-            resourceId=21903,
-            signature="test_signature",
-            startTm="09:00",
-            center=CenterResponse.model_validate(centers[0])
-        )
+        availability_item = slot(centers[0], end="10:30", date=date(2024, 6, 10), signature="test_signature")
         
         lead_preference = Mock()
         lead_preference.email = "test@example.com"
@@ -316,22 +338,7 @@ class TestAvailabilitySerializerIntegration:
     
     def test_availability_item_with_center(self, centers):
         """Test creating AvailabilityItem with center attached."""
-        raw_data = {
-            "appointmentDt": {
-                "date": "2024-06-10",
-                "dayOfWeek": "Monday"
-            },
-            "dlExam": {
-                "code": "5-R-1",
-                "description": "5-R-ROAD"
-            },
-            "endTm": "10:30",
-            "lemgMsgId": 35,
-            "posId": 69,
-            "resourceId": 21903,
-            "signature": "test_signature",
-            "startTm": "09:00"
-        }
+        raw_data = raw_slot(69, date(2024, 6, 10), end="10:30", signature="test_signature")
 
         item = AvailabilityItem.with_center(raw_data, centers[0])
         
@@ -344,25 +351,10 @@ class TestAvailabilitySerializerIntegration:
         """Test creating AvailabilitySerializer with centers attached."""
         from app.external_services.availability_serializer import AvailabilitySerializer
         
-        raw_data = [{
-            "appointmentDt": {
-                "date": "2024-06-10",
-                "dayOfWeek": "Monday"
-            },
-            "dlExam": {
-                "code": "5-R-1",
-                "description": "5-R-ROAD"
-            },
-            "endTm": "10:30",
-            "lemgMsgId": 35,
-            "posId": 69,
-            "resourceId": 21903,
-            "signature": "test_signature",
-            "startTm": "09:00"
-        }]
+        raw_data = [raw_slot(69, date(2024, 6, 10), end="10:30", signature="test_signature")]
         
         mock_db = Mock()
-        mock_db.query.return_value.filter.return_value.all.return_value = [centers[0]]
+        mock_db.query.return_value.all.return_value = [centers[0]]  # Loaded into the center registry
         
         serializer = AvailabilitySerializer.with_centers(raw_data, mock_db)
         
@@ -0,0 +1,116 @@
+import os
+import signal
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.external_services import notifier
+from app.external_services.crawlers.icbc_centers_crawler import ICBCCentersCrawler
+from app.external_services.email_service import SMTPDispatcher
+from app.external_services.matching import InvertedIndexMatcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def daemon():
+    with patch.object(notifier.settings, "NOTIFY_ONLY_NEW_SLOTS", False):
+        yield notifier.NotifierDaemon(cycle_seconds=0.01, centers_refresh_seconds=3600,
+                                      dispatcher=MagicMock(spec=SMTPDispatcher),
+                                      centers_crawler=MagicMock(spec=ICBCCentersCrawler))
+
+
+def stop_after(daemon, cycles, side_effect=None):
+    calls = []
+
+    def run_cycle(*args):
+        calls.append(args)
+        if len(calls) >= cycles:
+            daemon.stop()
+        if side_effect is not None:
+            raise side_effect
+
+    return calls, patch.object(notifier, "run_cycle", side_effect=run_cycle)
+
+
+class TestLeadIndex:
+    """Test that leads and their matcher are kept between cycles."""
+
+    def test_reloads_only_once_stale(self, sample_lead_preference):
+        clock = FakeClock()
+        index = notifier.LeadIndex(ttl=60, clock=clock)
+        with patch.object(notifier, "db_session_as_context"), \
+             patch.object(notifier, "load_leads", return_value=[sample_lead_preference]) as load:
+            assert index.refresh() == [sample_lead_preference]
+            matcher = index.matcher
+            clock.now = 59
+            index.refresh()
+            assert load.call_count == 1 and index.matcher is matcher
+
+            clock.now = 60
+            index.refresh()
+            assert load.call_count == 2 and index.matcher is not matcher
+
+            index.invalidate()
+            index.refresh()
+            assert load.call_count == 3
+
+        assert isinstance(index.matcher, InvertedIndexMatcher)
+
+    def test_scan_engine_has_no_matcher(self, sample_lead_preference):
+        index = notifier.LeadIndex(ttl=60)
+        with patch.object(notifier.settings, "MATCHING_ENGINE", "scan"), \
+             patch.object(notifier, "db_session_as_context"), \
+             patch.object(notifier, "load_leads", return_value=[sample_lead_preference]):
+            index.refresh()
+
+        assert index.matcher is None
+
+
+class TestNotifierDaemon:
+    """Test the long-running notifier loop."""
+
+    def test_runs_cycles_with_warm_state(self, daemon):
+        calls, run_cycle = stop_after(daemon, 3)
+        with run_cycle:
+            daemon.serve()
+
+        assert len(calls) == 3
+        assert all(args == (daemon.dispatcher, None, daemon.scheduler, daemon.lead_index, None) for args in calls)
+        daemon.dispatcher.close.assert_called_once()
+        daemon.centers_crawler.run.assert_not_called()
+
+    def test_refreshes_centers_on_their_own_cadence(self, daemon):
+        daemon.centers_refresh_seconds = 0.01
+        calls, run_cycle = stop_after(daemon, 3)
+        with run_cycle:
+            daemon.serve()
+
+        assert daemon.centers_crawler.run.call_count >= 2
+
+    def test_failed_cycle_does_not_stop_the_daemon(self, daemon):
+        calls, run_cycle = stop_after(daemon, 2, side_effect=RuntimeError("ICBC down"))
+        with run_cycle:
+            daemon.serve()
+
+        assert len(calls) == 2
+        daemon.dispatcher.close.assert_called_once()
+
+    def test_sigterm_stops_after_the_current_cycle(self, daemon):
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def run_cycle(*args):
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        with patch.object(notifier, "run_cycle", side_effect=run_cycle) as cycle:
+            daemon.serve()
+
+        cycle.assert_called_once()
+        daemon.dispatcher.close.assert_called_once()
+        assert signal.getsignal(signal.SIGTERM) == previous
@@ -0,0 +1,77 @@
+import datetime
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.external_services import notifier, outbox_sender
+from app.external_services.email_service import DispatchResult
+from app.external_services.outbox_sender import drain_outbox
+from app.models import NotificationOutbox
+from app.models.notification import OUTBOX_PENDING, OUTBOX_SENT
+from tests.conftest import slot
+
+
+class TestEnqueueLeadNotifications:
+    """Test queuing matched leads in the outbox."""
+
+    def test_queues_each_match_once(self, db, centers, leads):
+        availability = [slot(centers[0]), slot(centers[1])]
+
+        assert notifier.enqueue_lead_notifications(db, leads, availability) == 3
+        assert notifier.enqueue_lead_notifications(db, leads, availability) == 0
+
+        notifications = db.query(NotificationOutbox).order_by(NotificationOutbox.email).all()
+        assert [n.email for n in notifications] == ["lead0@example.com", "lead1@example.com", "lead2@example.com"]
+        assert notifications[0].body == notifications[1].body != notifications[2].body
+        assert notifications[0].body == notifier.prepare_message({centers[0].name: availability[:1]})
+
+    def test_new_slots_are_queued_again(self, db, centers, leads):
+        notifier.enqueue_lead_notifications(db, leads, [slot(centers[0])])
+
+        assert notifier.enqueue_lead_notifications(db, leads, [slot(centers[0]), slot(centers[0], "10:00")]) == 2
+
+    def test_notification_key(self, centers):
+        first, second = slot(centers[0]), slot(centers[0], "10:00")
+
+        key = notifier.notification_key("lead", {centers[0].name: [first, second]})
+
+        assert key == notifier.notification_key("lead", {centers[0].name: [second, first]})
+        assert key != notifier.notification_key("other lead", {centers[0].name: [first, second]})
+        assert key != notifier.notification_key("lead", {centers[0].name: [first]})
+
+
+class TestDrainOutbox:
+    """Test sending the outbox."""
+
+    def test_sends_every_pending_notification(self, db, centers, leads, dispatcher):
+        notifier.enqueue_lead_notifications(db, leads, [slot(centers[0]), slot(centers[1])])
+
+        assert drain_outbox(db, dispatcher, batch_size=2) == (3, 3)
+
+        assert dispatcher.send_messages.call_count == 2
+        assert dispatcher.create_message.call_count == 2  # lead0 and lead1 share a body
+        assert {n.status for n in db.query(NotificationOutbox)} == {OUTBOX_SENT}
+        assert drain_outbox(db, dispatcher) == (0, 0)
+
+    def test_failed_sends_are_retried_later(self, db, centers, leads, dispatcher):
+        notifier.enqueue_lead_notifications(db, leads, [slot(centers[0])])
+        dispatcher.send_messages.side_effect = lambda batch: [
+            DispatchResult(key, sent=key != "lead1@example.com", attempts=1, error="refused") for key, _ in batch
+        ]
+
+        with patch.object(settings, "NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS", 60):
+            assert drain_outbox(db, dispatcher) == (2, 1)
+
+        failed = db.query(NotificationOutbox).filter(NotificationOutbox.email == "lead1@example.com").one()
+        assert (failed.status, failed.attempts, failed.last_error) == (OUTBOX_PENDING, 1, "refused")
+        assert failed.next_attempt_at > datetime.datetime.now(datetime.UTC) + datetime.timedelta(seconds=50)
+        assert drain_outbox(db, dispatcher) == (0, 0)
+
+    def test_main_sends_with_the_configured_dispatcher(self, dispatcher):
+        with patch.object(outbox_sender, "build_dispatcher", return_value=dispatcher), \
+             patch.object(outbox_sender, "db_session_as_context"), \
+             patch.object(outbox_sender, "drain_outbox", return_value=(0, 0)) as drain, \
+             patch("sys.argv", ["outbox_sender"]):
+            outbox_sender.main()
+
+        assert drain.call_args.args[1] is dispatcher
+        dispatcher.close.assert_called_once()
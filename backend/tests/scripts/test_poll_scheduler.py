@@ -0,0 +1,82 @@
+import pytest
+
+from app.external_services.crawlers.poll_scheduler import CenterPollScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return CenterPollScheduler(budget_per_minute=10, min_interval=60, max_interval=3600,
+                               change_decay=0.5, clock=clock)
+
+
+class TestCenterPollScheduler:
+    """Test the adaptive per-center polling scheduler."""
+
+    def test_new_centers_are_due_immediately(self, scheduler):
+        scheduler.sync({1: 3, 2: 1})
+
+        assert sorted(scheduler.due()) == [1, 2]
+        assert scheduler.due() == []
+
+    def test_busier_centers_are_polled_more_often(self, scheduler):
+        scheduler.sync({1: 20, 2: 1})
+
+        assert scheduler.interval(1) < scheduler.interval(2)
+        assert scheduler.interval(1) >= 60
+        assert scheduler.interval(2) <= 3600
+
+    def test_changing_centers_are_polled_more_often(self, clock):
+        scheduler = CenterPollScheduler(budget_per_minute=1, min_interval=60, max_interval=3600,
+                                        change_decay=0.5, clock=clock)
+        scheduler.sync({1: 1, 2: 1})
+        scheduler.due()
+        scheduler.record(1, "a")
+        scheduler.record(2, "a")
+        for fingerprint in ("b", "c", "d"):
+            clock.now += 3600
+            scheduler.due()
+            scheduler.record(1, fingerprint)
+            scheduler.record(2, "a")
+
+        assert scheduler.interval(1) < scheduler.interval(2)
+
+    def test_recorded_center_is_rescheduled(self, scheduler, clock):
+        scheduler.sync({1: 1})
+        scheduler.due()
+        scheduler.record(1, "a")
+
+        assert scheduler.due() == []
+        assert scheduler.seconds_until_due() == pytest.approx(scheduler.interval(1))
+
+        clock.now += scheduler.interval(1)
+        assert scheduler.due() == [1]
+
+    def test_due_respects_budget(self, scheduler, clock):
+        scheduler.sync({pos_id: 1 for pos_id in range(15)})
+
+        assert len(scheduler.due()) == 10
+        assert scheduler.due() == []
+
+        clock.now += 60
+        assert len(scheduler.due()) == 5
+
+    def test_unsubscribed_centers_are_dropped(self, scheduler):
+        scheduler.sync({1: 1, 2: 1})
+        scheduler.sync({2: 1})
+
+        assert scheduler.due() == [2]
+        scheduler.record(1, "a")
+        assert scheduler.seconds_until_due() is None
@@ -0,0 +1,56 @@
+from datetime import date
+
+import pytest
+
+from app.external_services.availability_serializer import AvailabilityItem
+from app.external_services.rendering import MessageRenderer
+from tests.conftest import raw_slot
+
+
+@pytest.fixture
+def slots():
+    return [AvailabilityItem.model_validate(raw_slot(274, date(2030, 1, day), start, end))
+            for day, start, end in [(7, "09:00", "09:35"), (8, "14:55", "15:30"), (9, "10:00", "10:35")]]
+
+
+class TestMessageRenderer:
+    """Test the cached notification renderer."""
+
+    def test_render(self, slots):
+        body = MessageRenderer().render({"Center A": slots[:2], "Center B": [], "Center C": slots[2:]})
+
+        assert body == (
+            "<html><body><h2>ICBC Road Test Availability</h2><ul>"
+            "<li><strong>Center A</strong>:<ul>"
+            "<li>2030-01-07 (Monday) - 09:00 to 09:35</li>"
+            "<li>2030-01-08 (Tuesday) - 14:55 to 15:30</li>"
+            "</ul></li>"
+            "<li><strong>Center C</strong>:<ul>"
+            "<li>2030-01-09 (Wednesday) - 10:00 to 10:35</li>"
+            "</ul></li>"
+            "</ul></body></html>"
+        )
+
+    def test_identical_matches_share_one_body(self, slots):
+        renderer = MessageRenderer()
+
+        first = renderer.render({"Center A": list(slots)})
+        second = renderer.render({"Center A": list(slots)})
+
+        assert first is second
+        assert (renderer.hits, renderer.misses) == (1, 1)
+
+    def test_reuses_center_fragments(self, slots):
+        renderer = MessageRenderer()
+        shared = renderer.render({"Center A": slots[:2]})
+
+        body = renderer.render({"Center A": slots[:2], "Center C": slots[2:]})
+
+        assert renderer.misses == 2
+        assert shared[:-len("</ul></body></html>")] in body
+
+    def test_different_slots_render_differently(self, slots):
+        renderer = MessageRenderer()
+
+        assert renderer.render({"Center A": slots[:1]}) != renderer.render({"Center A": slots[1:2]})
+        assert renderer.render({"Center A": slots[:1]}) != renderer.render({"Center B": slots[:1]})
@@ -0,0 +1,110 @@
+import pytest
+import requests
+from unittest.mock import MagicMock
+
+from app.external_services.crawlers.resilience import CircuitBreaker, TokenBucket, call_with_retries
+from tests.conftest import http_error
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket:
+    """Test the shared ICBC rate limiter."""
+
+    def test_allows_burst_then_limits_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+        for _ in range(3):
+            bucket.acquire()
+        assert clock.now == 0
+
+        for _ in range(4):
+            bucket.acquire()
+        assert clock.now == pytest.approx(2)
+
+
+class TestCallWithRetries:
+    """Test retries with jittered exponential backoff."""
+
+    def test_retries_retryable_errors(self):
+        sleep = MagicMock()
+        send = MagicMock(side_effect=[requests.ConnectionError(), http_error(503), "response"])
+
+        assert call_with_retries(send, attempts=3, base_delay=1, max_delay=10, sleep=sleep) == "response"
+        assert send.call_count == 3
+        first_wait, second_wait = [c.args[0] for c in sleep.call_args_list]
+        assert 0 <= first_wait <= 1
+        assert 0 <= second_wait <= 2
+
+    def test_backoff_is_capped(self):
+        sleep = MagicMock()
+        send = MagicMock(side_effect=[requests.Timeout()] * 5 + ["response"])
+
+        call_with_retries(send, attempts=6, base_delay=1, max_delay=3, sleep=sleep)
+
+        assert all(c.args[0] <= 3 for c in sleep.call_args_list)
+
+    def test_raises_after_last_attempt(self):
+        send = MagicMock(side_effect=http_error(500))
+
+        with pytest.raises(requests.HTTPError):
+            call_with_retries(send, attempts=3, base_delay=0, sleep=MagicMock())
+        assert send.call_count == 3
+
+    @pytest.mark.parametrize("status_code", [400, 401, 404])
+    def test_client_errors_are_not_retried(self, status_code):
+        send = MagicMock(side_effect=http_error(status_code))
+
+        with pytest.raises(requests.HTTPError):
+            call_with_retries(send, attempts=3, sleep=MagicMock())
+        send.assert_called_once()
+
+
+class TestCircuitBreaker:
+    """Test the per-center circuit breaker."""
+
+    def test_opens_after_consecutive_failures(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=60, clock=clock)
+
+        breaker.record_failure(69)
+        assert breaker.allow(69)
+        breaker.record_failure(69)
+
+        assert not breaker.allow(69)
+        assert breaker.allow(85)
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=60, clock=FakeClock())
+
+        breaker.record_failure(69)
+        breaker.record_success(69)
+        breaker.record_failure(69)
+
+        assert breaker.allow(69)
+
+    def test_half_open_after_cooldown(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=60, clock=clock)
+        breaker.record_failure(69)
+
+        clock.now += 60
+        assert breaker.allow(69)
+        assert not breaker.allow(69)  # Only one trial call while half-open
+
+        breaker.record_failure(69)
+        assert not breaker.allow(69)
+        clock.now += 60
+        assert breaker.allow(69)
+        breaker.record_success(69)
+        assert breaker.allow(69)
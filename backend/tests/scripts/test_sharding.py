@@ -0,0 +1,105 @@
+import uuid
+from collections import Counter
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core.config import settings
+from app.crud.crud_lead import iter_active_lead_preferences
+from app.external_services import notifier
+from app.external_services.availability_delta import AvailabilitySnapshotStore
+from app.external_services.compact_slots import compact_items
+from app.external_services.sharding import RunSummary, ShardSummary, lead_shard
+from app.models import NotificationOutbox, NotifiedSlot
+from tests.conftest import SLOT_DATE, slot
+
+
+@pytest.fixture
+def lead_centers():
+    return [[69], [85]] * 4
+
+
+@pytest.fixture
+def shard_pool():
+    pool = notifier.ShardPool(shards=3, database_url=settings.TEST_DATABASE_URL)
+    yield pool
+    pool.close()
+
+
+class TestLeadShard:
+
+    def test_shard_is_stable(self):
+        lead_id = uuid.UUID("5b1f0a5e-3c39-4a3c-9f1e-6d3f4f0b8a21")
+
+        assert lead_shard(lead_id, 8) == lead_shard(str(lead_id), 8) == lead_shard(lead_id, 8)
+        assert 0 <= lead_shard(lead_id, 8) < 8
+
+    def test_leads_spread_evenly(self):
+        counts = Counter(lead_shard(uuid.uuid4(), 4) for _ in range(8000))
+
+        assert sorted(counts) == [0, 1, 2, 3]
+        assert all(1800 <= count <= 2200 for count in counts.values())
+
+    def test_sql_clause_agrees(self, db, leads):
+        by_shard = {
+            shard: {lead.id for batch in iter_active_lead_preferences(db, SLOT_DATE, shard=(shard, 3)) for lead in batch}
+            for shard in range(3)
+        }
+
+        assert sum(len(ids) for ids in by_shard.values()) == len(leads)
+        assert all(lead_shard(lead_id, 3) == shard for shard, ids in by_shard.items() for lead_id in ids)
+
+    def test_run_summary_merges_shards(self):
+        summary = RunSummary([ShardSummary(0, leads=3, queued=2, seconds=0.5),
+                              ShardSummary(1, leads=4, queued=0, seconds=1.5, error="boom")], seconds=2)
+
+        assert (summary.leads, summary.queued, [s.shard for s in summary.failed]) == (7, 2, [1])
+        assert str(summary) == "2 notifications queued for 7 leads by 2 shards in 2.00s (slowest shard 1.50s, 1 failed)"
+
+
+class TestShardPool:
+    """Test matching and queuing notifications from shard worker processes."""
+
+    @pytest.mark.parametrize("compact", [False, True])
+    def test_shards_queue_every_matching_lead_once(self, db, centers, leads, shard_pool, compact):
+        availability = [slot(centers[0]), slot(centers[1]), slot(centers[1], "10:00")]
+        if compact:
+            availability = compact_items(availability)
+
+        summary = shard_pool.enqueue(availability)
+
+        assert (summary.leads, summary.queued, summary.failed) == (8, 8, [])
+        assert len(summary.shards) == 3
+        notifications = db.query(NotificationOutbox).all()
+        assert sorted(n.email for n in notifications) == [f"lead{i}@example.com" for i in range(8)]
+        assert db.query(NotifiedSlot).count() == 4 * 1 + 4 * 2
+
+    def test_workers_stay_warm_and_queue_only_new_slots(self, db, centers, leads, shard_pool):
+        availability = [slot(centers[0]), slot(centers[1])]
+        shard_pool.enqueue(availability)
+
+        assert shard_pool.enqueue(availability + [slot(centers[0], "10:00")]).queued == 4
+
+    def test_needs_the_outbox(self):
+        with patch.multiple(settings, NOTIFIER_SHARDS=4, NOTIFICATION_OUTBOX_ENABLED=False):
+            assert notifier.build_shard_pool() is None
+        with patch.object(settings, "NOTIFIER_SHARDS", 1):
+            assert notifier.build_shard_pool() is None
+
+    def test_not_used_with_the_sql_engine(self):
+        with patch.multiple(settings, NOTIFIER_SHARDS=4, NOTIFICATION_OUTBOX_ENABLED=True, MATCHING_ENGINE="sql"):
+            assert notifier.build_shard_pool() is None
+
+    @pytest.mark.parametrize("error, saved", [(None, True), ("boom", False)])
+    def test_snapshot_not_saved_when_a_shard_failed(self, centers, error, saved):
+        shard_pool = MagicMock(spec=notifier.ShardPool)
+        shard_pool.enqueue.return_value = RunSummary([ShardSummary(0), ShardSummary(1, error=error)])
+        snapshot_store = MagicMock(spec=AvailabilitySnapshotStore)
+
+        with patch.object(notifier, "db_session_as_context"), \
+             patch.object(notifier, "find_available_dates", return_value=([slot(centers[0])], True)), \
+             patch.object(notifier, "drain_outbox"), \
+             patch.object(settings, "NOTIFICATION_OUTBOX_ENABLED", True):
+            notifier.run_cycle(MagicMock(), snapshot_store, shard_pool=shard_pool)
+
+        assert snapshot_store.save.called is saved